@@ -1,7 +1,20 @@
 import time
-from typing import Text, Optional, Any, Dict, List
+from typing import Text, Optional, Any, Dict, List, Tuple, Type
 
 registry = []
+# Name indexes over registry, the first class registered under a name wins
+_registry_index: Dict[Text, Type["Action"]] = {}
+_registry_index_lower: Dict[Text, Type["Action"]] = {}
+# Classes created for configured action names, keyed by (kind, name)
+_dynamic_classes: Dict[Tuple[Type["Action"], Text], Type["Action"]] = {}
+
+
+def dynamic_class(base: Type["Action"], name: Text) -> Type["Action"]:
+    """Return the subclass of `base` named `name`, created once per (base, name)."""
+    new_class = _dynamic_classes.get((base, name))
+    if new_class is None:
+        new_class = _dynamic_classes[(base, name)] = type(name, (base,), {})
+    return new_class
 
 
 class Action:
@@ -28,26 +41,20 @@ class Action:
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
         registry.append(cls)
+        _registry_index.setdefault(cls.__name__, cls)
+        _registry_index_lower.setdefault(cls.__name__.lower(), cls)
 
     @staticmethod
     def resolve_by_type(
             name: Text
     ) -> "Action":
-        # Try exact match first
-        for cls in registry:
-            if cls.__name__ == name:
-                return cls
-        
-        # Try case-insensitive match
-        name_lower = name.lower()
-        for cls in registry:
-            if cls.__name__.lower() == name_lower:
-                return cls
-        
+        # Try exact match first, then case-insensitive match
+        action_class = _registry_index.get(name) or _registry_index_lower.get(name.lower())
+        if action_class:
+            return action_class
+
         # if not in register
-        new_class = type(name, (Action,), {})
-        new_class.__name__ = name
-        return new_class
+        return dynamic_class(Action, name)
 
 
     def apply_to(self,dst) -> None:
@@ -1,9 +1,11 @@
+import asyncio
 import logging
 import json
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Text, Callable, Awaitable
 from cota.actions.action import Action
 from cota.message.message import Message
 from cota.dst import DST
+from cota.utils.parser import JSONFieldStream
 from cota.constant import DEFAULT_DIALOGUE_MAX_TOKENS
 
 logger = logging.getLogger(__name__)
@@ -25,7 +27,24 @@ class BotUtter(Action):
     }
     
     The 'thought' content is stored at the same level as 'text' for analysis and debugging.
+
+    When `stream_callback` is set, the completion is streamed and every newly
+    generated piece of 'text' is passed to the callback before the final
+    result is stored.
+
+    With speculative selection the completion may be started by `speculate`
+    before the action is selected. The action finally selected adopts the
+    running `speculation` and uses its content when the prompt it would
+    send, knowledge and policies included, is unchanged.
+
+    In select-and-respond mode the reply object written by the Selector is
+    set as `prefill` and used, thought included, instead of a completion of
+    its own.
     """
+    stream_callback: Optional[Callable[[Text], Awaitable[None]]] = None
+    speculation: Optional[asyncio.Future] = None
+    prefill: Optional[Dict[Text, Any]] = None
+
     def apply_to(self, dst: DST) -> None:
         """
         Apply this action to the dialogue state tracker.
@@ -58,16 +77,26 @@ class BotUtter(Action):
         message = Message(sender='bot', text=text)
         self.result.append(message.as_dict())
 
-    async def run(
-            self,
-            agent: Optional["Agent"] = None,
-            dst: Optional[DST] = None,
-    ):
-        knowledge_dict = await dst.format_knowledge(self.prompt, self)
-        thoughts_dict = await dst.format_policies(self.prompt, self)
-        prompt = dst.format_prompt(self.prompt, self, {**knowledge_dict, **thoughts_dict})
+    async def stream_chat(self, llm, json_field: Optional[Text] = None, **kwargs) -> Text:
+        """Stream a completion through `stream_callback` and return its full content.
+
+        Args:
+            llm: LLM instance to generate with
+            json_field: Forward only this string field of a JSON completion
+            **kwargs: Arguments of LLM.generate_chat_stream
+        """
+        chunks = []
+        field_stream = JSONFieldStream(json_field) if json_field else None
+        async for delta in llm.generate_chat_stream(**kwargs):
+            chunks.append(delta)
+            text = field_stream.feed(delta) if field_stream else delta
+            if text:
+                await self.stream_callback(text)
+        return ''.join(chunks)
 
-        messages = [
+    def build_messages(self, dst: DST, context: Dict[Text, Text]) -> List[Dict[Text, Text]]:
+        prompt = dst.format_prompt(self.prompt, self, context)
+        return [
             {
                 "role": "system",
                 "content": dst.agent_description()
@@ -77,16 +106,87 @@ class BotUtter(Action):
                 "content": prompt
             }
         ]
-        
-        # Generate response with JSON format requirement
+
+    def speculate(self, agent: "Agent", dst: DST) -> None:
+        """Start generating this utterance before it has been selected."""
+        self.speculation = asyncio.ensure_future(self._speculate(agent, dst))
+
+    async def _speculate(self, agent: "Agent", dst: DST):
+        context = await dst.format_context(self.prompt, self)
+        messages = self.build_messages(dst, context)
         result = await agent.llm_instance(self.llm).generate_chat(
             messages=messages,
             max_tokens=agent.dialogue.get('max_tokens', DEFAULT_DIALOGUE_MAX_TOKENS),
-            response_format={'type': 'json_object'}
+            response_format={'type': 'json_object'},
+            priority='high'
         )
+        return messages, result["content"]
+
+    async def _speculated_content(self, agent: "Agent", dst: DST) -> Optional[Text]:
+        """Content of the adopted speculation, None if it failed or is stale."""
+        speculation, self.speculation = self.speculation, None
+        try:
+            messages, content = await speculation
+        except Exception as e:
+            logger.warning(f"Speculative generation failed: {e}")
+            agent.record_speculation("failed")
+            return None
+        # The context is shared with the speculation unless the state it is
+        # computed from changed, then it is computed anew and tells stale apart
+        context = await dst.format_context(self.prompt, self)
+        if self.build_messages(dst, context) != messages:
+            agent.record_speculation("stale")
+            return None
+        agent.record_speculation("hits")
+        if self.stream_callback:
+            text = JSONFieldStream('text').feed(content)
+            if text:
+                await self.stream_callback(text)
+        return content
+
+    async def run(
+            self,
+            agent: Optional["Agent"] = None,
+            dst: Optional[DST] = None,
+    ):
+        content = None
+        if self.prefill is not None:
+            content = json.dumps(self.prefill, ensure_ascii=False)
+            if self.stream_callback:
+                await self.stream_callback(self.prefill.get('text', ''))
+            self.prefill = None
+            if self.speculation is not None:
+                self.speculation.cancel()
+                self.speculation = None
+                agent.record_speculation("misses")
+        elif self.speculation is not None:
+            content = await self._speculated_content(agent, dst)
+        if content is None:
+            context = await dst.format_context(self.prompt, self)
+            messages = self.build_messages(dst, context)
+
+            # Generate response with JSON format requirement
+            llm = agent.llm_instance(self.llm)
+            max_tokens = agent.dialogue.get('max_tokens', DEFAULT_DIALOGUE_MAX_TOKENS)
+            if self.stream_callback:
+                content = await self.stream_chat(
+                    llm,
+                    json_field='text',
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    response_format={'type': 'json_object'},
+                    priority='high'
+                )
+            else:
+                result = await llm.generate_chat(
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    response_format={'type': 'json_object'},
+                    priority='high'
+                )
+                content = result["content"]
 
         # Parse JSON response from content field
-        content = result["content"]
         try:
             json_result = json.loads(content)
             text_content = json_result.get('text', '')
@@ -114,5 +214,4 @@ class BotUtter(Action):
         else:
             self.result.append(message_dict)
 
-        logger.debug(f"Response prompt: {prompt}")
         logger.debug(f"Response result: {self.result}")
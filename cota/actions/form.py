@@ -2,7 +2,7 @@ import logging
 import time
 import json
 from typing import Text, Optional, List, Dict, Any, Tuple
-from cota.actions.action import Action
+from cota.actions.action import Action, dynamic_class
 from cota.dst import DST
 from cota.utils.parser import extract_json_from_string
 from cota.utils.common import all_keys_filled, update_existing_keys
@@ -48,9 +48,7 @@ class Form(Action):
     def resolve_by_type(
             name: Text
     ) -> "Form":
-        new_class = type(name, (Form,), {})
-        new_class.__name__ = name
-        return new_class
+        return dynamic_class(Form, name)
 
     @staticmethod
     def build_from_name(**kwargs) -> "Form":
@@ -112,14 +110,14 @@ class Form(Action):
             prompt_template = self.prompt
             if not prompt_template:
                 return
-            knowledge_dict = await dst.format_knowledge(prompt_template, self)
-            thoughts_dict = await dst.format_policies(prompt_template, self)
-            prompt = dst.format_prompt(prompt_template, self, {**knowledge_dict, **thoughts_dict})
+            context = await dst.format_context(prompt_template, self)
+            prompt = dst.format_prompt(prompt_template, self, context)
 
             update_result = await agent.llm_instance(self.llm).generate_chat(
                 messages = [{"role": "system", "content": DEFAULT_FORM_UPDATER_INSTRUCTION},{"role":"user", "content": prompt}],
                 max_tokens = agent.dialogue.get('max_tokens', DEFAULT_DIALOGUE_MAX_TOKENS),
-                response_format = {'type': 'json_object'}
+                response_format = {'type': 'json_object'},
+                cache = True
             )
             # Extract content from result
             content = update_result["content"]
@@ -19,9 +19,8 @@ class RAG(BotUtter):
         """
         run RAG Action
         """
-        knowledge_dict = await dst.format_knowledge(self.prompt, self)
-        thoughts_dict = await dst.format_policies(self.prompt, self)
-        prompt = dst.format_prompt(self.prompt, self, {**knowledge_dict, **thoughts_dict})
+        context = await dst.format_context(self.prompt, self)
+        prompt = dst.format_prompt(self.prompt, self, context)
 
         # Try exact match first, then case-insensitive match for 'BotUtter'
         parent_config = agent.actions.get('BotUtter')
@@ -33,15 +32,19 @@ class RAG(BotUtter):
                     break
         parent_config = parent_config or {}
         parent_llm = parent_config.get("llm")
-        result = await agent.llm_instance(parent_llm).generate_chat(
-            messages=[
-                {"role": "system", "content": dst.agent_description()},
-                {"role":"user", "content": prompt}
-            ],
-            max_tokens=agent.dialogue.get('max_tokens', DEFAULT_DIALOGUE_MAX_TOKENS)
-        )
+        llm = agent.llm_instance(parent_llm)
+        messages = [
+            {"role": "system", "content": dst.agent_description()},
+            {"role":"user", "content": prompt}
+        ]
+        max_tokens = agent.dialogue.get('max_tokens', DEFAULT_DIALOGUE_MAX_TOKENS)
+        if self.stream_callback:
+            content = await self.stream_chat(llm, messages=messages, max_tokens=max_tokens, priority='high')
+        else:
+            result = await llm.generate_chat(messages=messages, max_tokens=max_tokens, priority='high')
+            content = result["content"]
 
-        message = Message(sender='bot', text=result["content"])
+        message = Message(sender='bot', text=content)
 
         if self.result and self.result[-1].get('text') is None:
             self.result[-1].update(
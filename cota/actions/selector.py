@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import re
 import json
@@ -5,7 +6,8 @@ from typing import Text, Optional, List, Dict, Any
 from cota.actions.action import Action
 from cota.dst import DST
 from cota.utils.parser import extract_action_from_string
-from cota.constant import DEFAULT_SELECTOR_INSTRUCTION
+from cota.utils.template import PromptTemplate
+from cota.constant import DEFAULT_SELECTOR_INSTRUCTION, DEFAULT_SELECT_AND_RESPOND_PROMPT
 from cota.constant import (
     DEFAULT_DIALOGUE_MAX_TOKENS
 )
@@ -14,7 +16,15 @@ logger = logging.getLogger(__name__)
 
 class Selector(Action):
     """Selector class for selecting the next action to execute
+
+    When `respond_with` is set to a BotUtter, the same completion also
+    writes that utterance's reply, prompted as the BotUtter itself would
+    be. The parsed reply object is kept in `response` for the BotUtter to
+    use if it is the selected action.
     """
+    respond_with: Optional[Action] = None
+    response: Optional[Dict[Text, Any]] = None
+
     def __init__(
             self,
             name: Optional[Text] = None,
@@ -71,9 +81,23 @@ class Selector(Action):
         # System prompt
         system_prompt = DEFAULT_SELECTOR_INSTRUCTION
         # Enhanced prompt
-        knowledge_dict = await dst.format_knowledge(self.prompt, self)
-        thoughts_dict = await dst.format_policies(self.prompt, self)
-        prompt = dst.format_prompt(self.prompt, self, {**knowledge_dict, **thoughts_dict})
+        responder = self.respond_with
+        if responder is None:
+            context = await dst.format_context(self.prompt, self)
+            prompt = dst.format_prompt(self.prompt, self, context)
+        else:
+            # The reply part gets the responder's own knowledge and policies,
+            # shared with a speculated or later run of the same BotUtter
+            context, response_context = await asyncio.gather(
+                dst.format_context(self.prompt, self),
+                dst.format_context(responder.prompt or '', responder)
+            )
+            prompt = dst.format_prompt(self.prompt, self, context) + PromptTemplate.compile(
+                DEFAULT_SELECT_AND_RESPOND_PROMPT
+            ).render({
+                'action_name': responder.name,
+                'response_prompt': dst.format_prompt(responder.prompt, responder, response_context)
+            })
 
         select_result = await agent.llm_instance(self.llm).generate_chat(
             messages=[
@@ -81,7 +105,9 @@ class Selector(Action):
                 {"role": "user", "content": prompt}
             ],
             max_tokens=agent.dialogue.get('max_tokens', DEFAULT_DIALOGUE_MAX_TOKENS),
-            response_format = {'type': 'json_object'}
+            response_format = {'type': 'json_object'},
+            # a combined reply must not be replayed to other sessions
+            cache=responder is None
         )
         # Extract content from result
         content = select_result["content"]
@@ -95,8 +121,15 @@ class Selector(Action):
         result_dict = {"text": select_result.get('action')}
         if select_result.get('thought'):
             result_dict['thought'] = select_result.get('thought')
+        if select_result.get('slots'):
+            result_dict['metadata'] = {'slots': select_result.get('slots')}
         
         self.result = [result_dict]
+        if responder is not None:
+            response = select_result.get('response')
+            if isinstance(response, str):
+                response = {'text': response}
+            self.response = response if isinstance(response, dict) and response.get('text') else None
 
         logger.debug(f"Selector prompt: {prompt}")
         logger.debug(f"Selector result: {self.result}")
\ No newline at end of file
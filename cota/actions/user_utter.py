@@ -17,6 +17,7 @@ class UserUtter(Action):
         """Apply user utterance to dialogue state tracker"""
         dst.actions.append(self)
         dst.formless_actions.append(self)
+        dst.formless_user_utters += 1
         dst.latest_action = self
         dst.latest_query = self
         dst.latest_sender_id = self.sender_id
@@ -37,9 +38,8 @@ class UserUtter(Action):
             user: Optional[Dict] = None,
     ):
         """Execute user utterance action with LLM processing"""
-        knowledge_dict = await dst.format_knowledge(self.prompt, self)
-        thoughts_dict = await dst.format_policies(self.prompt, self)
-        prompt = dst.format_prompt(self.prompt, self, {**knowledge_dict, **thoughts_dict})
+        context = await dst.format_context(self.prompt, self)
+        prompt = dst.format_prompt(self.prompt, self, context)
 
         if user and user.get('description'):
             messages = [{"role": "system", "content": user.get('description')},{"role":"user", "content": prompt}]
@@ -2,33 +2,42 @@ import json
 import os
 import copy
 import logging
+from collections import Counter
 from typing import Text, List, Union, Optional, Dict, Tuple
 from cota.actions.action import Action
 from cota.actions.form import Form
 from cota.actions.user_utter import UserUtter
+from cota.actions.bot_utter import BotUtter
 from cota.actions.executors.base import Executor
 from cota.dst import DST
 from cota.utils.io import read_yaml_from_path
-from cota.processor import Processor
-from cota.store import Store, MemoryStore, SQLStore
+from cota.processor import Processor, SessionLocks
+from cota.store import Store, MemoryStore, SQLStore, AsyncSQLStore
 from cota.llm import LLM
 from cota.dpl.dpl import DPL, DPLFactory
 from cota.knowledge.knowledge import KnowledgeFactory, Knowledge
 from cota.utils.http import HttpClientManager, HttpConfig
+from cota.utils.cache import LRUCache
+from cota.utils.template import PromptTemplate
 from cota.utils.common import (
     first_empty_key,
     merge_dicts,
-    hash_str
+    hash_str,
+    import_from_path
 )
 
 from cota.constant import (
     DEFAULT_CONFIG,
     DEFAULT_FORM_CONFIG,
-    DEFAULT_HTTP_CLIENT_CONFIG
+    DEFAULT_HTTP_CLIENT_CONFIG,
+    DEFAULT_DST_CACHE
 )
 
 logger = logging.getLogger(__name__)
 
+# Prompt variables filled by DST.format_knowledge/format_policies/format_rag
+PROMPT_EXTRA_VARIABLES = ('knowledge', 'policies', 'rag')
+
 class Agent:
     def __init__(
             self,
@@ -45,14 +54,27 @@ class Agent:
         self.name = name
         self.description = description
         self.actions = actions
+        # Lower-case action name -> configured name, the first configured wins
+        self._action_names_lower = {}
+        for action_name in actions or {}:
+            self._action_names_lower.setdefault(action_name.lower(), action_name)
         self.llms = llms
         self.dpl = dpl
         self.store = store
         self.dialogue = dialogue
         self.user_proxy = user_proxy
         self.knowledge = knowledge
+        self.dst_cache = self._create_dst_cache((dialogue or {}).get('dst_cache'))
+        self.history_tokenizer = self._load_history_tokenizer((dialogue or {}).get('history_tokenizer'))
+        self.session_locks = SessionLocks()
         self.processor = Processor(agent=self, store=self.store)
         self._executors = {}  # Dictionary to store executor instances
+        # Speculative BotUtter generation alongside the Selector, see generate_actions
+        speculative = (dialogue or {}).get('speculative')
+        self.speculative = ({} if speculative is True else speculative) or None
+        # Latest action name -> Counter of the action names selected after it
+        self._selection_counts: Dict[Text, Counter] = {}
+        self.speculation_stats = {"attempts": 0, "hits": 0, "misses": 0, "stale": 0, "failed": 0}
 
     @classmethod
     def load_from_path(cls, path: Text, store: Optional[Store] = None) -> "Agent":
@@ -98,11 +120,16 @@ class Agent:
 
         # Initialize knowledge list
         knowledge_configs = agent_config.get('knowledge', [])
-        knowledge = KnowledgeFactory.create(knowledge_configs, path)
+        knowledge = KnowledgeFactory.create(
+            knowledge_configs, path, parallel=dialogue.get('parallel_strategies', False)
+        )
 
         # Initialize executors
         executors = cls._init_executors(actions)
 
+        # Parse action prompts once so turns only render them
+        cls._compile_prompts(actions)
+
         # Log final configurations for debugging
         logger.debug(f"Endpoints configuration:\n{endpoints_config}")
         logger.debug(f"Agent configuration:\n{agent_config}")
@@ -148,6 +175,60 @@ class Agent:
                     
         return executors
 
+    @staticmethod
+    def _compile_prompts(actions: Dict) -> None:
+        """Compile action prompt templates and warn about unknown variables."""
+        for action_name, action_config in actions.items():
+            prompt = (action_config or {}).get('prompt')
+            if not prompt:
+                continue
+            template = PromptTemplate.compile(prompt)
+            for variable in template.variables:
+                if variable not in PROMPT_EXTRA_VARIABLES and not hasattr(DST, variable):
+                    logger.warning(f"Unknown variable '{{{{{variable}}}}}' in prompt of action {action_name}")
+
+    @staticmethod
+    def _create_dst_cache(cache_config: Optional[Dict]) -> Optional[LRUCache]:
+        """Create the in-process DST cache, disabled when config is empty or false.
+
+        Only safe when every turn of a session reaches this process, i.e. a
+        single worker or sticky sessions, unless invalidate_dst is called.
+        """
+        if not cache_config:
+            return None
+        if cache_config is True:
+            cache_config = DEFAULT_DST_CACHE
+        return LRUCache(
+            max_size=cache_config.get('max_size'),
+            ttl=cache_config.get('ttl')
+        )
+
+    @staticmethod
+    def _load_history_tokenizer(tokenizer_path: Optional[Text]):
+        """Load the callable counting tokens of a history line, None counts characters."""
+        if not tokenizer_path:
+            return None
+        tokenizer = import_from_path(tokenizer_path)
+        if not callable(tokenizer):
+            raise ValueError(f"History tokenizer '{tokenizer_path}' is not callable")
+        return tokenizer
+
+    def invalidate_dst(self, session_id: Optional[Text] = None) -> None:
+        """Drop cached trackers so the next turn reloads them from the store.
+
+        Needed when several workers share one store: a worker must invalidate
+        its copy once another worker has written to the same session.
+
+        Args:
+            session_id: Session to invalidate, all sessions if None
+        """
+        if self.dst_cache is None:
+            return
+        if session_id is None:
+            self.dst_cache.clear()
+        else:
+            self.dst_cache.pop(session_id)
+
     def get_executor(self, action_name: Text) -> Optional[Executor]:
         """Get executor for specified action
         
@@ -164,6 +245,11 @@ class Agent:
         for executor in self._executors.values():
             if hasattr(executor, 'cleanup'):
                 await executor.cleanup()
+        if self.store:
+            await self.store.close()
+        # Shared connection pools are closed when their last client is closed
+        for llm in (self.llms or {}).values():
+            await llm.close()
 
     def build_action(self, action_name: Text, **kwargs) -> "Action":
         """
@@ -182,13 +268,11 @@ class Agent:
         # Try exact match first, then case-insensitive match
         action_config = self.actions.get(action_name)
         if action_config is None:
-            # Try case-insensitive match
-            action_name_lower = action_name.lower()
-            for key, config in self.actions.items():
-                if key.lower() == action_name_lower:
-                    action_config = config
-                    action_name = key  # Use the actual key name from config
-                    break
+            # Try case-insensitive match, using the actual key name from config
+            key = self._action_names_lower.get(action_name.lower())
+            if key is not None:
+                action_config = self.actions[key]
+                action_name = key
         if action_config is None:
             raise ValueError(f"Action '{action_name}' not found in actions configuration.")
 
@@ -229,23 +313,96 @@ class Agent:
                 return [self.build_action(first_action_name)]
 
         # If DPL doesn't generate action, fall back to selector
+        state = dst.latest_action.name if dst.latest_action else None
+        speculative = self._speculate(state, dst)
+        action = None
+        try:
+            action = await self._select_action(dst)
+        finally:
+            self._resolve_speculation(speculative, action)
+        self._selection_counts.setdefault(state, Counter())[action.name] += 1
+        return [action]
+
+    async def _select_action(self, dst: DST) -> Action:
         selector = self.build_action(
             action_name='Selector'
         )
+        if self.dialogue.get('select_and_respond'):
+            # Let the selection completion also write the BotUtter reply
+            responder = self.build_action('BotUtter')
+            if type(responder).run is BotUtter.run:
+                selector.respond_with = responder
         await selector.run(agent=self, dst=dst)
         dst.update(selector)
 
         if len(selector.result) == 0:
             # if no action is selected, return a Response action
-            return [self.build_action('BotUtter')]
+            action = self.build_action('BotUtter')
         else:
             # if actions are selected, take only the first action
             action_infos = self._extract_action_info(selector)
             if action_infos:
                 action_name, action_params = action_infos[0]
-                return [self.build_action(action_name, **action_params)]
+                action = self.build_action(action_name, **action_params)
             else:
-                return [self.build_action('BotUtter')]
+                action = self.build_action('BotUtter')
+
+        responder = selector.respond_with
+        if (
+            responder is not None and selector.response
+            and type(action) is type(responder) and action.name == responder.name
+        ):
+            action.prefill = selector.response
+        selector.respond_with = None
+        return action
+
+    def _speculate(self, state: Optional[Text], dst: DST) -> Optional[BotUtter]:
+        """Start the most likely selection early when it is a plain BotUtter.
+
+        The likely selection is the action most often selected after the
+        same latest action, once `min_samples` selections have been seen.
+        """
+        if self.speculative is None:
+            return None
+        counts = self._selection_counts.get(state)
+        if not counts or sum(counts.values()) < self.speculative.get('min_samples', 3):
+            return None
+        action_name = counts.most_common(1)[0][0]
+        try:
+            action = self.build_action(action_name)
+        except ValueError:
+            return None
+        # Subclasses such as RAG generate differently
+        if type(action).run is not BotUtter.run:
+            return None
+        action.speculate(self, dst)
+        self.speculation_stats["attempts"] += 1
+        return action
+
+    def _resolve_speculation(self, speculative: Optional[BotUtter], action: Optional[Action]) -> None:
+        """Hand the speculation over to the selected action, or cancel it."""
+        if speculative is None:
+            return
+        if (
+            action is not None
+            and type(action) is type(speculative)
+            and (action.name, action.prompt, action.llm) == (speculative.name, speculative.prompt, speculative.llm)
+        ):
+            action.speculation = speculative.speculation
+        else:
+            speculative.speculation.cancel()
+            # retrieve the error of a speculation that already failed
+            speculative.speculation.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self.record_speculation("misses")
+        speculative.speculation = None
+
+    def record_speculation(self, outcome: Text) -> None:
+        self.speculation_stats[outcome] += 1
+
+    def speculation_metrics(self) -> Dict:
+        stats = dict(self.speculation_stats)
+        stats["hit_rate"] = stats["hits"] / stats["attempts"] if stats["attempts"] else 0.0
+        return stats
 
     async def _handle_form_query(self, dst: DST) -> List[Action]:
         selector = self.build_action(
@@ -124,6 +124,15 @@ class Channel:
             if message.get('type') == 'image':
                 await self.send_image_url(recipient_id, **message)
 
+    async def send_partial_response(self, recipient_id: Text, message: Dict[Text, Any]) -> None:
+        """Send a piece of a response that is still being generated.
+
+        `message` holds the new `text` and a `stream_id` shared by all pieces
+        of one response; the complete response is sent with send_response
+        afterwards. Channels that can not stream ignore partial responses.
+        """
+        pass
+
     async def send_text_message(
         self, recipient_id: Text, **kwargs: Any
     ) -> None:
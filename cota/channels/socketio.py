@@ -258,6 +258,10 @@ class SocketIO(Channel):
         logger.debug("Executing _send_message: %s", response)
         await self.sio.emit("bot_uttered", response, room=recipient_id)
 
+    async def send_partial_response(self, recipient_id: Text, message: Dict[Text, Any]) -> None:
+        """Sends partial text of a response being generated using the delta event."""
+        await self.sio.emit("bot_uttered_delta", {"type": "text_delta", **message}, room=recipient_id)
+
     async def send_text_message(
         self, recipient_id: Text, **kwargs: Any
     ) -> None:
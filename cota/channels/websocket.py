@@ -222,6 +222,10 @@ class Websocket(Channel):
     async def send_image_url(self, recipient_id: Text, **kwargs: Any) -> None:
         """Send image URL"""
         await self._send_message(recipient_id, kwargs)
+
+    async def send_partial_response(self, recipient_id: Text, message: Dict[Text, Any]) -> None:
+        """Send partial text of a response being generated"""
+        await self._send_message(recipient_id, {"type": "text_delta", **message})
     
     async def _send_message(self, recipient_id: Text, response: Any) -> None:
         """Send message to recipient(s)"""
@@ -93,6 +93,14 @@ Action描述为:
 
 """
 
+DEFAULT_SELECT_AND_RESPOND_PROMPT = """
+如果选择的Action是{{action_name}}，请同时按以下要求生成回复，以json对象写入response字段，包含回复text与其思考过程thought；否则response为null。
+
+{{response_prompt}}
+
+以json格式输出: {"action": "<Action>", "thought": "<思考过程>", "slots": {}, "response": {"text": "<回复>", "thought": "<回复的思考过程>"}}
+"""
+
 DEFAULT_FORM_PROMPT = """
 当前正在执行{{current_form_name}}， 其描述为{{current_form_description}}。根据对话内容及Action序列，结合当前slot的状态，填充或重置slot的值。
 
@@ -117,6 +125,16 @@ DEFAULT_HTTP_CLIENT_CONFIG = {
     "default_headers": {"Content-Type": "application/json"}
 }
 
+DEFAULT_LLM_HTTP_CONFIG = {
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 30,
+    "timeout": 60,
+    "max_retries": 2,
+    "max_connections_per_host": 0,   # 0 for no per host limit, custom clients only
+    "dns_cache_ttl": 300             # custom clients only
+}
+
 DEFAULT_FORM_CONFIG = {
     "type": "form",
     "description": "",
@@ -134,11 +152,25 @@ DEFAULT_DIALOGUE_MODE = """agent"""
 DEFAULT_DIALOGUE_USE_PROXY_USER = False
 DEFAULT_DIALOGUE_MAX_PROXY_STEP = 20
 DEFAULT_DIALOGUE_MAX_TOKENS = 500
+DEFAULT_DIALOGUE_STREAM = False
+DEFAULT_DIALOGUE_SPECULATIVE = False
+DEFAULT_DIALOGUE_SELECT_AND_RESPOND = False
+DEFAULT_DIALOGUE_PARALLEL_STRATEGIES = False
+# Settings of dialogue.dst_cache when enabled with `true`
+DEFAULT_DST_CACHE = {
+    'max_size': 1000,
+    'ttl': 3600
+}
 DEFAULT_DIALOGUE = {
     'mode': DEFAULT_DIALOGUE_MODE, 
     'use_proxy_user': DEFAULT_DIALOGUE_USE_PROXY_USER,
     'max_proxy_step': DEFAULT_DIALOGUE_MAX_PROXY_STEP, 
-    'max_tokens': DEFAULT_DIALOGUE_MAX_TOKENS
+    'max_tokens': DEFAULT_DIALOGUE_MAX_TOKENS,
+    'stream': DEFAULT_DIALOGUE_STREAM,
+    'speculative': DEFAULT_DIALOGUE_SPECULATIVE,
+    'select_and_respond': DEFAULT_DIALOGUE_SELECT_AND_RESPOND,
+    'parallel_strategies': DEFAULT_DIALOGUE_PARALLEL_STRATEGIES,
+    'dst_cache': None
 }
 
 DEFAULT_CONFIG = {
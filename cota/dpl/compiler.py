@@ -0,0 +1,187 @@
+import os
+import hmac
+import functools
+import pickle
+import hashlib
+import logging
+import secrets
+from pathlib import Path
+from typing import Text, List, Union, Optional, Dict, Any, Callable
+
+from cota.utils.io import read_yaml_from_path
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of compiled indexes changes, older bundles are then rebuilt
+BUNDLE_VERSION = 2
+BUNDLE_DIR = '.compiled'
+# Secret signing compiled bundles, a per-user key file is used when unset
+BUNDLE_KEY_ENV = 'COTA_BUNDLE_KEY'
+
+
+def bundle_key() -> Optional[bytes]:
+    """Return the key signing compiled bundles, None if there is none.
+
+    The key comes from the COTA_BUNDLE_KEY environment variable, or from a
+    key file in the user's cache directory that is created on first use.
+    It never lives in the policy directory, so bundles planted there or
+    copied from another machine fail verification and are rebuilt. Without
+    a key, e.g. with a read-only home, policies are compiled on every start.
+    """
+    key = os.environ.get(BUNDLE_KEY_ENV)
+    if key:
+        return key.encode('utf-8')
+    try:
+        cache_dir = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache')
+    except RuntimeError:
+        # no home directory to resolve
+        cache_dir = None
+    return _file_key(cache_dir / 'cota' / 'bundle.key' if cache_dir else None)
+
+
+@functools.lru_cache(maxsize=None)
+def _file_key(key_path: Optional[Path]) -> Optional[bytes]:
+    """Read or create a key file, None when it cannot be; tried once per path."""
+    if key_path is None:
+        logger.warning(f"No key to sign compiled policies, set {BUNDLE_KEY_ENV} to cache them")
+        return None
+    try:
+        if not key_path.is_file():
+            key_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = key_path.with_suffix(f".{os.getpid()}.tmp")
+            try:
+                fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(secrets.token_bytes(32))
+                os.replace(tmp_path, key_path)
+            finally:
+                tmp_path.unlink(missing_ok=True)
+        # read back, a concurrent process may have written its key last
+        return key_path.read_bytes() or None
+    except OSError as e:
+        logger.warning(
+            f"No key to sign compiled policies, set {BUNDLE_KEY_ENV} to cache them: {e}"
+        )
+        return None
+
+
+def _sign(key: bytes, payload: bytes) -> bytes:
+    return hmac.new(key, payload, hashlib.sha256).hexdigest().encode('ascii')
+
+
+class PolicyBundle:
+    """Policy data of a bot parsed once and shared by all DPL strategies.
+
+    The bundle holds the `triggers` and `policies` sections of every YAML
+    file in the policy directory, plus the indexes the strategies compile
+    from them. It is pickled under `<policy path>/.compiled/`, named by the
+    hash of the policy files, so later starts with unchanged policies load
+    the indexes without parsing or compiling anything. Bundles are signed
+    with an HMAC of bundle_key() and only unpickled when the signature
+    matches, since the policy directory may be writable by others.
+
+    Args:
+        digest: Hash of the policy files and BUNDLE_VERSION.
+        triggers: Trigger rules of all files.
+        policies: Annotated policies of all files.
+    """
+
+    def __init__(self, digest: Text, triggers: List[Dict], policies: List[Dict]) -> None:
+        self.digest = digest
+        self.triggers = triggers
+        self.policies = policies
+        self.indexes: Dict[Text, Any] = {}
+        self.dirty = False
+
+    def __getstate__(self) -> Dict[Text, Any]:
+        state = dict(self.__dict__)
+        state['dirty'] = False
+        return state
+
+    def index(self, name: Text, build: Callable[[], Any]) -> Any:
+        """Return the compiled index `name`, building it if the bundle lacks it."""
+        if name not in self.indexes:
+            self.indexes[name] = build()
+            self.dirty = True
+        return self.indexes[name]
+
+    @staticmethod
+    def policy_files(path: Union[Text, Path]) -> List[Path]:
+        return sorted(Path(path).glob('*.yml'))
+
+    @classmethod
+    def compute_digest(cls, path: Union[Text, Path]) -> Text:
+        sha256 = hashlib.sha256(f"cota-policy-bundle:{BUNDLE_VERSION}".encode('utf-8'))
+        for yml_file in cls.policy_files(path):
+            sha256.update(yml_file.name.encode('utf-8'))
+            sha256.update(b'\0')
+            sha256.update(yml_file.read_bytes())
+            sha256.update(b'\0')
+        return sha256.hexdigest()
+
+    @staticmethod
+    def bundle_path(path: Union[Text, Path], digest: Text) -> Path:
+        return Path(path) / BUNDLE_DIR / f"policy-{digest[:16]}.pkl"
+
+    @classmethod
+    def load(cls, path: Union[Text, Path]) -> "PolicyBundle":
+        """Load the compiled bundle of a policy directory, parsing it if there is none."""
+        if not Path(path).is_dir():
+            logger.warning(f"Path {path} is not a directory")
+            return cls('', [], [])
+
+        digest = cls.compute_digest(path)
+        bundle_path = cls.bundle_path(path, digest)
+        key = bundle_key()
+        if key is not None and bundle_path.exists():
+            try:
+                signature, _, payload = bundle_path.read_bytes().partition(b'\n')
+                # Never unpickle data this process did not sign
+                if hmac.compare_digest(signature, _sign(key, payload)):
+                    bundle = pickle.loads(payload)
+                    if isinstance(bundle, cls) and bundle.digest == digest:
+                        logger.debug(f"Loaded compiled policies from {bundle_path}")
+                        return bundle
+                else:
+                    logger.warning(f"Ignoring policy bundle {bundle_path} with an invalid signature")
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable policy bundle {bundle_path}: {e}")
+        return cls.parse(path, digest)
+
+    @classmethod
+    def parse(cls, path: Union[Text, Path], digest: Text) -> "PolicyBundle":
+        triggers, policies = [], []
+        for yml_file in cls.policy_files(path):
+            try:
+                data = read_yaml_from_path(yml_file)
+                if isinstance(data, dict):
+                    triggers.extend(data.get('triggers') or [])
+                    policies.extend(data.get('policies') or [])
+            except Exception as e:
+                logger.error(f"Failed to load {yml_file}: {e}")
+        bundle = cls(digest, triggers, policies)
+        bundle.dirty = True
+        return bundle
+
+    def save(self, path: Union[Text, Path]) -> None:
+        """Write the bundle when it changed, replacing bundles of older policy files."""
+        if not self.dirty or not self.digest:
+            return
+        key = bundle_key()
+        if key is None:
+            return
+        bundle_path = self.bundle_path(path, self.digest)
+        try:
+            bundle_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = bundle_path.with_suffix(f".{os.getpid()}.tmp")
+            payload = pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+            with open(tmp_path, 'wb') as f:
+                f.write(_sign(key, payload) + b'\n' + payload)
+            os.replace(tmp_path, bundle_path)
+            for stale in bundle_path.parent.glob('policy-*.pkl'):
+                if stale != bundle_path:
+                    stale.unlink(missing_ok=True)
+            self.dirty = False
+            logger.debug(f"Saved compiled policies to {bundle_path}")
+        except OSError as e:
+            logger.warning(f"Could not save compiled policies to {bundle_path}: {e}")
@@ -1,12 +1,18 @@
 import os
 import logging
+import functools
 from pathlib import Path
 from typing import Text, List, Union, Optional, Dict, Any
 
+from cota.utils.concurrency import first_accepted
+
 logger = logging.getLogger(__name__)
 
 
 class DPL:
+    # Seconds a CompositeDPL waits for this strategy, None for no limit
+    timeout: Optional[float] = None
+
     async def generate_thoughts(self, dst: 'DST', action: 'Action') -> Optional[Text]:
         """Generate thought for the next action. Return None if no thought is generated."""
         return None
@@ -20,38 +26,50 @@ class CompositeDPL(DPL):
     """
     Composite DPL - manages multiple DPL strategies internally.
     Implements true factory pattern: returns single object with internal strategy composition.
+
+    Strategies are tried in order and the first non-empty result wins. With
+    `parallel` they all start together; results are still taken in order and
+    the remaining strategies are cancelled once one wins. Each strategy is
+    bounded by its `timeout`.
     """
     
-    def __init__(self, strategies: List[DPL]):
+    def __init__(self, strategies: List[DPL], parallel: bool = False):
         self.strategies = strategies
+        self.parallel = parallel
         logger.info(f"CompositeDPL initialized with {len(strategies)} strategies: "
                    f"{[s.__class__.__name__ for s in strategies]}")
     
     async def generate_thoughts(self, dst: 'DST', action: 'Action') -> Optional[Text]:
-        """Iterate through strategies to generate thoughts, return first non-empty result."""
-        for strategy in self.strategies:
-            try:
-                result = await strategy.generate_thoughts(dst, action)
-                if result:
-                    logger.debug(f"Thoughts generated by {strategy.__class__.__name__}")
-                    return result
-            except Exception as e:
-                logger.error(f"Strategy {strategy.__class__.__name__} failed: {e}")
-                continue
-        return None
+        """Run strategies to generate thoughts, return first non-empty result."""
+        name, result = await first_accepted(
+            [
+                (f"Strategy {strategy.__class__.__name__}",
+                 functools.partial(strategy.generate_thoughts, dst, action),
+                 strategy.timeout)
+                for strategy in self.strategies
+            ],
+            bool,
+            self.parallel
+        )
+        if name:
+            logger.debug(f"Thoughts generated by {name}")
+        return result
     
     async def generate_actions(self, dst: 'DST') -> Optional[List[Text]]:
-        """Iterate through strategies to generate actions, return first non-empty result."""
-        for strategy in self.strategies:
-            try:
-                result = await strategy.generate_actions(dst)
-                if result:
-                    logger.debug(f"Actions generated by {strategy.__class__.__name__}: {result}")
-                    return result
-            except Exception as e:
-                logger.error(f"Strategy {strategy.__class__.__name__} failed: {e}")
-                continue
-        return None
+        """Run strategies to generate actions, return first non-empty result."""
+        name, result = await first_accepted(
+            [
+                (f"Strategy {strategy.__class__.__name__}",
+                 functools.partial(strategy.generate_actions, dst),
+                 strategy.timeout)
+                for strategy in self.strategies
+            ],
+            bool,
+            self.parallel
+        )
+        if name:
+            logger.debug(f"Actions generated by {name}: {result}")
+        return result
     
     def add_strategy(self, strategy: DPL) -> None:
         """Dynamically add strategy."""
@@ -71,6 +89,8 @@ class DPLFactory:
         """
         Create single DPL object based on configuration.
         Returns CompositeDPL for multiple policies or single DPL for one policy.
+        The policy files are parsed once into a PolicyBundle shared by all
+        strategies, and the compiled bundle is saved for later starts.
         
         Args:
             agent_config: Agent configuration dictionary
@@ -88,50 +108,79 @@ class DPLFactory:
                     
         if not policies:
             raise ValueError("No policies configured in configuration")
+
+        from cota.dpl.compiler import PolicyBundle
+        bundle = PolicyBundle.load(path)
         
+        parallel = (agent_config.get('dialogue') or {}).get('parallel_strategies', False)
+
         # If only one policy, return single DPL instance
         if len(policies) == 1:
             policy = policies[0]
-            return DPLFactory._create_single_dpl(
+            dpl = DPLFactory._create_single_dpl(
                 policy.get('type'),
                 policy,
                 agent_config,
-                path
+                path,
+                bundle
             )
-        
-        # Multiple policies: create CompositeDPL
-        strategies = []
-        for policy in policies:
-            policy_type = policy.get('type') or policy.get('name')
-            strategy = DPLFactory._create_single_dpl(policy_type, policy, agent_config, path)
-            strategies.append(strategy)
-        
-        return CompositeDPL(strategies)
+        else:
+            # Multiple policies: create CompositeDPL
+            strategies = []
+            for policy in policies:
+                policy_type = policy.get('type') or policy.get('name')
+                strategy = DPLFactory._create_single_dpl(policy_type, policy, agent_config, path, bundle)
+                strategy.timeout = policy.get('timeout')
+                strategies.append(strategy)
+            dpl = CompositeDPL(strategies, parallel=parallel)
+
+        bundle.save(path)
+        return dpl
     
     @staticmethod
-    def _create_single_dpl(policy_type: str, policy: Dict, agent_config: Dict, path: str) -> DPL:
+    def _create_single_dpl(
+            policy_type: str,
+            policy: Dict,
+            agent_config: Dict,
+            path: str,
+            bundle: Optional["PolicyBundle"] = None
+    ) -> DPL:
         """Create single DPL strategy instance."""
         if policy_type == 'trigger':
             from cota.dpl.trigger import TriggerDPL
             actions_config = agent_config.get("actions", {})
             return TriggerDPL(
                 path=path,
-                actions_config=actions_config
+                actions_config=actions_config,
+                bundle=bundle
             )
             
         elif policy_type == 'match':
             from cota.dpl.match import MatchDPL
             return MatchDPL(
-                path=path
+                path=path,
+                bundle=bundle
             )
             
+        elif policy_type == 'semantic':
+            from cota.dpl.semantic import SemanticDPL
+            policy_config = policy.get('config', policy)
+            return SemanticDPL(
+                path=path,
+                embedding=policy_config.get('embedding'),
+                top_k=policy_config.get('top_k', 3),
+                threshold=policy_config.get('threshold', 0.6),
+                bundle=bundle
+            )
+
         elif policy_type in ('llm'):
             from cota.dpl.llm import LLMDPL
             # Support nested config structure
             policy_config = policy.get('config', policy)
             return LLMDPL(
                 path=path,
-                llms=policy_config.get('llms')
+                llms=policy_config.get('llms'),
+                bundle=bundle
             )
         else:
             raise ValueError(f"Unknown dialogue policy type: {policy_type}")
\ No newline at end of file
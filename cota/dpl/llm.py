@@ -18,7 +18,8 @@ class LLMDPL(DPL):
     def __init__(
         self,
         path: Union[Text, Path],
-        llms: Union[Text, Dict, List, None] = None
+        llms: Union[Text, Dict, List, None] = None,
+        bundle: Optional["PolicyBundle"] = None
     ) -> None:
         """Initialize LLMDPL with policy data."""
         # Support llms list configuration
@@ -31,7 +32,7 @@ class LLMDPL(DPL):
         if isinstance(self.llms, list):
             self._build_llm_mappings()
         
-        self.build(path)
+        self.build(path, bundle)
     
     def _build_llm_mappings(self):
         """Build action to LLM mapping and find default LLM from llms list configuration."""
@@ -94,17 +95,20 @@ class LLMDPL(DPL):
             return None
     
     
-    def build(self, path: Union[Text, Path]):
-        """Prepare data for LLM with streaming processing."""
-        # Load policy data from path
-        policies = self.load_data(path)
-
-        if not policies:
-            logger.warning(f"No policies found in {path}")
-            return {}
+    def build(self, path: Union[Text, Path], bundle: Optional["PolicyBundle"] = None):
+        """Prepare the knowledge files of every action type for the LLM knowledge platform."""
+        if bundle is not None:
+            contents = bundle.index('llm', lambda: self.process_policies(bundle.policies))
+        else:
+            contents = self.process_policies(self.load_data(path))
 
-        # Stream process: read policies and write to file directly
-        self.process_policies(policies, path)
+        written = self.write_knowledge_files(contents or {}, path)
+        if not contents:
+            logger.warning(f"No policies with thoughts found in {path}")
+            return
+        if not written:
+            logger.debug("LLM DPL knowledge files are up to date")
+            return
 
         # Log reminder for LLM knowledge platform submission
         logger.info("=" * 60)
@@ -119,84 +123,72 @@ class LLMDPL(DPL):
         logger.info("📤 Ready-to-upload files automatically separated by action type")
         logger.info("=" * 60)
 
-    def process_policies(self, policies: List[Dict], policies_path: Union[Text, Path]):
-        """Process policies: read and write to file directly for all action types."""
-        import time
-        
-        policies_path = Path(policies_path)
-        timestamp = int(time.time())
-        
-        # First pass: collect all action types that have thoughts
-        action_types = set()
-        for policy in policies:
+    def process_policies(self, policies: List[Dict]) -> Dict[Text, Text]:
+        """Build the knowledge document content of every action type with thoughts."""
+        documents: Dict[Text, List[Text]] = {}
+        seen: Dict[Text, set] = {}
+
+        for policy_idx, policy in enumerate(policies):
             actions = policy.get("actions", [])
-            for action in actions:
-                if 'thought' in action:
-                    action_name = action.get('name', '')
-                    if action_name:
-                        action_types.add(action_name)
-        
-        if not action_types:
-            logger.warning("No actions with thoughts found in policies")
-            return
-        
-        # Create output files for each action type
-        action_files = {}
-        action_hash_keys = {}
-        file_handles = {}
-        
-        try:
-            # Initialize files and data structures for each action type
-            for action_type in action_types:
-                safe_action_name = action_type.lower().replace(' ', '_')
-                output_path = policies_path / f"llm_dpl_{safe_action_name}_{timestamp}.md"
-                output_path.parent.mkdir(parents=True, exist_ok=True)
-                
-                action_hash_keys[action_type] = set()
-                file_handles[action_type] = open(output_path, 'w', encoding='utf-8')
-                
-                logger.info(f"Created knowledge file for {action_type}: {output_path.name}")
-            
-            # Process all policies
-            for policy_idx, policy in enumerate(policies):
-                actions = policy.get("actions", [])
-                if not actions:
+            if not actions:
+                continue
+
+            policy_title = policy.get("title", f"policy_{policy_idx}")
+            user_utter_index = self.build_user_utter_index(actions)
+
+            for i, action in enumerate(actions):
+                if 'thought' not in action:
+                    continue
+                action_name = action.get('name', '')
+                if not action_name:
                     continue
-                
-                policy_title = policy.get("title", f"policy_{policy_idx}")
-                user_utter_index = self.build_user_utter_index(actions)
-                
-                for i, action in enumerate(actions):
-                    if 'thought' in action:
-                        action_name = action.get('name', '')
-                        
-                        # Skip if action type not found or no file handle
-                        if action_name not in file_handles:
-                            continue
-                        
-                        target_file = file_handles[action_name]
-                        target_hash_keys = action_hash_keys[action_name]
-                        
-                        segments = self.trace_back_to_user_utter(actions, i, user_utter_index)
-                        
-                        for segment in segments:
-                            hash_key = '_'.join(f"{action.get('name')}:{action.get('thought', '')}" for action in segment)
-                            if hash_str(hash_key) not in target_hash_keys:
-                                target_hash_keys.add(hash_str(hash_key))
-                                
-                                content = self.segment_to_llm_content(segment)
-                                if content:
-                                    target_file.write(f"# {policy_title}\n")
-                                    target_file.write(f"{content}\n")
-                                    target_file.write(f"\n\n")
-        
-        finally:
-            # Close all file handles
-            for file_handle in file_handles.values():
-                file_handle.close()
-            
-        logger.info(f"Generated knowledge files for {len(action_types)} action types: {list(action_types)}")
 
+                lines = documents.setdefault(action_name, [])
+                action_seen = seen.setdefault(action_name, set())
+                for segment in self.trace_back_to_user_utter(actions, i, user_utter_index):
+                    seen_key = tuple((action.get('name'), action.get('thought', '')) for action in segment)
+                    if seen_key in action_seen:
+                        continue
+                    action_seen.add(seen_key)
+
+                    content = self.segment_to_llm_content(segment)
+                    if content:
+                        lines.append(f"# {policy_title}\n{content}\n\n\n")
+
+        return {action_name: ''.join(lines) for action_name, lines in documents.items()}
+
+    def write_knowledge_files(self, contents: Dict[Text, Text], policies_path: Union[Text, Path]) -> List[Path]:
+        """Write one knowledge file per action type, named by its content hash.
+
+        Files that already exist have the same content and are left untouched,
+        knowledge files of earlier policy versions are removed.
+
+        Returns:
+            The newly written files
+        """
+        policies_path = Path(policies_path)
+        written = []
+        current = set()
+        for action_type, content in contents.items():
+            safe_action_name = action_type.lower().replace(' ', '_')
+            output_path = policies_path / f"llm_dpl_{safe_action_name}_{hash_str(content)[:12]}.md"
+            current.add(output_path)
+            if output_path.exists():
+                continue
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            output_path.write_text(content, encoding='utf-8')
+            written.append(output_path)
+            logger.info(f"Created knowledge file for {action_type}: {output_path.name}")
+        for stale in policies_path.glob('llm_dpl_*.md'):
+            if stale not in current:
+                try:
+                    stale.unlink()
+                    logger.info(f"Removed outdated knowledge file {stale.name}")
+                except OSError as e:
+                    logger.warning(f"Could not remove outdated knowledge file {stale}: {e}")
+        if written:
+            logger.info(f"Generated knowledge files for {len(written)} action types: {[path.name for path in written]}")
+        return written
 
     def segment_to_llm_content(self, segment: List[Dict]) -> str:
         """Convert action segment to LLM knowledge document content."""
@@ -244,7 +236,8 @@ class LLMDPL(DPL):
                         "content": query_text
                     }
                 ],
-                max_tokens=dst.agent.dialogue.get('max_tokens', DEFAULT_DIALOGUE_MAX_TOKENS)
+                max_tokens=dst.agent.dialogue.get('max_tokens', DEFAULT_DIALOGUE_MAX_TOKENS),
+                priority='low'
             )
             return result["content"]
         except Exception as e:
@@ -1,30 +1,43 @@
 import os
 import logging
 from pathlib import Path
-from typing import Text, List, Union, Optional, Dict
+from typing import Text, List, Union, Optional, Dict, Tuple
 from cota.dst import DST
 from cota.actions.action import Action
 from cota.dpl.dpl import DPL
 
 from cota.utils.io import read_yaml_from_path
 
-from cota.utils.common import (
-    hash_str
-)
-
 logger = logging.getLogger(__name__)
 
 class MatchDPL(DPL):
+    """Render the thoughts of annotated policy segments matching the history.
+
+    Policy segments are keyed by the names of their actions. The rendering
+    of every key is prepared at load time, and since keys only grow when a
+    segment is extended to an earlier action, only the trailing actions
+    whose key still fits the longest known key are looked up on each call.
+    """
+
     def __init__(
             self,
             path,
+            bundle: Optional["PolicyBundle"] = None
     ) -> None:
-        self.features = self.build(path)
+        self.features, self.rendered = self.build(path, bundle)
+        # Length of the longest key
+        self.max_key_length = max((len(key) for key in self.features), default=0)
 
-    def build(self, path: Union[Text, Path]) -> Dict[Text, List]:
+    def build(self, path: Union[Text, Path], bundle: Optional["PolicyBundle"] = None) -> Tuple[Dict, Dict]:
+        """Build the features and the rendered thoughts per key."""
+        if bundle is not None:
+            return bundle.index('match', lambda: self.compile(bundle.policies))
         # Load policy data from path and process it into features
-        policies = self.load_data(path)
-        return self.process_policies(policies)
+        return self.compile(self.load_data(path))
+
+    def compile(self, policies: List[Dict]) -> Tuple[Dict, Dict]:
+        features = self.process_policies(policies)
+        return features, {key: self.render(segments) for key, segments in features.items()}
 
     def process_policies(self, policies: List[Dict]) -> Dict[Text, List]:
         """Process policies to build features for thought generation.
@@ -36,7 +49,7 @@ class MatchDPL(DPL):
             Dictionary mapping action sequence keys to thought segments
         """
         features = {}
-        hash_keys = set()
+        seen = set()
         
         for policy in policies:
             actions = policy.get("actions")
@@ -51,10 +64,10 @@ class MatchDPL(DPL):
                     
                     for segment in segments:
                         key = '_'.join([action.get('name') for action in segment])
-                        hash_key = '_'.join(f"{action.get('name')}:{action.get('thought', '')}" for action in segment)
+                        seen_key = tuple((action.get('name'), action.get('thought', '')) for action in segment)
 
-                        if hash_str(hash_key) not in hash_keys:
-                            hash_keys.add(hash_str(hash_key))
+                        if seen_key not in seen:
+                            seen.add(seen_key)
                             segment_with_title = {
                                 'title': title,
                                 'actions': segment
@@ -62,37 +75,46 @@ class MatchDPL(DPL):
                             features.setdefault(key, []).append(segment_with_title)
         return features
 
+    @staticmethod
+    def render(policies: List[Dict]) -> Text:
+        """Render the thoughts of the policy segments of one key."""
+        lines = []
+        for policy_data in policies:
+            title = policy_data.get('title', '')
+            features = policy_data.get('actions', [])
+
+            if title:
+                lines.append("# {}\n".format(title))
+
+            for feature in features:
+                if 'thought' in feature:
+                    lines.append("thought:{}\n".format(feature.get('thought')))
+                if 'result' in feature:
+                    lines.append("{}:{}\n".format(feature.get('name'), feature.get('result')))
+            lines.append('\n')
+        return ''.join(lines)
+
     async def generate_thoughts(self, dst: DST, action: Action) -> Text:
+        """Render the segments from every UserUtter to the end of the history.
+
+        Every UserUtter contributes its segment's thoughts followed by a blank
+        line, in history order. Segments whose key is longer than any known key
+        cannot match and contribute the blank line only.
+        """
         actions = dst.formless_actions
-        segments = []
-        query_index = [i for i, a in enumerate(actions) if a.name == 'UserUtter']
-        for q_index in query_index:
-            segment = []
-            for i in range(q_index, len(actions)):
-                segment.append(actions[i])
-            if action:
-                segment.append(action)
-            segments.append(segment)
-
-        thoughts = ""
-        for segment in segments:
-            key = '_'.join(action.name for action in segment)
-            policies = self.features.get(key, [])
-            for policy_data in policies:
-                title = policy_data.get('title', '')
-                features = policy_data.get('actions', [])
-                
-                if title:
-                    thoughts = thoughts + "# {}\n".format(title)
-                
-                for feature in features:
-                    if 'thought' in feature:
-                        thoughts = thoughts + "thought:{}\n".format(feature.get('thought'))
-                    if 'result' in feature:
-                        thoughts = thoughts + "{}:{}\n".format(feature.get('name'), feature.get('result'))
-                thoughts = thoughts + '\n'
-            thoughts = thoughts + '\n'
-        return thoughts
+        blocks = []
+        # Key of the segment from the current position to the end, built leftwards
+        key = action.name if action else None
+        for recent_action in reversed(actions):
+            key = recent_action.name if key is None else recent_action.name + '_' + key
+            if len(key) > self.max_key_length:
+                break
+            if recent_action.name == 'UserUtter':
+                blocks.append(self.rendered.get(key, '') + '\n')
+
+        # UserUtters before the looked up ones, counted by the DST as they are applied
+        earlier = dst.formless_user_utters - len(blocks)
+        return '\n' * earlier + ''.join(reversed(blocks))
 
     def load_data(self, path: Union[Text, Path]) -> List[Dict]:
         """Load match policy data from YAML files.
@@ -0,0 +1,253 @@
+import json
+import zlib
+import logging
+from pathlib import Path
+from typing import Text, List, Union, Optional, Dict, Any, Callable, Tuple
+
+import numpy as np
+
+from cota.dst import DST
+from cota.actions.action import Action
+from cota.dpl.dpl import DPL
+from cota.dpl.match import MatchDPL
+
+from cota.utils.io import read_yaml_from_path
+from cota.utils.common import import_from_path
+
+logger = logging.getLogger(__name__)
+
+# Actions left out of segments, as in TriggerDPL
+SKIPPED_ACTIONS = ('Selector', 'Updater')
+
+
+class HashingEmbedding:
+    """Embed texts as hashed character n-gram counts.
+
+    Needs no model or network access, so it is the default embedding of
+    SemanticDPL. Texts sharing many characters and short phrases end up
+    close to each other, which covers reworded or padded user messages.
+
+    Args:
+        dim: Number of hash buckets.
+        ngram_range: Smallest and largest n-gram length.
+    """
+
+    def __init__(self, dim: int = 512, ngram_range: Tuple[int, int] = (1, 3)) -> None:
+        self.dim = dim
+        self.ngram_range = tuple(ngram_range)
+
+    def __call__(self, texts: List[Text]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        low, high = self.ngram_range
+        for row, text in enumerate(texts):
+            text = ''.join(text.lower().split())
+            for n in range(low, high + 1):
+                for i in range(len(text) - n + 1):
+                    vectors[row, zlib.crc32(text[i:i + n].encode('utf-8')) % self.dim] += 1
+        return vectors
+
+
+class SemanticIndex:
+    """Brute-force cosine index over the user messages of policy segments.
+
+    Args:
+        vectors: One L2-normalised row per indexed message.
+        items: Payload of every row.
+    """
+
+    def __init__(self, vectors: np.ndarray, items: List[Any]) -> None:
+        self.vectors = vectors
+        self.items = items
+
+    def search(self, queries: np.ndarray, top_k: int, threshold: float) -> List[Tuple[float, Any]]:
+        """Return up to top_k (score, item) pairs scoring at least threshold, best first.
+
+        A row scores the best similarity over all query vectors, and only
+        the best row of every distinct item is kept.
+        """
+        scores = (self.vectors @ queries.T).max(axis=1)
+        hits = []
+        for row in np.argsort(-scores, kind='stable'):
+            if scores[row] < threshold or len(hits) >= top_k:
+                break
+            if all(item is not self.items[row] for _, item in hits):
+                hits.append((float(scores[row]), self.items[row]))
+        return hits
+
+
+class SemanticDPL(DPL):
+    """Match the current turn against policy segments by message similarity.
+
+    Every segment from a UserUtter to a later action is indexed by the
+    names of its actions, and within one set of names by the embedding of
+    the user message. At runtime the current turn, from the latest
+    UserUtter on, is looked up among the segments with the same action
+    names, so a reworded user message still finds its policy. Trigger
+    rules and annotated policies predict the next action, annotated
+    thoughts of the nearest policies are rendered like MatchDPL does.
+
+    Args:
+        path: Policy directory.
+        embedding: Import path of a callable turning a list of texts into
+            an array with one vector per text, hashed n-grams by default.
+        top_k: Number of policy segments whose thoughts are rendered.
+        threshold: Lowest cosine similarity counted as a match.
+        bundle: Parsed policies shared with the other strategies.
+    """
+
+    def __init__(
+            self,
+            path: Union[Text, Path],
+            embedding: Optional[Text] = None,
+            top_k: int = 3,
+            threshold: float = 0.6,
+            bundle: Optional["PolicyBundle"] = None
+    ) -> None:
+        self.embedding_path = embedding
+        self.embed: Callable[[List[Text]], Any] = import_from_path(embedding) if embedding else HashingEmbedding()
+        if not callable(self.embed):
+            raise ValueError(f"Embedding '{embedding}' is not callable")
+        self.top_k = top_k
+        self.threshold = threshold
+        self.action_index, self.thought_index = self.build(path, bundle)
+
+    def build(
+            self,
+            path: Union[Text, Path],
+            bundle: Optional["PolicyBundle"] = None
+    ) -> Tuple[Dict[Tuple, SemanticIndex], Dict[Tuple, SemanticIndex]]:
+        if bundle is not None:
+            # Vectors depend on the embedding, so it is part of the index name
+            name = 'semantic:' + json.dumps(self.embedding_path or 'hashing')
+            return bundle.index(name, lambda: self.process_policies(bundle.triggers, bundle.policies))
+        return self.process_policies(*self.load_data(path))
+
+    def load_data(self, path: Union[Text, Path]) -> Tuple[List[Dict], List[Dict]]:
+        """Load the 'triggers' and 'policies' sections of the YAML files."""
+        triggers, policies = [], []
+        path_obj = Path(path)
+
+        if not path_obj.is_dir():
+            logger.warning(f"Path {path} is not a directory")
+            return triggers, policies
+
+        for yml_file in sorted(path_obj.glob('*.yml')):
+            try:
+                data = read_yaml_from_path(yml_file)
+                if isinstance(data, dict):
+                    triggers.extend(data.get('triggers') or [])
+                    policies.extend(data.get('policies') or [])
+            except Exception as e:
+                logger.error(f"Failed to load {yml_file}: {e}")
+
+        return triggers, policies
+
+    def process_policies(
+            self,
+            triggers: List[Dict],
+            policies: List[Dict]
+    ) -> Tuple[Dict[Tuple, SemanticIndex], Dict[Tuple, SemanticIndex]]:
+        """Embed the user messages of all segments and group them into indexes.
+
+        Returns:
+            Indexes of predicted action names keyed by the action names of a
+            segment, and indexes of segments with a thought keyed by the
+            action names of the segment including the thought's action
+        """
+        actions_rows: Dict[Tuple, List] = {}
+        thoughts_rows: Dict[Tuple, List] = {}
+        seen = set()
+
+        for policy in list(triggers) + list(policies):
+            for segment in self.segments(policy.get('actions') or []):
+                names = tuple(action.get('name') for action in segment)
+                texts = self._texts(segment[0].get('result'))
+                target = segment[-1]
+                for text in texts:
+                    if (names, text) not in seen:
+                        seen.add((names, text))
+                        actions_rows.setdefault(names[:-1], []).append((text, target.get('name')))
+                if 'thought' in target:
+                    item = {'title': policy.get('title', ''), 'actions': segment}
+                    for text in texts:
+                        thoughts_rows.setdefault(names, []).append((text, item))
+
+        return self._index(actions_rows), self._index(thoughts_rows)
+
+    def segments(self, actions: List[Dict]) -> List[List[Dict]]:
+        """Segments from the nearest UserUtter before every action up to that action."""
+        segments = []
+        start = None
+        for i, action in enumerate(actions):
+            name = action.get('name')
+            if not name or name in SKIPPED_ACTIONS:
+                continue
+            if start is not None:
+                segment = [a for a in actions[start:i] if a.get('name') and a.get('name') not in SKIPPED_ACTIONS]
+                segments.append(segment + [action])
+            if name == 'UserUtter':
+                start = i
+        return segments
+
+    def _index(self, rows: Dict[Tuple, List]) -> Dict[Tuple, SemanticIndex]:
+        indexes = {}
+        for key, entries in rows.items():
+            vectors = self._normalize(self.embed([text for text, _ in entries]))
+            indexes[key] = SemanticIndex(vectors, [item for _, item in entries])
+        return indexes
+
+    @staticmethod
+    def _normalize(vectors: Any) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    @staticmethod
+    def _texts(result: Any) -> List[Text]:
+        """Non-empty messages of a UserUtter result in YAML or runtime form."""
+        if result is None:
+            return []
+        if not isinstance(result, list):
+            result = [result]
+        texts = []
+        for output in result:
+            value = output.get('text', '') if isinstance(output, dict) else str(output)
+            if value and value.strip():
+                texts.append(value.strip())
+        return texts
+
+    def _current_turn(self, dst: DST) -> Tuple[Tuple, List[Text]]:
+        """Action names from the latest UserUtter on and the messages of that UserUtter."""
+        names = []
+        for action in reversed(dst.formless_actions):
+            if action.name in SKIPPED_ACTIONS:
+                continue
+            names.append(action.name)
+            if action.name == 'UserUtter':
+                return tuple(reversed(names)), self._texts(action.result)
+        return (), []
+
+    def _search(self, index: Optional[SemanticIndex], texts: List[Text], top_k: int) -> List[Tuple[float, Any]]:
+        if index is None or not texts:
+            return []
+        return index.search(self._normalize(self.embed(texts)), top_k, self.threshold)
+
+    async def generate_actions(self, dst: DST) -> Optional[List[Text]]:
+        """Predict the action following the most similar segment of the current turn."""
+        names, texts = self._current_turn(dst)
+        hits = self._search(self.action_index.get(names), texts, 1)
+        if not hits:
+            return None
+        score, action_name = hits[0]
+        logger.debug(f"SemanticDPL matched {action_name} with similarity {score:.3f}")
+        return [action_name]
+
+    async def generate_thoughts(self, dst: DST, action: Action) -> Optional[Text]:
+        """Render the thoughts of the top_k segments most similar to the current turn."""
+        names, texts = self._current_turn(dst)
+        if not names or action is None:
+            return None
+        hits = self._search(self.thought_index.get(names + (action.name,)), texts, self.top_k)
+        if not hits:
+            return None
+        return MatchDPL.render([item for _, item in hits])
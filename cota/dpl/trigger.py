@@ -1,31 +1,55 @@
-import os
+import json
 import logging
 import itertools
 from pathlib import Path
 from typing import Text, List, Union, Optional, Dict, Any
 from cota.dst import DST
-from cota.actions.action import Action
 from cota.dpl.dpl import DPL
 
 from cota.utils.io import read_yaml_from_path
 
-from cota.utils.common import (
-    hash_str
-)
-
 logger = logging.getLogger(__name__)
 
+
+class TriggerNode:
+    """Node of the trigger trie, keyed by action tokens in reverse order."""
+    __slots__ = ('children', 'actions')
+
+    def __init__(self) -> None:
+        self.children: Dict[Text, "TriggerNode"] = {}
+        self.actions: Optional[List[Text]] = None
+
+
 class TriggerDPL(DPL):
+    """Predict the next action from trigger rules.
+
+    Every rule prefix starting at a UserUtter is compiled at load time into a
+    trie over its action tokens, stored last token first. Matching walks the
+    formless action stream once from its latest action backwards, following
+    every token variant of each action, and returns the prediction of the
+    earliest UserUtter at which a whole rule prefix ends.
+    """
+
     def __init__(
             self,
             path: Union[Text, Path],
-            actions_config: Dict[Text, Any]
+            actions_config: Dict[Text, Any],
+            bundle: Optional["PolicyBundle"] = None
     ) -> None:
         self.actions_config = actions_config
-        self.features = self.build(path)
-
-    def build(self, path: Union[Text, Path]) -> Dict[Text, List[Text]]:
-        # Load policy data from path and process it into features
+        self.form_configs = {
+            name: config['executer']['output']
+            for name, config in actions_config.items()
+            if 'executer' in config
+        }
+        self.trie = self.build(path, bundle)
+
+    def build(self, path: Union[Text, Path], bundle: Optional["PolicyBundle"] = None) -> TriggerNode:
+        if bundle is not None:
+            # Form outputs shape the tokens, so they are part of the index name
+            name = 'trigger:' + json.dumps(self.form_configs, sort_keys=True, ensure_ascii=False, default=str)
+            return bundle.index(name, lambda: self.process_policies(bundle.triggers))
+        # Load policy data from path and process it into the trie
         policies = self.load_data(path)
         return self.process_policies(policies)
 
@@ -34,21 +58,32 @@ class TriggerDPL(DPL):
         actions = dst.formless_actions
         if not actions:
             return None
-        query_index = [i for i, a in enumerate(actions) if a.name == 'UserUtter']
-        
-        if not query_index:
-            return None
-        
-        action_dicts = [action.as_dict() for action in actions]
-        for q_index in query_index:
-            segment = action_dicts[q_index:]
-            
-            keys = self._build_action_key(segment)
-            for key in keys:
-                matched_actions = self.features.get(key)
-                if matched_actions:
-                    return matched_actions
-        return None
+
+        # Active trie nodes with the variant indices used to reach them, latest first.
+        # Among matches at one UserUtter the first combination in forward order wins.
+        states = {id(self.trie): (self.trie, ())}
+        matched = None
+        for action in reversed(actions):
+            tokens = self._action_tokens(type(action).__name__, action.result or [])
+            if tokens:
+                next_states = {}
+                for node, path in states.values():
+                    for index, token in enumerate(tokens):
+                        child = node.children.get(token)
+                        if child is None:
+                            continue
+                        child_path = path + (index,)
+                        current = next_states.get(id(child))
+                        if current is None or child_path[::-1] < current[1][::-1]:
+                            next_states[id(child)] = (child, child_path)
+                states = next_states
+            if action.name == 'UserUtter':
+                terminals = [(path[::-1], node.actions) for node, path in states.values() if node.actions]
+                if terminals:
+                    matched = min(terminals, key=lambda terminal: terminal[0])[1]
+            if not states:
+                break
+        return matched
 
     def load_data(self, path: Union[Text, Path]) -> List[Dict]:
         """Load trigger policy data from YAML files.
@@ -74,16 +109,16 @@ class TriggerDPL(DPL):
                 
         return policies
 
-    def process_policies(self, policies: List[Dict]) -> Dict[Text, List[Text]]:
-        """Process policies to build features for action prediction.
+    def process_policies(self, policies: List[Dict]) -> TriggerNode:
+        """Process policies to build the trie for action prediction.
         
         Args:
             policies: List of policy dictionaries containing action sequences
             
         Returns:
-            Dictionary mapping action sequence keys t o predicted next actions
+            Root of the trie mapping reversed action token sequences to predicted next actions
         """
-        features = {}
+        trie = TriggerNode()
         
         for policy in policies:
             actions = policy.get("actions", [])
@@ -97,14 +132,17 @@ class TriggerDPL(DPL):
                     if len(segment) < 2:
                         continue
                         
-                    # Build key from action sequence excluding last action
-                    keys = self._build_action_key(segment[:-1])
+                    # Build token sequences from action sequence excluding last action
+                    sequences = self._build_action_sequences(segment[:-1])
                     
                     # Store last action as prediction
                     predicted_action = segment[-1].get('name')
-                    for key in keys:
-                        features[key] = [predicted_action]
-        return features
+                    for sequence in sequences:
+                        node = trie
+                        for token in reversed(sequence):
+                            node = node.children.setdefault(token, TriggerNode())
+                        node.actions = [predicted_action]
+        return trie
 
     def build_user_utter_index(self, actions: List[Dict]) -> List[int]:
         return [i for i, action in enumerate(actions) if action.get('name') == 'UserUtter']
@@ -121,37 +159,27 @@ class TriggerDPL(DPL):
                     segments.append(segment)
         return segments
 
-    def _build_action_key(self, actions: List[Dict]) -> List[Text]:
-        """Build key from action sequence for feature lookup."""
-        form_configs = {
-            name: config['executer']['output'] 
-            for name, config in self.actions_config.items() 
-            if 'executer' in config
-        }
-
-        def _is_form_action(action_name: Text) -> bool:
-            return action_name in form_configs
-
+    def _build_action_sequences(self, actions: List[Dict]) -> List[tuple]:
+        """Build every token sequence an action sequence can be matched by."""
         name_list = []
         for act in actions:
             action_name = act.get('name')
             if not action_name:
                 continue
-                
-            result = act.get('result', [])
-            
-            if action_name == 'UserUtter':
-                keys = self._generate_user_utter_keys(action_name, result)
-            elif action_name in form_configs:    
-                keys = self._generate_form_keys(action_name, result, form_configs[action_name])
-            else:
-                keys = [action_name]
-            
+            keys = self._action_tokens(action_name, act.get('result', []))
             # Only add non-empty keys to avoid empty combinations
             if keys:
                 name_list.append(keys)
         # Cross combine each element in name_list where each element is a list
-        return ['_'.join(item) for item in itertools.product(*name_list)]
+        return list(itertools.product(*name_list))
+
+    def _action_tokens(self, action_name: Text, result: List) -> List[Text]:
+        """Token variants of one action, empty if the action is not matched on."""
+        if action_name == 'UserUtter':
+            return self._generate_user_utter_keys(action_name, result)
+        elif action_name in self.form_configs:
+            return self._generate_form_keys(action_name, result, self.form_configs[action_name])
+        return [action_name]
 
     def _generate_user_utter_keys(self, action_name: Text, result: List) -> List[Text]:
         """Generate keys for UserUtter actions."""
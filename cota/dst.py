@@ -1,14 +1,111 @@
 import json
-import re
+import asyncio
 import logging
+import itertools
 from collections import deque
-from typing import Text, List, Dict, Any, Optional, Union, Tuple
+from typing import Text, List, Dict, Any, Optional, Union, Tuple, Callable
 from cota.actions.action import Action
 from cota.constant import DEFAULT_DIALOGUE_MAX_TOKENS
+from cota.utils.template import PromptTemplate
+from cota.utils.concurrency import gather_with_timeouts
 
 logger = logging.getLogger(__name__)
 
 
+class HistoryRendering:
+    """Per-action renderings of a DST history, kept in step with DST.actions.
+
+    Each held action is rendered once, the first time a history is needed
+    after it was appended, and the joined text of the history window is
+    extended in place. Rendering a history therefore costs O(new actions)
+    instead of O(history). Actions are expected not to change once applied.
+
+    Args:
+        render: Callable returning the rendered items of one action.
+    """
+
+    def __init__(self, render: Callable[[Action], List[Any]]) -> None:
+        self.render = render
+        # Rendered items per held action, entries[0] is the action at `offset`
+        self.entries: deque = deque()
+        self.offset = 0
+        # [window start, window end, text, segment lengths] of the cached text
+        self._text: Optional[List] = None
+        self._budget_text: Optional[Tuple] = None
+
+    def sync(self, dst: "DST") -> None:
+        """Drop entries of trimmed actions and render the appended ones."""
+        dropped = dst.offset - self.offset
+        if not 0 <= dropped <= len(self.entries) or len(self.entries) - dropped > len(dst.actions):
+            # actions were replaced wholesale, render again
+            self.entries.clear()
+            self._text = None
+            self._budget_text = None
+        else:
+            for _ in range(dropped):
+                self.entries.popleft()
+        self.offset = dst.offset
+        # negative indexes keep deque access O(1) near the tail
+        for i in range(len(self.entries) - len(dst.actions), 0):
+            self.entries.append(self.render(dst.actions[i]))
+
+    def _window(self, dst: "DST") -> Tuple[int, int]:
+        """Absolute (start, end) action positions of the rendered window."""
+        end = self.offset + len(self.entries)
+        size = len(self.entries)
+        if dst.max_history:
+            size = min(size, dst.max_history)
+        return end - size, end
+
+    def items(self, dst: "DST") -> List[Any]:
+        self.sync(dst)
+        start, _ = self._window(dst)
+        window = itertools.islice(self.entries, start - self.offset, None)
+        return [item for entry in window for item in entry]
+
+    def text(self, dst: "DST") -> Text:
+        self.sync(dst)
+        start, end = self._window(dst)
+        if dst.history_token_budget:
+            return self._fit_budget(dst, start, end)
+
+        cached = self._text
+        if cached is None or not cached[0] <= start <= cached[1] <= end:
+            cached = self._text = [start, start, "", deque()]
+        _, cached_end, text, lengths = cached
+        # drop the segments of actions that slid out of the window
+        for _ in range(start - cached[0]):
+            length = lengths.popleft()
+            if length:
+                text = text[length + 1:] if len(text) > length else ""
+        for entry in itertools.islice(self.entries, cached_end - self.offset, None):
+            segment = '\n'.join(entry)
+            lengths.append(len(segment))
+            if segment:
+                text = text + '\n' + segment if text else segment
+        cached[0], cached[1], cached[2] = start, end, text
+        return text
+
+    def _fit_budget(self, dst: "DST", start: int, end: int) -> Text:
+        """Join the latest lines of the window that fit in the token budget."""
+        if self._budget_text and self._budget_text[0] == (start, end):
+            return self._budget_text[1]
+        lines = []
+        total = 0
+        for i in range(end - self.offset - 1, start - self.offset - 1, -1):
+            for line in reversed(self.entries[i]):
+                total += dst.count_tokens(line)
+                if total > dst.history_token_budget:
+                    break
+                lines.append(line)
+            else:
+                continue
+            break
+        text = '\n'.join(reversed(lines))
+        self._budget_text = ((start, end), text)
+        return text
+
+
 class DST:
     """Dialogue State Tracker"""
 
@@ -21,14 +118,33 @@ class DST:
         self.session_id = session_id
         self.agent = agent
         self.slots = {}
+        dialogue = getattr(agent, 'dialogue', None) or {}
+        # Number of latest actions kept in memory and rendered into prompts
+        self.max_history = dialogue.get('max_history')
+        # Token budget of a rendered history, counted by the agent's history tokenizer
+        self.history_token_budget = dialogue.get('history_token_budget')
         self.actions = deque([])
+        # Input of the trigger and match policies, never bounded by max_history
         self.formless_actions = deque([])
+        # Number of UserUtters in formless_actions, counted as they are applied
+        self.formless_user_utters = 0
         self.latest_action = None
         self.current_form = None
         self.latest_query = None
         self.latest_response = None
         self.latest_sender_id = None
         self.latest_receiver_id = None
+        # Number of leading actions that have already been written to the store
+        self.persisted_index = 0
+        # Number of earlier session actions not held in self.actions
+        self.offset = 0
+        # Absolute action count covered by the latest stored snapshot
+        self.snapshot_index = 0
+        # Incrementally maintained history renderings by observer name
+        self._renderings: Dict[Text, HistoryRendering] = {}
+        # Shared format_context tasks and their waiter counts, for _contexts_state
+        self._contexts: Dict[Tuple, List] = {}
+        self._contexts_state: Optional[Tuple] = None
 
     def update_actions(self, actions: List[Action]) -> None:
         for action in actions:
@@ -43,6 +159,57 @@ class DST:
         # Apply the single action directly
         action.apply_to(self)
 
+    def unpersisted_actions(self) -> List[Action]:
+        """Actions appended since the last successful store save."""
+        return list(itertools.islice(self.actions, self.persisted_index, None))
+
+    def mark_persisted(self, count: Optional[int] = None) -> None:
+        """Advance the persisted high-water mark.
+
+        Args:
+            count: Number of newly persisted actions, defaults to all actions.
+        """
+        if count is None:
+            self.persisted_index = len(self.actions)
+        else:
+            self.persisted_index = min(self.persisted_index + count, len(self.actions))
+        self.trim_history()
+
+    def trim_history(self) -> None:
+        """Drop the oldest persisted actions beyond `max_history`.
+
+        Unpersisted actions are never dropped, the store keeps the full history.
+        """
+        if not self.max_history:
+            return
+        while len(self.actions) > self.max_history and self.persisted_index > 0:
+            self.actions.popleft()
+            self.persisted_index -= 1
+            self.offset += 1
+
+    def history_window(self) -> List[Action]:
+        """The latest `max_history` actions, all held actions if unbounded."""
+        if self.max_history and len(self.actions) > self.max_history:
+            return list(itertools.islice(self.actions, len(self.actions) - self.max_history, None))
+        return list(self.actions)
+
+    def count_tokens(self, text: Text) -> int:
+        tokenizer = getattr(self.agent, 'history_tokenizer', None)
+        if tokenizer is None:
+            return len(text)
+        return tokenizer(text)
+
+    def fit_token_budget(self, lines: List[Text]) -> List[Text]:
+        """Keep the latest lines whose tokens fit in `history_token_budget`."""
+        if not self.history_token_budget:
+            return lines
+        total = 0
+        for i in range(len(lines) - 1, -1, -1):
+            total += self.count_tokens(lines[i])
+            if total > self.history_token_budget:
+                return lines[i + 1:]
+        return lines
+
     def get_latest_query(self):
         return self.latest_query
 
@@ -56,25 +223,74 @@ class DST:
         }
 
     def extract_messages(self) -> List[Dict[Text, Any]]:
+        messages = self.rendering('messages', self._render_chat_messages).items(self)
+        if self.history_token_budget:
+            contents = self.fit_token_budget([message['content'] for message in messages])
+            messages = messages[len(messages) - len(contents):]
+        return messages
+
+    def rendering(self, name: Text, render: Callable[[Action], List[Any]]) -> HistoryRendering:
+        """Return the incrementally maintained rendering registered as `name`."""
+        rendering = self._renderings.get(name)
+        if rendering is None:
+            rendering = self._renderings[name] = HistoryRendering(render)
+        return rendering
+
+    @staticmethod
+    def _render_chat_messages(action: Action) -> List[Dict[Text, Any]]:
         from cota.actions.user_utter import UserUtter
         from cota.actions.bot_utter import BotUtter
 
-        messages = []
-        for action in self.actions:
-            # All actions are single actions now
-            if isinstance(action, UserUtter):
-                for message in action.result:
-                    messages.append({
-                        'role': 'user',
-                        'content': message.get('text','')
-                    })
-            elif isinstance(action, BotUtter):
-                for message in action.result:
-                    messages.append({
-                        'role': 'assistant',
-                        'content': message.get('text','')
-                    })
-        return messages
+        if isinstance(action, UserUtter):
+            role = 'user'
+        elif isinstance(action, BotUtter):
+            role = 'assistant'
+        else:
+            return []
+        return [{'role': role, 'content': message.get('text','')} for message in action.result]
+
+    @staticmethod
+    def _render_messages(action: Action) -> List[Text]:
+        from cota.actions.user_utter import UserUtter
+        from cota.actions.bot_utter import BotUtter
+
+        if not isinstance(action, (UserUtter, BotUtter)):
+            return []
+        return [
+            f"{message.get('sender_id', '')}:{message.get('text', '')}"
+            for message in action.result
+        ]
+
+    @staticmethod
+    def _render_action(action: Action) -> List[Text]:
+        from cota.actions.form import Form
+
+        lines = []
+        for result in action.result:
+            if len(result.get('text','')) > 0:
+                # Check if action has slots and display them
+                if isinstance(action, Form) and hasattr(action, 'slots') and action.slots:
+                    slot_json = json.dumps(action.slots, ensure_ascii=False)
+                    lines.append(f"{action.name}({slot_json}):{result.get('text','')}")
+                else:
+                    lines.append(action.name + ':' + result.get('text',''))
+        return lines
+
+    @staticmethod
+    def _render_actions(action: Action) -> List[Text]:
+        if action.name in ('Selector'):
+            return []
+        return DST._render_action(action)
+
+    @staticmethod
+    def _render_actions_with_thoughts(action: Action) -> List[Text]:
+        if action.name == 'Selector':
+            # Only output the 'thought' in result if present (now at same level as text)
+            return [
+                'thought:' + result.get('thought', '')
+                for result in action.result if result.get('thought', '')
+            ]
+        return DST._render_action(action)
 
     def as_dict(self) -> Dict[Text, Any]:
         # All actions are single actions now
@@ -110,23 +326,105 @@ class DST:
         tracker.update_actions(actions=actions)
         return tracker
 
-    def format_prompt(self, prompt: Text, action, append: Optional[Dict]=None) -> Text:
-        if append:
-            for key, value in append.items():
-                prompt = prompt.replace('{{' + key + '}}', value)
+    @property
+    def action_count(self) -> int:
+        """Total number of actions in the session, including ones not held in memory."""
+        return self.offset + len(self.actions)
+
+    def snapshot(self, window: Optional[int] = None) -> Dict[Text, Any]:
+        """Serialise the tracker state needed to resume the session.
+
+        Args:
+            window: Keep only the latest `window` actions, all held actions if None.
+                The window never drops actions of the `max_history` prompt
+                history, so it is ignored when `max_history` is unset.
+
+        Returns:
+            Dict with slots, the trimmed action window, all formless actions
+            and the latest pointers. Pointers to actions inside the window
+            are stored as indexes.
+        """
+        window = max(window, self.max_history) if window is not None and self.max_history else None
+        actions = list(self.actions)
+        if window is not None:
+            actions = actions[-window:] if window > 0 else []
+        positions = {id(action): i for i, action in enumerate(actions)}
+
+        def ref(action: Optional[Action]) -> Optional[Dict]:
+            if action is None:
+                return None
+            if id(action) in positions:
+                return {"index": positions[id(action)]}
+            return {"action": action.as_dict()}
 
-        variable_names = re.findall(r'\{\{(\w+)\}\}', prompt)
-        format_dict = {var_name: self.observe(var_name,action) for var_name in variable_names}
-        for key in format_dict:
-            prompt = prompt.replace('{{' + key + '}}', format_dict[key])
-        return prompt
+        formless_actions = list(self.formless_actions)
+
+        return {
+            "session_id": self.session_id,
+            "slots": self.slots,
+            "action_count": self.action_count,
+            "actions": [action.as_dict() for action in actions],
+            "formless_actions": [ref(action) for action in formless_actions],
+            "current_form": ref(self.current_form),
+            "latest_query": ref(self.latest_query),
+            "latest_response": ref(self.latest_response),
+            "latest_sender_id": self.latest_sender_id,
+            "latest_receiver_id": self.latest_receiver_id,
+        }
+
+    @classmethod
+    def from_snapshot(
+            cls,
+            snapshot: Dict[Text, Any],
+            actions_dict: List[Dict[Text, Any]],
+            agent
+    ) -> "DST":
+        """Restore a tracker from a snapshot and replay the actions stored after it."""
+        def build(action_dict: Dict) -> Action:
+            action = agent.build_action(action_dict.get("name"))
+            action.run_from_dict(action_dict)
+            return action
+
+        actions = [build(action_dict) for action_dict in snapshot.get("actions", [])]
+
+        def resolve(reference: Optional[Dict]) -> Optional[Action]:
+            if reference is None:
+                return None
+            if "index" in reference:
+                return actions[reference["index"]]
+            return build(reference["action"])
+
+        tracker = cls(snapshot.get("session_id"), agent=agent)
+        tracker.slots = snapshot.get("slots") or {}
+        tracker.actions = deque(actions)
+        tracker.formless_actions = deque(resolve(ref) for ref in snapshot.get("formless_actions", []))
+        tracker.formless_user_utters = sum(1 for a in tracker.formless_actions if a.name == 'UserUtter')
+        tracker.latest_action = actions[-1] if actions else None
+        tracker.current_form = resolve(snapshot.get("current_form"))
+        tracker.latest_query = resolve(snapshot.get("latest_query"))
+        tracker.latest_response = resolve(snapshot.get("latest_response"))
+        tracker.latest_sender_id = snapshot.get("latest_sender_id")
+        tracker.latest_receiver_id = snapshot.get("latest_receiver_id")
+        tracker.offset = snapshot.get("action_count", len(actions)) - len(actions)
+        tracker.snapshot_index = snapshot.get("action_count", len(actions))
+
+        tracker.update_actions([build(action_dict) for action_dict in actions_dict])
+        return tracker
+
+    def format_prompt(self, prompt: Text, action, append: Optional[Dict]=None) -> Text:
+        template = PromptTemplate.compile(prompt)
+        values = dict(append) if append else {}
+        for name in template.variables:
+            if name not in values:
+                values[name] = self.observe(name, action)
+        return template.render(values)
 
     async def format_rag(self, prompt: Text, action):
-        variable_names = re.findall(r'\{\{(\w+)\}\}', prompt)
-        if 'rag' in variable_names:
+        if 'rag' in PromptTemplate.compile(prompt):
             rag_content = await self.agent.llm_instance(action.llm).generate_chat(
                 messages = self.extract_messages(),
-                max_tokens=self.agent.dialogue.get('max_tokens', DEFAULT_DIALOGUE_MAX_TOKENS)
+                max_tokens=self.agent.dialogue.get('max_tokens', DEFAULT_DIALOGUE_MAX_TOKENS),
+                priority='low'
             )
             return {'rag': rag_content["content"]}
         return {}
@@ -137,8 +435,7 @@ class DST:
         Only supports general knowledge retrieval ({{knowledge}}).
         """
         # Find knowledge variables in prompt (only {{knowledge}} format)
-        knowledge_variables = re.findall(r'\{\{(knowledge)\}\}', prompt)
-        if not knowledge_variables:
+        if 'knowledge' not in PromptTemplate.compile(prompt):
             return {}
         
         # Get knowledge from agent
@@ -184,8 +481,7 @@ class DST:
             - Tries each dialogue policy in priority order until first valid content is generated
             - Returns the first successful policy result or empty string if all policies fail
         """
-        variable_names = re.findall(r'\{\{(\w+)\}\}', prompt)        
-        needs_policies = 'policies' in variable_names
+        needs_policies = 'policies' in PromptTemplate.compile(prompt)
         
         if not needs_policies:
             return {}
@@ -202,6 +498,67 @@ class DST:
         # No policy generated valid content
         return {'policies': ''}
 
+    def context_state(self) -> Tuple:
+        """Identify the state the knowledge and policies are computed from.
+
+        formless_actions only grows, so its length and latest action tell
+        whether it changed without walking it.
+        """
+        latest = self.formless_actions[-1] if self.formless_actions else None
+        return len(self.formless_actions), id(latest), id(self.latest_query)
+
+    async def format_context(self, prompt: Text, action) -> Dict[str, str]:
+        """Fill the knowledge and policies variables of a prompt concurrently.
+
+        Both providers may call an LLM, so they run side by side. Each is
+        bounded by `dialogue.context_timeout` (seconds, or a mapping by
+        provider name); a provider that times out or fails fills its
+        variable with an empty string.
+
+        While the context_state() is unchanged, calls with the same prompt
+        and action name share one computation, e.g. a speculated BotUtter,
+        the reply part of the Selector and the BotUtter finally selected.
+        The computation is cancelled once no caller waits for it.
+        """
+        state = self.context_state()
+        if state != self._contexts_state:
+            self._contexts, self._contexts_state = {}, state
+        key = (prompt, getattr(action, 'name', None))
+        entry = self._contexts.get(key)
+        if entry is None:
+            entry = self._contexts[key] = [asyncio.ensure_future(self._format_context(prompt, action)), 0]
+        task = entry[0]
+        if task.done():
+            return dict(task.result())
+        entry[1] += 1
+        try:
+            return dict(await asyncio.shield(task))
+        finally:
+            entry[1] -= 1
+            if not entry[1] and not task.done():
+                # e.g. a cancelled speculation was the only caller
+                task.cancel()
+                if self._contexts.get(key) is entry:
+                    del self._contexts[key]
+
+    async def _format_context(self, prompt: Text, action) -> Dict[str, str]:
+        template = PromptTemplate.compile(prompt)
+        providers = {
+            'knowledge': self.format_knowledge,
+            'policies': self.format_policies
+        }
+        results = await gather_with_timeouts(
+            {
+                name: provider(prompt, action)
+                for name, provider in providers.items() if name in template
+            },
+            self.agent.dialogue.get('context_timeout')
+        )
+        context = {}
+        for name, result in results.items():
+            context.update(result if result is not None else {name: ''})
+        return context
+
 
     def observe(self, name, action):
         if hasattr(self, name):
@@ -295,61 +652,15 @@ class DST:
             A string with all messages in format "sender_id:message_text", 
             separated by newlines.
         """
-        from cota.actions.user_utter import UserUtter
-        from cota.actions.bot_utter import BotUtter
-
-        messages = []
-        for action in self.actions:
-            # All actions are single actions now
-            if isinstance(action, (UserUtter, BotUtter)):
-                messages.extend([
-                    f"{message.get('sender_id', '')}:{message.get('text', '')}"
-                    for message in action.result
-                ])
-                    
-        return '\n'.join(messages)
+        return self.rendering('history_messages', self._render_messages).text(self)
 
     def history_actions(self, action:Action = None):
-        from cota.actions.user_utter import UserUtter
-        from cota.actions.bot_utter import BotUtter
-        from cota.actions.form import Form
-
-        actions = []
-        for action in self.actions:
-            if action.name not in ('Selector'):
-                for result in action.result:
-                    if len(result.get('text','')) > 0:
-                        # Check if action has slots and display them
-                        if isinstance(action, Form) and hasattr(action, 'slots') and action.slots:
-                            slot_json = json.dumps(action.slots, ensure_ascii=False)
-                            actions.append(f"{action.name}({slot_json}):{result.get('text','')}")
-                        else:
-                            actions.append(action.name + ':' + result.get('text',''))
-        return '\n'.join(actions)
+        return self.rendering('history_actions', self._render_actions).text(self)
 
     def history_actions_with_thoughts(self, action: Action = None):
-        from cota.actions.user_utter import UserUtter
-        from cota.actions.bot_utter import BotUtter
-        from cota.actions.form import Form
-
-        actions = []
-        for action in self.actions:
-            if action.name == 'Selector':
-                # Only output the 'thought' in result if present (now at same level as text)
-                for result in action.result:
-                    thought = result.get('thought', '')
-                    if thought:
-                        actions.append('thought:' + thought)
-            else:
-                for result in action.result:
-                    if len(result.get('text', '')) > 0:
-                        # Check if action has slots and display them
-                        if isinstance(action, Form) and hasattr(action, 'slots') and action.slots:
-                            slot_json = json.dumps(action.slots, ensure_ascii=False)
-                            actions.append(f"{action.name}({slot_json}):{result.get('text','')}")
-                        else:
-                            actions.append(action.name + ':' + result.get('text',''))
-        return '\n'.join(actions)
+        return self.rendering(
+            'history_actions_with_thoughts', self._render_actions_with_thoughts
+        ).text(self)
 
 
     def task_description(self, action:Action = None):
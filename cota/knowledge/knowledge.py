@@ -1,13 +1,18 @@
 import logging
+import functools
 from abc import ABC, abstractmethod
 from pathlib import Path
 from typing import Text, List, Union, Optional, Dict, Any
 
+from cota.utils.concurrency import first_accepted
+
 logger = logging.getLogger(__name__)
 
 
 class Knowledge(ABC):
     """Base class for knowledge retrieval systems."""
+    # Seconds a CompositeKnowledge waits for this strategy, None for no limit
+    timeout: Optional[float] = None
     
     def __init__(self, config: Dict[str, Any] = None):
         self.config = config or {}
@@ -43,26 +48,35 @@ class CompositeKnowledge(Knowledge):
     """
     Composite Knowledge - manages multiple Knowledge strategies internally.
     Implements true factory pattern: returns single object with internal strategy composition.
+
+    Strategies are tried in order and the first non-empty result wins. With
+    `parallel` they all start together; results are still taken in order and
+    the remaining strategies are cancelled once one wins. Each strategy is
+    bounded by its `timeout`.
     """
     
-    def __init__(self, strategies: List[Knowledge]):
+    def __init__(self, strategies: List[Knowledge], parallel: bool = False):
         super().__init__()
         self.strategies = strategies
+        self.parallel = parallel
         logger.info(f"CompositeKnowledge initialized with {len(strategies)} strategies: "
                    f"{[s.__class__.__name__ for s in strategies]}")
     
     async def retrieve(self, query: str, context: Dict[str, Any] = None) -> str:
-        """Iterate through strategies for knowledge retrieval, return first non-empty result."""
-        for strategy in self.strategies:
-            try:
-                result = await strategy.retrieve(query, context)
-                if result and result.strip():
-                    logger.debug(f"Knowledge retrieved by {strategy.__class__.__name__}")
-                    return result
-            except Exception as e:
-                logger.warning(f"Strategy {strategy.__class__.__name__} failed: {e}")
-                continue
-        return ""
+        """Run strategies for knowledge retrieval, return first non-empty result."""
+        name, result = await first_accepted(
+            [
+                (f"Strategy {strategy.__class__.__name__}",
+                 functools.partial(strategy.retrieve, query, context),
+                 strategy.timeout)
+                for strategy in self.strategies
+            ],
+            lambda result: bool(result and result.strip()),
+            self.parallel
+        )
+        if name:
+            logger.debug(f"Knowledge retrieved by {name}")
+        return result or ""
     
     def add_strategy(self, strategy: Knowledge) -> None:
         """Dynamically add strategy."""
@@ -81,7 +95,11 @@ class KnowledgeFactory:
     """Factory for creating Knowledge instances."""
     
     @staticmethod
-    def create(knowledge_configs: List[Dict[str, Any]], path: Text = None) -> Optional[Knowledge]:
+    def create(
+            knowledge_configs: List[Dict[str, Any]],
+            path: Text = None,
+            parallel: bool = False
+    ) -> Optional[Knowledge]:
         """Create single Knowledge object based on configuration.
         Returns CompositeKnowledge for multiple configs, single Knowledge for one config,
         or None if no configurations provided.
@@ -89,6 +107,7 @@ class KnowledgeFactory:
         Args:
             knowledge_configs: List of knowledge configuration dictionaries (can be empty)
             path: Base path for knowledge resources
+            parallel: Run the strategies of a CompositeKnowledge concurrently
             
         Returns:
             Optional[Knowledge]: Single Knowledge object, CompositeKnowledge, or None if no valid config
@@ -111,6 +130,7 @@ class KnowledgeFactory:
         for config in knowledge_configs:
             try:
                 strategy = KnowledgeFactory._create_single_knowledge(config, path)
+                strategy.timeout = config.get('timeout')
                 strategies.append(strategy)
             except Exception as e:
                 logger.error(f"Failed to create knowledge strategy from config {config}: {e}")
@@ -120,7 +140,7 @@ class KnowledgeFactory:
             logger.warning("Failed to create any knowledge strategies, knowledge will be disabled")
             return None
         
-        return CompositeKnowledge(strategies)
+        return CompositeKnowledge(strategies, parallel=parallel)
     
     @staticmethod
     def _create_single_knowledge(config: Dict[str, Any], path: Text = None) -> Knowledge:
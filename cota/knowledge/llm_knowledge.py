@@ -15,7 +15,9 @@ class LLMKnowledge(Knowledge):
         self.llms = config.get('llms', [])
         self.prompt_template = config.get('prompt', self._default_prompt())
         self.max_tokens = config.get('max_tokens', DEFAULT_DIALOGUE_MAX_TOKENS)
-        self.temperature = config.get('temperature', 0.7)
+        if 'temperature' in config:
+            # LLM.generate_chat has no sampling parameters
+            logger.warning("LLMKnowledge does not support 'temperature', the setting is ignored")
         
         if not self.llms:
             raise ValueError(f"LLM configuration is required for LLMKnowledge")
@@ -95,7 +97,8 @@ class LLMKnowledge(Knowledge):
             result = await llm_instance.generate_chat(
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=self.max_tokens,
-                temperature=self.temperature
+                priority='low',
+                cache=True
             )
             
             return result["content"]
@@ -9,6 +9,7 @@ from .base import LLMClient
 from .factory import LLMClientFactory
 from .openai import OpenAIClient, OpenAIRAGClient
 from .custom import CustomHttpClient
+from .router import LLMRouter
 
 __all__ = [
     'LLM',
@@ -16,5 +17,6 @@ __all__ = [
     'LLMClientFactory',
     'OpenAIClient',
     'OpenAIRAGClient', 
-    'CustomHttpClient'
+    'CustomHttpClient',
+    'LLMRouter'
 ]
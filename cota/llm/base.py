@@ -1,8 +1,9 @@
 """Base classes for LLM clients."""
 
+import asyncio
 import logging
 from abc import ABC, abstractmethod
-from typing import List, Dict, Text, Optional, Any, Union
+from typing import List, Dict, Text, Optional, Any, Union, AsyncIterator
 
 logger = logging.getLogger(__name__)
 
@@ -34,3 +35,37 @@ class LLMClient(ABC):
             - "tool_calls": List[Dict] (optional) - List of tool calls if tools were used
         """
         pass
+
+    async def generate_chat_stream(
+        self,
+        messages: List[Dict[Text, Text]],
+        max_tokens: int = 500,
+        response_format: Dict[Text, Text] = {"type": "text"},
+        tools: Optional[List[Dict[Text, Any]]] = None,
+        tool_choice: Optional[str] = None
+    ) -> AsyncIterator[Text]:
+        """Generate a chat completion as a stream of text deltas.
+
+        Clients without streaming support yield the whole content at once.
+
+        Yields:
+            str: The next piece of generated content
+        """
+        result = await self.generate_chat(messages, max_tokens, response_format, tools, tool_choice)
+        if result.get("content"):
+            yield result["content"]
+
+    async def generate_chat_batch(self, requests: List[Dict[Text, Any]]) -> List[Dict[Text, Any]]:
+        """Generate chat completions for several requests at once.
+
+        Each request holds the keyword arguments of generate_chat. Clients
+        without a batch endpoint run the requests concurrently.
+
+        Returns:
+            List[Dict]: One generate_chat result per request, in order
+        """
+        return list(await asyncio.gather(*(self.generate_chat(**request) for request in requests)))
+
+    async def close(self) -> None:
+        """Release resources held by the client."""
+        pass
@@ -0,0 +1,128 @@
+"""Micro-batching of concurrent calls to one LLM."""
+
+import asyncio
+import logging
+import contextlib
+from typing import List, Dict, Text, Optional, Any, Callable, Awaitable, Set
+
+from .limiter import PRIORITIES, DEFAULT_PRIORITY, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Coalesce concurrent chat calls into batch requests.
+
+    Calls submitted within `window` seconds of the first pending call are
+    sent together through `send`, at most `max_size` per batch, and each
+    caller gets its own result back. A batch is sent as soon as it is full.
+
+    With a scheduler every batch takes one admission slot when it is sent, at
+    the best priority of its calls and for their summed tokens, so pending
+    calls do not hold slots while the batch fills.
+
+    Args:
+        send: Coroutine function taking a list of request dicts and returning
+            one result per request, in order.
+        max_size: Maximum number of calls per batch.
+        window: Seconds to wait for more calls before sending a batch.
+        scheduler: Admission control of the LLM, None for none.
+    """
+
+    def __init__(
+            self,
+            send: Callable[[List[Dict[Text, Any]]], Awaitable[List[Dict[Text, Any]]]],
+            max_size: int = 8,
+            window: float = 0.01,
+            scheduler: Optional["RequestScheduler"] = None
+    ) -> None:
+        self.send = send
+        self.max_size = max_size
+        self.window = window
+        self.scheduler = scheduler
+        self._pending: List = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        # metrics
+        self.batches = 0
+        self.requests = 0
+
+    @classmethod
+    def create(
+            cls,
+            config: Optional[Dict],
+            client,
+            scheduler: Optional["RequestScheduler"] = None
+    ) -> Optional["MicroBatcher"]:
+        """Create a batcher from the `batch` section of an LLM config, None if unset."""
+        if not config:
+            return None
+        if config is True:
+            config = {}
+        return cls(
+            client.generate_chat_batch,
+            max_size=config.get('max_size', 8),
+            window=config.get('window', 0.01),
+            scheduler=scheduler
+        )
+
+    async def submit(self, request: Dict[Text, Any], priority: Optional[Text] = None) -> Dict[Text, Any]:
+        """Queue one call and wait for its result."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((request, future, priority or DEFAULT_PRIORITY))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch, self._pending = self._pending[:self.max_size], self._pending[self.max_size:]
+            task = asyncio.ensure_future(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List) -> None:
+        # skip calls cancelled while they were pending
+        batch = [(request, future, priority) for request, future, priority in batch if not future.done()]
+        if not batch:
+            return
+        self.batches += 1
+        self.requests += len(batch)
+        try:
+            async with self._slot(batch):
+                results = await self.send([request for request, _, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Batch of {len(batch)} calls returned {len(results)} results")
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            logger.warning(f"LLM batch of {len(batch)} calls failed: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            # e.g. the batch was cancelled on shutdown, never leave a caller waiting
+            for _, future, _ in batch:
+                if not future.done():
+                    future.cancel()
+
+    def _slot(self, batch: List):
+        if self.scheduler is None:
+            return contextlib.nullcontext()
+        priority = min((priority for _, _, priority in batch), key=lambda name: PRIORITIES.get(name, PRIORITIES[DEFAULT_PRIORITY]))
+        tokens = sum(estimate_tokens(request["messages"], request["max_tokens"]) for request, _, _ in batch)
+        return self.scheduler.slot(priority, tokens)
+
+    def metrics(self) -> Dict[Text, Any]:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "pending": len(self._pending),
+        }
@@ -0,0 +1,135 @@
+"""Response cache for repeated LLM calls."""
+
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import List, Dict, Text, Optional, Any
+
+from cota.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """Two tier cache of chat completion results.
+
+    Results are kept in an in-memory LRU and, when `path` is set, in a SQLite
+    file shared by processes and restarts. Keys are the SHA-256 of the
+    canonical JSON of every input that affects the completion.
+
+    Args:
+        max_size: Maximum number of results kept in memory.
+        ttl: Seconds a result stays valid in both tiers, None for no expiry.
+        path: Optional SQLite file of the persistent tier.
+    """
+
+    def __init__(
+            self,
+            max_size: int = 1024,
+            ttl: Optional[float] = None,
+            path: Optional[Text] = None
+    ) -> None:
+        self.ttl = ttl
+        self.path = path
+        self.memory = LRUCache(max_size=max_size, ttl=ttl, sliding=False)
+        self.hits = 0
+        self.misses = 0
+        self._db = None
+        self._db_lock = threading.Lock()
+        if path:
+            import sqlite3
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_expires ON llm_cache (expires)")
+            self._db.commit()
+
+    @classmethod
+    def create(cls, config: Optional[Dict]) -> Optional["ResponseCache"]:
+        """Create a cache from the `cache` section of an LLM config, None if disabled."""
+        if not config:
+            return None
+        if config is True:
+            config = {}
+        return cls(
+            max_size=config.get('max_size', 1024),
+            ttl=config.get('ttl'),
+            path=config.get('path')
+        )
+
+    @staticmethod
+    def make_key(
+            model: Optional[Text],
+            messages: List[Dict[Text, Text]],
+            max_tokens: int,
+            response_format: Optional[Dict[Text, Text]],
+            tools: Optional[List[Dict[Text, Any]]] = None,
+            tool_choice: Optional[str] = None
+    ) -> Text:
+        canonical = json.dumps(
+            {
+                "model": model,
+                "messages": messages,
+                "max_tokens": max_tokens,
+                "response_format": response_format,
+                "tools": tools,
+                "tool_choice": tool_choice,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            separators=(',', ':'),
+            default=str
+        )
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    async def get(self, key: Text) -> Optional[Dict[Text, Any]]:
+        result = self.memory.get(key)
+        if result is None and self._db is not None:
+            result = await asyncio.to_thread(self._db_get, key)
+            if result is not None:
+                self.memory.set(key, result)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # callers may mutate the result
+        return dict(result)
+
+    async def set(self, key: Text, result: Dict[Text, Any]) -> None:
+        self.memory.set(key, dict(result))
+        if self._db is not None:
+            await asyncio.to_thread(self._db_set, key, result)
+
+    def _db_get(self, key: Text) -> Optional[Dict[Text, Any]]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, expires FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        value, expires = row
+        if expires is not None and expires <= time.time():
+            return None
+        return json.loads(value)
+
+    def _db_set(self, key: Text, result: Dict[Text, Any]) -> None:
+        expires = time.time() + self.ttl if self.ttl else None
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(result, ensure_ascii=False), expires)
+            )
+            if expires is not None:
+                self._db.execute("DELETE FROM llm_cache WHERE expires <= ?", (time.time(),))
+            self._db.commit()
+
+    def close(self) -> None:
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
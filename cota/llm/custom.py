@@ -1,10 +1,12 @@
 """Custom HTTP LLM client."""
 
+import json
 import aiohttp
 import logging
-from typing import List, Dict, Text, Optional, Any, Union
+from typing import List, Dict, Text, Optional, Any, Union, AsyncIterator
 
 from .base import LLMClient
+from cota.utils.http import HttpClientManager
 
 logger = logging.getLogger(__name__)
 
@@ -15,15 +17,34 @@ class CustomHttpClient(LLMClient):
     This client provides maximum flexibility by forwarding all configuration
     parameters to the HTTP endpoint, allowing the endpoint to decide how to
     handle RAG, authentication, and other custom features.
+
+    Requests go through the pooled session of HttpClientManager, which is
+    shared by every client with the same `http_config` and closed when the
+    last of them is closed.
     """
     
-    def __init__(self, api_key: Text, base_url: Text, model: Text, **kwargs):
+    def __init__(
+            self,
+            api_key: Text,
+            base_url: Text,
+            model: Text,
+            http_config: Optional[Dict] = None,
+            batch_url: Optional[Text] = None,
+            **kwargs
+    ):
         self.api_key = api_key
         self.base_url = base_url
         self.model = model
+        self.http_config = http_config
+        self.batch_url = batch_url
         # Store all additional config parameters for flexible passing to HTTP endpoint
         self.extra_config = kwargs
-        self.session = aiohttp.ClientSession()
+        HttpClientManager.instance().acquire_session(http_config)
+        self._released = False
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        return HttpClientManager.instance().get_session(self.http_config)
 
     async def generate_chat(
         self, 
@@ -59,30 +80,122 @@ class CustomHttpClient(LLMClient):
         async with self.session.post(self.base_url, json=data, headers=headers) as response:
             response.raise_for_status()
             response_data = await response.json()
-            
-            # Ensure consistent return format - if response is a string, wrap it in a dict
-            if isinstance(response_data, str):
-                return {"content": response_data}
-            elif isinstance(response_data, dict) and "content" not in response_data:
-                # If it's a dict but doesn't have content field, assume the whole response is content
-                return {"content": str(response_data)}
-            else:
-                # If it's already a dict with content field, return as is
-                return response_data
+            return self._normalize(response_data)
+
+    @staticmethod
+    def _normalize(response_data: Any) -> Dict[Text, Any]:
+        # Ensure consistent return format - if response is a string, wrap it in a dict
+        if isinstance(response_data, str):
+            return {"content": response_data}
+        elif isinstance(response_data, dict) and "content" not in response_data:
+            # If it's a dict but doesn't have content field, assume the whole response is content
+            return {"content": str(response_data)}
+        else:
+            # If it's already a dict with content field, return as is
+            return response_data
+
+    async def generate_chat_batch(self, requests: List[Dict[Text, Any]]) -> List[Dict[Text, Any]]:
+        """POST several requests in one call to the batch endpoint.
+
+        The body carries the model, the extra config parameters and a
+        `requests` list of per-call parameters. The endpoint answers with a
+        list of results in the same order, or a dict with such a `results`
+        list.
+        """
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+        data = {"model": self.model}
+        data.update(self.extra_config)
+        data["requests"] = [
+            {key: value for key, value in request.items() if value is not None}
+            for request in requests
+        ]
+
+        async with self.session.post(self.batch_url or self.base_url, json=data, headers=headers) as response:
+            response.raise_for_status()
+            response_data = await response.json()
+        if isinstance(response_data, dict):
+            response_data = response_data.get("results", [])
+        return [self._normalize(item) for item in response_data]
+
+    async def generate_chat_stream(
+        self,
+        messages: List[Dict[Text, Text]],
+        max_tokens: int = 500,
+        response_format: Dict[Text, Text] = {"type": "text"},
+        tools: Optional[List[Dict[Text, Any]]] = None,
+        tool_choice: Optional[str] = None
+    ) -> AsyncIterator[Text]:
+        """Request `stream: true` and read the endpoint's server-sent events.
+
+        Each `data:` event may be an OpenAI style chunk, a dict with a
+        `content` or `text` delta, or plain text. Endpoints answering
+        without an event stream are handled like generate_chat.
+        """
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream'
+        }
+        data = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "response_format": response_format
+        }
+        data.update(self.extra_config)
+        data["stream"] = True
+        if tools:
+            data["tools"] = tools
+            if tool_choice:
+                data["tool_choice"] = tool_choice
+
+        async with self.session.post(self.base_url, json=data, headers=headers) as response:
+            response.raise_for_status()
+            if 'text/event-stream' not in response.headers.get('Content-Type', ''):
+                response_data = await response.json()
+                if isinstance(response_data, dict):
+                    content = response_data.get("content", str(response_data))
+                else:
+                    content = str(response_data)
+                if content:
+                    yield content
+                return
+
+            async for line in response.content:
+                line = line.decode('utf-8').strip()
+                if not line.startswith('data:'):
+                    continue
+                payload = line[len('data:'):].strip()
+                if payload == '[DONE]':
+                    break
+                delta = self._stream_delta(payload)
+                if delta:
+                    yield delta
+
+    @staticmethod
+    def _stream_delta(payload: Text) -> Optional[Text]:
+        try:
+            event = json.loads(payload)
+        except json.JSONDecodeError:
+            return payload
+        if not isinstance(event, dict):
+            return str(event)
+        choices = event.get("choices")
+        if choices:
+            return (choices[0].get("delta") or {}).get("content")
+        return event.get("content") or event.get("text")
 
     async def __aenter__(self):
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.session.close()
-    def __del__(self):
-        if hasattr(self, 'session') and self.session and not self.session.closed:
-            # Schedule session cleanup if event loop is available
-            try:
-                import asyncio
-                loop = asyncio.get_event_loop()
-                if loop.is_running():
-                    loop.create_task(self.session.close())
-            except:
-                pass
+        await self.close()
 
+    async def close(self) -> None:
+        """Release the pooled session."""
+        if not self._released:
+            self._released = True
+            await HttpClientManager.instance().release_session(self.http_config)
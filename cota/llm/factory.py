@@ -13,6 +13,8 @@ class LLMClientFactory:
     @staticmethod
     def create_client(config: Dict) -> LLMClient:
         """Create appropriate LLM client based on configuration.
+
+        Configs with `backends` create an LLMRouter over one client per backend.
         
         Args:
             config: Configuration dictionary containing client type and parameters
@@ -23,6 +25,10 @@ class LLMClientFactory:
         Raises:
             ValueError: If client type is not supported
         """
+        if config.get('backends'):
+            from .router import LLMRouter
+            return LLMRouter.from_config(config)
+
         client_type = config.get('type', 'openai')
         
         # Extract common parameters
@@ -34,7 +40,8 @@ class LLMClientFactory:
             return OpenAIClient(
                 api_key=api_key,
                 base_url=base_url,
-                model=model
+                model=model,
+                http_config=config.get('http')
             )
         elif client_type == 'openai-rag':
             knowledge_id = config['knowledge_id']
@@ -44,17 +51,21 @@ class LLMClientFactory:
                 base_url=base_url,
                 model=model,
                 knowledge_id=knowledge_id,
-                rag_prompt=rag_prompt
+                rag_prompt=rag_prompt,
+                http_config=config.get('http')
             )
         elif client_type == 'custom':
             extra_config = {
                 k: v for k, v in config.items() 
-                if k not in ['type', 'key', 'apibase', 'model']
+                if k not in ['type', 'key', 'apibase', 'model', 'http', 'cache', 'limits', 'batch', 'weight']
             }
+            batch_config = config.get('batch')
             return CustomHttpClient(
                 api_key=api_key,
                 base_url=base_url,
                 model=model,
+                http_config=config.get('http'),
+                batch_url=batch_config.get('url') if isinstance(batch_config, dict) else None,
                 **extra_config
             )
         else:
@@ -0,0 +1,181 @@
+"""Admission control for calls to one LLM."""
+
+import time
+import heapq
+import asyncio
+import itertools
+import contextlib
+import logging
+from typing import List, Dict, Text, Optional, Any, Union
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, lower values are admitted first
+PRIORITIES = {
+    "high": 0,      # user facing replies, e.g. BotUtter
+    "normal": 1,
+    "low": 2,       # background work, e.g. policy thoughts and knowledge
+}
+DEFAULT_PRIORITY = "normal"
+
+
+class TokenBucket:
+    """Budget refilled continuously at `per_minute` units per minute."""
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds until `amount` units are available, 0 if they are now."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+
+def estimate_tokens(messages: List[Dict[Text, Any]], max_tokens: int) -> int:
+    """Conservative token estimate of a request: one token per prompt character
+    plus the completion budget."""
+    return sum(len(str(message.get("content") or "")) for message in messages) + max_tokens
+
+
+class RequestScheduler:
+    """Admit LLM calls by priority within concurrency and rate budgets.
+
+    Calls wait in a priority queue until a slot is free under
+    `max_concurrency` and the requests-per-minute and tokens-per-minute
+    buckets hold enough budget. Higher priority calls are always admitted
+    before lower priority ones, calls of the same priority in FIFO order.
+
+    Args:
+        max_concurrency: Maximum calls in flight, None for unbounded.
+        rpm: Requests per minute, None for unbounded.
+        tpm: Tokens per minute, None for unbounded.
+    """
+
+    def __init__(
+            self,
+            max_concurrency: Optional[int] = None,
+            rpm: Optional[float] = None,
+            tpm: Optional[float] = None
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.rpm = TokenBucket(rpm) if rpm else None
+        self.tpm = TokenBucket(tpm) if tpm else None
+        self.in_flight = 0
+        self._waiters: List = []
+        self._counter = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # metrics
+        self.admitted = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @classmethod
+    def create(cls, config: Optional[Dict]) -> Optional["RequestScheduler"]:
+        """Create a scheduler from the `limits` section of an LLM config, None if unset."""
+        if not config:
+            return None
+        return cls(
+            max_concurrency=config.get('max_concurrency'),
+            rpm=config.get('rpm'),
+            tpm=config.get('tpm')
+        )
+
+    def _budget_delay(self, tokens: int) -> float:
+        delay = 0.0
+        if self.rpm:
+            delay = max(delay, self.rpm.delay(1))
+        if self.tpm:
+            delay = max(delay, self.tpm.delay(tokens))
+        return delay
+
+    def _admit(self, tokens: int) -> None:
+        if self.rpm:
+            self.rpm.take(1)
+        if self.tpm:
+            self.tpm.take(tokens)
+        self.in_flight += 1
+
+    def _dispatch(self) -> None:
+        """Admit queued calls from the head of the queue while budgets allow."""
+        self._timer = None
+        while self._waiters:
+            _, _, tokens, future = self._waiters[0]
+            if future.done():
+                # cancelled while waiting
+                heapq.heappop(self._waiters)
+                continue
+            if self.max_concurrency and self.in_flight >= self.max_concurrency:
+                return
+            delay = self._budget_delay(tokens)
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            heapq.heappop(self._waiters)
+            self._admit(tokens)
+            future.set_result(None)
+
+    async def acquire(self, priority: Text = DEFAULT_PRIORITY, tokens: int = 0) -> None:
+        start = time.monotonic()
+        free = not self.max_concurrency or self.in_flight < self.max_concurrency
+        if not self._waiters and free and self._budget_delay(tokens) == 0:
+            self._admit(tokens)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            rank = PRIORITIES.get(priority, PRIORITIES[DEFAULT_PRIORITY])
+            heapq.heappush(self._waiters, (rank, next(self._counter), tokens, future))
+            if self._timer is None:
+                self._dispatch()
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # admitted just before being cancelled
+                    self.release()
+                raise
+        wait = time.monotonic() - start
+        self.admitted += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        if self._timer is not None:
+            self._timer.cancel()
+        self._dispatch()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, priority: Optional[Text] = None, tokens: int = 0):
+        await self.acquire(priority or DEFAULT_PRIORITY, tokens)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def metrics(self) -> Dict[Text, Any]:
+        queued = {name: 0 for name in PRIORITIES}
+        names = {rank: name for name, rank in PRIORITIES.items()}
+        for rank, _, _, future in self._waiters:
+            if not future.done():
+                queued[names[rank]] += 1
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": sum(queued.values()),
+            "queued": queued,
+            "admitted": self.admitted,
+            "avg_wait": self.total_wait / self.admitted if self.admitted else 0.0,
+            "max_wait": self.max_wait,
+        }
@@ -1,8 +1,12 @@
 """Main LLM class for high-level language model operations."""
 
-from typing import List, Dict, Text, Optional, Any, Union
+import contextlib
+from typing import List, Dict, Text, Optional, Any, Union, AsyncIterator
 
 from .factory import LLMClientFactory
+from .cache import ResponseCache
+from .limiter import RequestScheduler, estimate_tokens
+from .batcher import MicroBatcher
 
 
 class LLM:
@@ -19,6 +23,12 @@ class LLM:
             config: Configuration dictionary containing client type and parameters
         """
         self.client = LLMClientFactory.create_client(config)
+        # Opt-in cache of results keyed by the request inputs, used by calls passing cache=True
+        self.cache = ResponseCache.create(config.get('cache'))
+        # Opt-in admission control by concurrency, rate budgets and priority
+        self.scheduler = RequestScheduler.create(config.get('limits'))
+        # Opt-in coalescing of concurrent calls into batch requests
+        self.batcher = MicroBatcher.create(config.get('batch'), self.client, self.scheduler)
 
     async def generate_chat(
         self, 
@@ -26,7 +36,9 @@ class LLM:
         max_tokens: int = 500,
         response_format: Dict[Text, Text] = {"type": "text"},
         tools: Optional[List[Dict[Text, Any]]] = None,
-        tool_choice: Optional[str] = None
+        tool_choice: Optional[str] = None,
+        priority: Optional[Text] = None,
+        cache: bool = False
     ) -> Dict[Text, Any]:
         """Generate chat completion using the configured client.
         
@@ -36,16 +48,121 @@ class LLM:
             response_format: Response format specification
             tools: Optional list of available tools
             tool_choice: Optional tool choice specification
+            priority: Admission priority class high/normal/low when limits are configured
+            cache: Serve and store the result through the response cache when one
+                is configured; only for deterministic calls such as selection
             
         Returns:
             Dict: Always returns a dictionary with the following structure:
             - "content": str - The generated text content
             - "tool_calls": List[Dict] (optional) - List of tool calls if tools were used
         """
-        return await self.client.generate_chat(
-            messages, 
-            max_tokens, 
+        key = None
+        if cache and self.cache is not None:
+            key = self._cache_key(messages, max_tokens, response_format, tools, tool_choice)
+            result = await self.cache.get(key)
+            if result is not None:
+                return result
+
+        if self.batcher is not None:
+            # the batcher takes one scheduler slot per batch when sending it
+            result = await self.batcher.submit({
+                "messages": messages,
+                "max_tokens": max_tokens,
+                "response_format": response_format,
+                "tools": tools,
+                "tool_choice": tool_choice
+            }, priority)
+        else:
+            async with self._slot(priority, messages, max_tokens):
+                result = await self.client.generate_chat(
+                    messages,
+                    max_tokens,
+                    response_format,
+                    tools,
+                    tool_choice
+                )
+        if key is not None:
+            await self.cache.set(key, result)
+        return result
+
+    def _slot(self, priority: Optional[Text], messages: List[Dict[Text, Text]], max_tokens: int):
+        if self.scheduler is None:
+            return contextlib.nullcontext()
+        return self.scheduler.slot(priority, estimate_tokens(messages, max_tokens))
+
+    def _cache_key(self, messages, max_tokens, response_format, tools, tool_choice) -> Text:
+        return ResponseCache.make_key(
+            getattr(self.client, 'model', None),
+            messages,
+            max_tokens,
             response_format,
             tools,
             tool_choice
         )
+
+    async def generate_chat_stream(
+        self,
+        messages: List[Dict[Text, Text]],
+        max_tokens: int = 500,
+        response_format: Dict[Text, Text] = {"type": "text"},
+        tools: Optional[List[Dict[Text, Any]]] = None,
+        tool_choice: Optional[str] = None,
+        priority: Optional[Text] = None,
+        cache: bool = False
+    ) -> AsyncIterator[Text]:
+        """Generate chat completion as a stream of text deltas.
+
+        Args:
+            messages: List of message dictionaries
+            max_tokens: Maximum tokens to generate
+            response_format: Response format specification
+            tools: Optional list of available tools
+            tool_choice: Optional tool choice specification
+            priority: Admission priority class high/normal/low when limits are configured
+            cache: Serve and store the result through the response cache when one
+                is configured; only for deterministic calls such as selection
+
+        Yields:
+            str: The next piece of generated content
+        """
+        key = None
+        if cache and self.cache is not None:
+            key = self._cache_key(messages, max_tokens, response_format, tools, tool_choice)
+            result = await self.cache.get(key)
+            if result is not None:
+                if result.get("content"):
+                    yield result["content"]
+                return
+
+        chunks = []
+        async with self._slot(priority, messages, max_tokens):
+            async for delta in self.client.generate_chat_stream(
+                messages,
+                max_tokens,
+                response_format,
+                tools,
+                tool_choice
+            ):
+                chunks.append(delta)
+                yield delta
+
+        if key is not None:
+            await self.cache.set(key, {"content": ''.join(chunks)})
+
+    def metrics(self) -> Dict[Text, Any]:
+        """Cache and admission metrics of this LLM."""
+        metrics = {}
+        if self.cache is not None:
+            metrics["cache"] = {"hits": self.cache.hits, "misses": self.cache.misses}
+        if self.scheduler is not None:
+            metrics["scheduler"] = self.scheduler.metrics()
+        if self.batcher is not None:
+            metrics["batcher"] = self.batcher.metrics()
+        return metrics
+
+    async def close(self) -> None:
+        """Release resources held by the client."""
+        await self.client.close()
+        if self.cache is not None:
+            self.cache.close()
@@ -1,21 +1,108 @@
 """OpenAI compatible LLM clients."""
 
 import logging
-from typing import List, Dict, Text, Optional, Any, Union
+from typing import List, Dict, Text, Optional, Any, Union, Tuple, AsyncIterator
 
 from .base import LLMClient
+from cota.constant import DEFAULT_LLM_HTTP_CONFIG
 
 logger = logging.getLogger(__name__)
 
+# Shared httpx connection pools keyed by their limits, see shared_http_client
+_http_clients: Dict[Tuple, Any] = {}
+# Number of clients holding each shared pool
+_http_client_refs: Dict[Tuple, int] = {}
+
+
+def _http_settings(http_config: Optional[Dict] = None) -> Dict[Text, Any]:
+    return {**DEFAULT_LLM_HTTP_CONFIG, **(http_config or {})}
+
+
+def _http_pool_key(http_config: Optional[Dict] = None) -> Tuple:
+    settings = _http_settings(http_config)
+    return (
+        settings["max_connections"],
+        settings["max_keepalive_connections"],
+        settings["keepalive_expiry"],
+        settings["timeout"],
+    )
+
+
+def shared_http_client(http_config: Optional[Dict] = None):
+    """Acquire the keep-alive connection pool for the given limits.
+
+    Clients configured with the same limits share one pool, so connections to
+    an API are reused across every LLM and action of the process. Every call
+    must be paired with release_shared_http_client; the pool is closed when
+    its last holder releases it.
+    """
+    import httpx
+    from openai import DefaultAsyncHttpxClient
+
+    settings = _http_settings(http_config)
+    key = _http_pool_key(http_config)
+    _http_client_refs[key] = _http_client_refs.get(key, 0) + 1
+    client = _http_clients.get(key)
+    if client is None or client.is_closed:
+        client = _http_clients[key] = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=settings["max_connections"],
+                max_keepalive_connections=settings["max_keepalive_connections"],
+                keepalive_expiry=settings["keepalive_expiry"],
+            ),
+            timeout=settings["timeout"],
+        )
+    return client
+
+
+async def release_shared_http_client(http_config: Optional[Dict] = None) -> None:
+    """Release a pool acquired with shared_http_client, closing it after its last holder."""
+    key = _http_pool_key(http_config)
+    refs = _http_client_refs.get(key, 0) - 1
+    if refs > 0:
+        _http_client_refs[key] = refs
+        return
+    _http_client_refs.pop(key, None)
+    client = _http_clients.pop(key, None)
+    if client is not None:
+        await client.aclose()
+
+
+async def close_shared_http_clients() -> None:
+    """Close every shared connection pool, e.g. when the process exits."""
+    clients = list(_http_clients.values())
+    _http_clients.clear()
+    _http_client_refs.clear()
+    for client in clients:
+        await client.aclose()
+
+
+def _create_async_openai(api_key: Text, base_url: Text, http_config: Optional[Dict] = None):
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        max_retries=_http_settings(http_config)["max_retries"],
+        http_client=shared_http_client(http_config),
+    )
+
 
 class OpenAIClient(LLMClient):
     """Standard OpenAI compatible client."""
     
-    def __init__(self, api_key: Text, base_url: Text, model: Text):
-        from openai import OpenAI
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
+    def __init__(self, api_key: Text, base_url: Text, model: Text, http_config: Optional[Dict] = None):
+        self.client = _create_async_openai(api_key, base_url, http_config)
+        self.http_config = http_config
+        self._released = False
         self.model = model
 
+    async def close(self) -> None:
+        """Release the shared connection pool."""
+        if not self._released:
+            self._released = True
+            await release_shared_http_client(self.http_config)
+
     async def generate_chat(
         self, 
         messages: List[Dict[Text, Text]], 
@@ -39,7 +126,7 @@ class OpenAIClient(LLMClient):
                 if tool_choice:
                     request_params["tool_choice"] = tool_choice
             
-            response = self.client.chat.completions.create(**request_params)
+            response = await self.client.chat.completions.create(**request_params)
             
             # Handle response - always return consistent dictionary format
             result = {
@@ -64,17 +151,61 @@ class OpenAIClient(LLMClient):
             logger.error(f"Request failed: {e}")
             raise
 
+    async def generate_chat_stream(
+        self,
+        messages: List[Dict[Text, Text]],
+        max_tokens: int = 500,
+        response_format: Dict[Text, Text] = {"type": "text"},
+        tools: Optional[List[Dict[Text, Any]]] = None,
+        tool_choice: Optional[str] = None
+    ) -> AsyncIterator[Text]:
+        request_params = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "response_format": response_format,
+            "stream": True
+        }
+        if tools:
+            request_params["tools"] = tools
+            if tool_choice:
+                request_params["tool_choice"] = tool_choice
+
+        try:
+            stream = await self.client.chat.completions.create(**request_params)
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            logger.error(f"Stream request failed: {e}")
+            raise
+
 
 class OpenAIRAGClient(LLMClient):
     """OpenAI client with RAG (Retrieval-Augmented Generation) support."""
     
-    def __init__(self, api_key: Text, base_url: Text, model: Text, knowledge_id: Text, rag_prompt: Optional[Text] = None):
-        from openai import OpenAI
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
+    def __init__(
+            self,
+            api_key: Text,
+            base_url: Text,
+            model: Text,
+            knowledge_id: Text,
+            rag_prompt: Optional[Text] = None,
+            http_config: Optional[Dict] = None
+    ):
+        self.client = _create_async_openai(api_key, base_url, http_config)
+        self.http_config = http_config
+        self._released = False
         self.model = model
         self.knowledge_id = knowledge_id
         self.rag_prompt = rag_prompt
         
+    async def close(self) -> None:
+        """Release the shared connection pool."""
+        if not self._released:
+            self._released = True
+            await release_shared_http_client(self.http_config)
+
     async def generate_chat(
         self, 
         messages: List[Dict[Text, Text]], 
@@ -113,7 +244,7 @@ class OpenAIRAGClient(LLMClient):
             if tool_choice:
                 request_params["tool_choice"] = tool_choice
             
-            response = self.client.chat.completions.create(**request_params)
+            response = await self.client.chat.completions.create(**request_params)
             
             # Handle response - always return consistent dictionary format
             result = {
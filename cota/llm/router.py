@@ -0,0 +1,374 @@
+"""LLM router spreading calls over several backends of one logical LLM."""
+
+import time
+import random
+import asyncio
+import logging
+import contextlib
+from collections import deque
+from typing import List, Dict, Text, Optional, Any, Union, AsyncIterator, Set
+
+from .base import LLMClient
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The deadline of a whole router call passed.
+
+    Unlike timeouts raised by a backend, which count as failures of that
+    backend and are retried, this ends the call.
+    """
+
+
+class CircuitBreaker:
+    """Stop calling a backend after consecutive failures.
+
+    After `failure_threshold` consecutive failures the circuit opens and the
+    backend is skipped for `reset_timeout` seconds. Then a single trial call
+    is let through (half open): success closes the circuit, failure opens it
+    again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_running = False
+
+    @property
+    def state(self) -> Text:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.trial_running:
+            return True
+        return False
+
+    def on_call(self) -> None:
+        if self.state == "half_open":
+            self.trial_running = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.trial_running = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class Backend:
+    """One client of a router with its weight, latency window and breaker."""
+
+    def __init__(
+            self,
+            client: LLMClient,
+            name: Text,
+            weight: float = 1,
+            breaker: Optional[CircuitBreaker] = None,
+            window: int = 100
+    ) -> None:
+        self.client = client
+        self.name = name
+        self.weight = weight
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies: deque = deque(maxlen=window)
+
+    @property
+    def latency(self) -> float:
+        """Mean latency of the recent successful calls, 0 when unknown."""
+        if not self.latencies:
+            return 0.0
+        return sum(self.latencies) / len(self.latencies)
+
+    def percentile(self, q: float, min_samples: int = 20) -> Optional[float]:
+        if len(self.latencies) < min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LLMRouter(LLMClient):
+    """Route chat calls of one logical LLM over several backends.
+
+    Args:
+        backends: Backends to route to.
+        strategy: `weighted` picks at random by weight, `least_latency` picks
+            the backend with the lowest recent mean latency.
+        timeout: Deadline in seconds for a whole call including retries.
+        retries: Number of retries on other backends after a failure.
+        backoff: Base delay of the jittered exponential backoff between retries.
+        max_backoff: Upper bound of a backoff delay.
+        hedge_after: Send a second request to another backend when the first
+            has not answered after this many seconds, or after the backend's
+            p95 latency with `p95`. None disables hedging.
+    """
+
+    def __init__(
+            self,
+            backends: List[Backend],
+            strategy: Text = "weighted",
+            timeout: Optional[float] = None,
+            retries: int = 2,
+            backoff: float = 0.5,
+            max_backoff: float = 8,
+            hedge_after: Union[float, Text, None] = None
+    ) -> None:
+        if not backends:
+            raise ValueError("LLM router needs at least one backend")
+        if strategy not in ("weighted", "least_latency"):
+            raise ValueError(f"Unsupported LLM routing strategy: {strategy}")
+        self.backends = backends
+        self.strategy = strategy
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_after = hedge_after
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "LLMRouter":
+        from .factory import LLMClientFactory
+
+        breaker_config = config.get('circuit_breaker') or {}
+        backends = []
+        for i, backend_config in enumerate(config['backends']):
+            backends.append(Backend(
+                client=LLMClientFactory.create_client(backend_config),
+                name=backend_config.get('name') or f"{backend_config.get('model')}#{i}",
+                weight=backend_config.get('weight', 1),
+                breaker=CircuitBreaker(
+                    failure_threshold=breaker_config.get('failure_threshold', 5),
+                    reset_timeout=breaker_config.get('reset_timeout', 30)
+                )
+            ))
+        return cls(
+            backends,
+            strategy=config.get('strategy', 'weighted'),
+            timeout=config.get('timeout'),
+            retries=config.get('retries', 2),
+            backoff=config.get('backoff', 0.5),
+            max_backoff=config.get('max_backoff', 8),
+            hedge_after=config.get('hedge_after')
+        )
+
+    @property
+    def model(self) -> Optional[Text]:
+        return getattr(self.backends[0].client, 'model', None)
+
+    def select(self, exclude: Optional[Set[Backend]] = None) -> Optional[Backend]:
+        """Pick a backend whose circuit allows calls, None if there is none."""
+        candidates = [
+            backend for backend in self.backends
+            if backend.breaker.allow() and not (exclude and backend in exclude)
+        ]
+        if not candidates:
+            return None
+        if self.strategy == "least_latency":
+            return min(candidates, key=lambda backend: backend.latency)
+        return random.choices(candidates, weights=[backend.weight for backend in candidates])[0]
+
+    def _remaining(self, deadline: Optional[float]) -> Optional[float]:
+        if deadline is None:
+            return None
+        return deadline - time.monotonic()
+
+    def _backoff_delay(self, attempt: int) -> float:
+        # full jitter
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _hedge_delay(self, backend: Backend) -> Optional[float]:
+        if self.hedge_after is None:
+            return None
+        if self.hedge_after == "p95":
+            return backend.percentile(0.95)
+        return float(self.hedge_after)
+
+    async def _call(self, backend: Backend, args: tuple) -> Dict[Text, Any]:
+        backend.breaker.on_call()
+        start = time.monotonic()
+        try:
+            result = await backend.client.generate_chat(*args)
+        except asyncio.CancelledError:
+            # a hedged request lost the race, not a backend failure
+            backend.breaker.trial_running = False
+            raise
+        except Exception:
+            backend.breaker.record_failure()
+            raise
+        backend.latencies.append(time.monotonic() - start)
+        backend.breaker.record_success()
+        return result
+
+    async def _call_hedged(
+            self,
+            backend: Backend,
+            args: tuple,
+            tried: Set[Backend],
+            deadline: Optional[float]
+    ) -> Dict[Text, Any]:
+        primary = asyncio.ensure_future(self._call(backend, args))
+        tasks = {primary}
+        try:
+            delay = self._hedge_delay(backend)
+            if delay is not None:
+                remaining = self._remaining(deadline)
+                done, _ = await asyncio.wait(
+                    tasks, timeout=delay if remaining is None else min(delay, remaining)
+                )
+                if not done:
+                    second = self.select(exclude=tried)
+                    if second is not None:
+                        tried.add(second)
+                        logger.debug(f"Hedging LLM call of {backend.name} with {second.name}")
+                        tasks.add(asyncio.ensure_future(self._call(second, args)))
+
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(
+                    tasks, timeout=self._remaining(deadline), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise DeadlineExceeded("LLM call deadline exceeded")
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def generate_chat(
+        self,
+        messages: List[Dict[Text, Text]],
+        max_tokens: int = 500,
+        response_format: Dict[Text, Text] = {"type": "text"},
+        tools: Optional[List[Dict[Text, Any]]] = None,
+        tool_choice: Optional[str] = None
+    ) -> Dict[Text, Any]:
+        args = (messages, max_tokens, response_format, tools, tool_choice)
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        tried: Set[Backend] = set()
+        last_error: Optional[BaseException] = None
+
+        for attempt in range(self.retries + 1):
+            backend = self.select(exclude=tried) or self.select()
+            if backend is None:
+                break
+            tried.add(backend)
+            try:
+                return await self._call_hedged(backend, args, tried, deadline)
+            except DeadlineExceeded as e:
+                last_error = e
+                break
+            except Exception as e:
+                last_error = e
+                logger.warning(f"LLM backend {backend.name} failed (attempt {attempt + 1}): {e}")
+
+            if attempt < self.retries:
+                delay = self._backoff_delay(attempt)
+                remaining = self._remaining(deadline)
+                if remaining is not None and remaining <= delay:
+                    break
+                await asyncio.sleep(delay)
+
+        if last_error is None:
+            raise RuntimeError("All LLM backends are unavailable")
+        raise last_error
+
+    async def generate_chat_stream(
+        self,
+        messages: List[Dict[Text, Text]],
+        max_tokens: int = 500,
+        response_format: Dict[Text, Text] = {"type": "text"},
+        tools: Optional[List[Dict[Text, Any]]] = None,
+        tool_choice: Optional[str] = None
+    ) -> AsyncIterator[Text]:
+        """Stream from one backend, failing over only before the first delta.
+
+        The deadline applies until the first delta arrives.
+        """
+        deadline = time.monotonic() + self.timeout if self.timeout else None
+        tried: Set[Backend] = set()
+        last_error: Optional[BaseException] = None
+        for attempt in range(self.retries + 1):
+            backend = self.select(exclude=tried) or self.select()
+            if backend is None:
+                break
+            tried.add(backend)
+            backend.breaker.on_call()
+            started = False
+            start = time.monotonic()
+            deltas = backend.client.generate_chat_stream(
+                messages, max_tokens, response_format, tools, tool_choice
+            )
+            try:
+                try:
+                    delta = await self._first_delta(deltas, deadline)
+                except StopAsyncIteration:
+                    pass
+                else:
+                    started = True
+                    yield delta
+                    async for delta in deltas:
+                        yield delta
+            except DeadlineExceeded as e:
+                backend.breaker.trial_running = False
+                last_error = e
+                break
+            except Exception as e:
+                backend.breaker.record_failure()
+                if started:
+                    raise
+                last_error = e
+                logger.warning(f"LLM backend {backend.name} failed to stream (attempt {attempt + 1}): {e}")
+                if attempt < self.retries:
+                    delay = self._backoff_delay(attempt)
+                    remaining = self._remaining(deadline)
+                    if remaining is not None and remaining <= delay:
+                        break
+                    await asyncio.sleep(delay)
+                continue
+            finally:
+                # also when the consumer closes the stream, so a half-open
+                # circuit does not wait forever for the end of its trial
+                backend.breaker.trial_running = False
+                await deltas.aclose()
+            backend.latencies.append(time.monotonic() - start)
+            backend.breaker.record_success()
+            return
+
+        if last_error is None:
+            raise RuntimeError("All LLM backends are unavailable")
+        raise last_error
+
+    async def _first_delta(self, deltas: AsyncIterator[Text], deadline: Optional[float]) -> Text:
+        """Wait for the first delta of a stream until the deadline."""
+        remaining = self._remaining(deadline)
+        if remaining is None:
+            return await deltas.__anext__()
+        task = asyncio.ensure_future(deltas.__anext__())
+        done, _ = await asyncio.wait({task}, timeout=max(remaining, 0))
+        if not done:
+            task.cancel()
+            with contextlib.suppress(BaseException):
+                await task
+            raise DeadlineExceeded("LLM call deadline exceeded")
+        return task.result()
+
+    async def close(self) -> None:
+        for backend in self.backends:
+            await backend.client.close()
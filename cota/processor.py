@@ -1,4 +1,7 @@
 import copy
+import uuid
+import asyncio
+import contextlib
 import logging
 from typing import Optional, List, Dict, Text, Any
 from cota.channels.channel import Channel
@@ -12,7 +15,44 @@ from cota.dst import DST
 
 logger = logging.getLogger(__name__)
 
+class SessionLocks:
+    """Per-session asyncio locks.
+
+    Turns of one session are serialised while different sessions run
+    concurrently. Locks are created on demand and dropped once no coroutine
+    holds or waits for them, so the table only grows with in-flight sessions.
+    """
+
+    def __init__(self) -> None:
+        self._locks: Dict[Text, List] = {}
+
+    @contextlib.asynccontextmanager
+    async def hold(self, session_id: Text):
+        entry = self._locks.get(session_id)
+        if entry is None:
+            entry = self._locks[session_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[session_id]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
 class Processor:
+    """Drive dialogue turns for an agent.
+
+    A processor keeps no per-session state: the tracker of a turn is passed
+    explicitly between the steps, so one processor can serve any number of
+    sessions concurrently. Turns of the same session are serialised with the
+    agent's SessionLocks.
+    """
+
     def __init__(
             self,
             agent: 'Agent',
@@ -20,23 +60,28 @@ class Processor:
     ):
         self.agent = agent
         self.store = store
-        self.dst = None  # todo
-
-    def _get_dst(self):
-        pass
-
-    def _update_dst(self):
-        pass
 
     async def handle_message(
             self,
             message: Message,
             channel: Optional[Channel] = None
-    ):
-        """handle message"""
+    ) -> DST:
+        """handle message and return the updated tracker"""
+        async with self.agent.session_locks.hold(message.session_id):
+            try:
+                return await self._handle_message(message, channel)
+            except Exception:
+                # The cached tracker may hold a half processed turn
+                self.agent.invalidate_dst(message.session_id)
+                raise
+
+    async def _handle_message(
+            self,
+            message: Message,
+            channel: Optional[Channel] = None
+    ) -> DST:
         if self.agent.dialogue.get('use_proxy_user') == True:
-            await self._handle_message_proxy(message, channel)
-            return
+            return await self._handle_message_proxy(message, channel)
 
         action = Action.build_from_name(name='UserUtter')
         action.run_from_dict({
@@ -50,24 +95,31 @@ class Processor:
         if channel:
             await self.execute_channel_effects(action, message.session_id, channel)
 
-        self.dst = await self.get_tracker(message.session_id)
-        self.dst.update(action)
+        dst = await self.get_tracker(message.session_id)
+        dst.update(action)
 
         if message.receiver != 'bot':
-            await self.save_tracker(self.dst)
-            return
+            await self.save_tracker(dst)
+            return dst
 
-        await self._handle_bot_actions(message.session_id, channel)
-        await self.save_tracker(self.dst)
+        await self._handle_bot_actions(dst, message.session_id, channel)
+        await self.save_tracker(dst)
+        return dst
 
     # TODO: Check if this is reasonable
-    async def handle_session(self, session_id:Text, channel: Optional[Channel] = None):
-        self.dst = await self.get_tracker(session_id)
-        await self._handle_bot_actions(session_id, channel)
-        await self.save_tracker(self.dst)
-
-    async def _handle_message_proxy(self, message: Message, channel: Optional[Channel] = None):
-        self.dst = await self.get_tracker(message.session_id)
+    async def handle_session(self, session_id:Text, channel: Optional[Channel] = None) -> DST:
+        async with self.agent.session_locks.hold(session_id):
+            try:
+                dst = await self.get_tracker(session_id)
+                await self._handle_bot_actions(dst, session_id, channel)
+                await self.save_tracker(dst)
+                return dst
+            except Exception:
+                self.agent.invalidate_dst(session_id)
+                raise
+
+    async def _handle_message_proxy(self, message: Message, channel: Optional[Channel] = None) -> DST:
+        dst = await self.get_tracker(message.session_id)
         # user = message.metadata.get('user') or self.agent.user
 
         max_proxy_step = self.agent.dialogue.get('max_proxy_step')                
@@ -80,9 +132,9 @@ class Processor:
                 description=action_config.get("description", DEFAULT_QUERY_DESCRIPTION),
                 prompt=action_config.get("prompt", DEFAULT_QUERY_PROMPT)
             )
-            # await action.run(self.agent, self.dst, user=user)
-            await action.run(self.agent, self.dst)
-            self.dst.update(action)
+            # await action.run(self.agent, dst, user=user)
+            await action.run(self.agent, dst)
+            dst.update(action)
             
             # Output user's message to channel first
             if channel:
@@ -90,20 +142,24 @@ class Processor:
             
             # Check if user wants to stop the conversation based on state field in JSON response
             if action.result and action.result[0].get('state', 'continue') == 'stop':
-                logger.debug(f"Conversation ending - Final DST state: \n {self.dst.current_state()}")
-                return 
+                logger.debug(f"Conversation ending - Final DST state: \n {dst.current_state()}")
+                return dst
 
-            await self._handle_bot_actions(message.session_id, channel)
-        await self.save_tracker(self.dst)
+            await self._handle_bot_actions(dst, message.session_id, channel)
+        await self.save_tracker(dst)
+        return dst
 
-    async def _handle_bot_actions(self, session_id: Text, channel: Optional[Channel] = None):
+    async def _handle_bot_actions(self, dst: DST, session_id: Text, channel: Optional[Channel] = None):
         while True:
-            bot_actions = await self.agent.generate_actions(self.dst)
+            bot_actions = await self.agent.generate_actions(dst)
             for action_item in bot_actions:
                 # All actions are single actions now (no tuple handling)
-                await action_item.run(self.agent, self.dst)
-                self.dst.update(action_item)
-                logger.debug(f"After DST updated: \n {self.dst.current_state()}")
+                if channel and isinstance(action_item, BotUtter) and self.agent.dialogue.get('stream'):
+                    await self._run_streaming(action_item, dst, session_id, channel)
+                else:
+                    await action_item.run(self.agent, dst)
+                dst.update(action_item)
+                logger.debug(f"After DST updated: \n {dst.current_state()}")
                 if channel:
                     await self.execute_channel_effects(action_item, session_id, channel)
                 if isinstance(action_item, BotUtter):
@@ -111,23 +167,62 @@ class Processor:
             if len(bot_actions) > 1 and isinstance(bot_actions[-1], Form) and isinstance(bot_actions[-2], BotUtter):
                 break
 
+    async def _run_streaming(self, action: BotUtter, dst: DST, session_id: Text, channel: Channel) -> None:
+        """Run a BotUtter forwarding its partial text to the channel as it is generated"""
+        stream_id = uuid.uuid4().hex
+
+        async def send_partial(text: Text) -> None:
+            await channel.send_partial_response(session_id, {
+                "text": text,
+                "stream_id": stream_id,
+                "sender": "bot",
+                "sender_id": self.agent.name,
+                "session_id": session_id
+            })
+
+        action.stream_callback = send_partial
+        try:
+            await action.run(self.agent, dst)
+        finally:
+            # Do not keep the channel alive through trackers
+            action.stream_callback = None
+
     async def get_tracker(
             self, session_id: Text
     ) -> Optional[DST]:
-        """Get tracker based on session_id"""
-        actions_dict = await self.store.retrieve(session_id)
-        if actions_dict is None:
+        """Get tracker based on session_id
+
+        Trackers kept in the agent's DST cache are returned as is, otherwise
+        the tracker is rebuilt from the latest stored snapshot, if any, plus
+        the actions held by the store after it.
+        """
+        dst_cache = self.agent.dst_cache
+        if dst_cache is not None:
+            tracker = dst_cache.get(session_id)
+            if tracker is not None:
+                return tracker
+
+        stored = await self.store.retrieve_snapshot(session_id)
+        if stored is None:
             return DST(session_id=session_id, agent=self.agent)
-        else:
+
+        snapshot, actions_dict = stored
+        if snapshot is None:
             tracker = DST.from_dict(
                 dst_dict={ "session_id": session_id, "actions": actions_dict}, 
                 agent=self.agent
             )
-            return tracker
+        else:
+            tracker = DST.from_snapshot(snapshot, actions_dict, agent=self.agent)
+        # Everything rebuilt from the store is already persisted
+        tracker.mark_persisted()
+        return tracker
 
     async def save_tracker(self, tracker: DST) -> None:
-        """Save tracker to tracker store"""
+        """Save tracker to tracker store and write it through to the DST cache"""
         await self.store.save(tracker)
+        if self.agent.dst_cache is not None:
+            self.agent.dst_cache.set(tracker.session_id, tracker)
 
     async def execute_channel_effects(
             self,
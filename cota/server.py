@@ -8,6 +8,7 @@ from sanic.response import HTTPResponse
 from sanic_cors import CORS
 
 from cota.agent import Agent
+from cota.llm.openai import close_shared_http_clients
 from typing import Text, Any, Optional
 from cota.message.message import Message
 from cota.channels.utils import convert_utters_dict
@@ -26,6 +27,13 @@ def create_app(
 
     app.ctx.agent = agent
 
+    @app.after_server_stop
+    async def cleanup_agent(app: Sanic, _) -> None:
+        if app.ctx.agent:
+            await app.ctx.agent.cleanup()
+        # The server is going away, close the pools of clients that were never closed
+        await close_shared_http_clients()
+
     @app.get("/version")
     async def get_version(request: Request) -> HTTPResponse:
         from cota import __version__
@@ -45,18 +53,32 @@ def create_app(
         meta_data = request_params.get("meta_data")
         # Generate message
         message = Message(text=text, sender=sender, sender_id=sender_id, session_id=session_id, metadata=meta_data)
-        # TODO: Need lock here
         processor = app.ctx.agent.create_processor()
-        processor.handle_message(message)
-        return response.json(processor.dst.current_state())
+        dst = await processor.handle_message(message)
+        return response.json(dst.current_state())
 
     @app.get("get/conversations/<conversation_id>/tracker")
     async def get_tracker(request: Request, conversation_id: Text):
         """Get tracker based on conversation_id"""
         processor = app.ctx.agent.create_processor()
-        dst = processor.get_tracker(conversation_id)
+        dst = await processor.get_tracker(conversation_id)
         return  response.json(dst.current_state())
 
+    @app.post("invalidate/conversations/<conversation_id>/tracker")
+    async def invalidate_tracker(request: Request, conversation_id: Text):
+        """Drop the cached tracker of conversation_id, e.g. after another worker wrote to it"""
+        app.ctx.agent.invalidate_dst(conversation_id)
+        return response.json({"invalidated": conversation_id})
+
+    @app.get("get/llm/metrics")
+    async def get_llm_metrics(request: Request) -> HTTPResponse:
+        llms = app.ctx.agent.llms or {}
+        return response.json({name: llm.metrics() for name, llm in llms.items()})
+
+    @app.get("get/agent/metrics")
+    async def get_agent_metrics(request: Request) -> HTTPResponse:
+        return response.json({"speculation": app.ctx.agent.speculation_metrics()})
+
     @app.get("get/latest/utter/conversations")
     async def get_latest_utter_conversations(request: Request):
         """Get corresponding utters based on session_ids"""
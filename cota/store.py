@@ -1,13 +1,17 @@
 import os
 import json
+import asyncio
 import contextlib
 import itertools
 import sqlalchemy as sa
+import sqlalchemy.exc
+import time
 from time import sleep
 import logging
-from typing import Text, List, Optional, Union, Dict, Iterator
+from typing import Text, List, Optional, Union, Dict, Iterator, Tuple
 from sqlalchemy import or_, and_, func, desc
 from cota.dst import DST
+from cota.utils.cache import LRUCache
 
 logger = logging.getLogger(__name__)
 
@@ -24,18 +28,41 @@ class Store:
     def create(endpoint_config: Dict) -> "Store":
         """Factory to create a store"""
         store_type = endpoint_config.get('type', None)
-        if not store_type:
-            return MemoryStore()
+        if not store_type or store_type.lower() == "memory":
+            return MemoryStore(
+                max_sessions = endpoint_config.get('max_sessions'),
+                ttl = endpoint_config.get('ttl'),
+                max_memory = endpoint_config.get('max_memory')
+            )
 
         if store_type.lower() == "sql":
+            dialect = endpoint_config.get('dialect','mysql+pymysql')
+            if AsyncSQLStore.is_async_dialect(dialect):
+                return AsyncSQLStore(
+                    dialect = dialect,
+                    host = endpoint_config.get('host','127.0.0.1'),
+                    port = endpoint_config.get('port',3306),
+                    db = endpoint_config.get('db','mysql'),
+                    username = endpoint_config.get('username','root'),
+                    password = endpoint_config.get('password',''),
+                    query = endpoint_config.get('query',{}),
+                    pool_size = endpoint_config.get('pool_size', 5),
+                    max_overflow = endpoint_config.get('max_overflow', 10),
+                    pool_pre_ping = endpoint_config.get('pool_pre_ping', True),
+                    pool_recycle = endpoint_config.get('pool_recycle', 3600),
+                    snapshot_interval = endpoint_config.get('snapshot_interval'),
+                    snapshot_window = endpoint_config.get('snapshot_window')
+                )
             store = SQLStore(
-                dialect = endpoint_config.get('dialect','mysql+pymysql'),
+                dialect = dialect,
                 host = endpoint_config.get('host','127.0.0.1'),
                 port = endpoint_config.get('port',3306),
                 db = endpoint_config.get('db','mysql'),
                 username = endpoint_config.get('username','root'),
                 password = endpoint_config.get('password',''),
-                query = endpoint_config.get('query',{})
+                query = endpoint_config.get('query',{}),
+                snapshot_interval = endpoint_config.get('snapshot_interval'),
+                snapshot_window = endpoint_config.get('snapshot_window')
             )
             return store
         return MemoryStore()
@@ -46,61 +73,119 @@ class Store:
     async def retrieve(self, session_id: Text) -> Optional[Dict]:
         raise NotImplementedError()
     
+    async def retrieve_snapshot(self, session_id: Text) -> Optional[Tuple[Optional[Dict], List[Dict]]]:
+        """Retrieve the latest tracker snapshot and the actions stored after it.
+
+        Stores without snapshot support return all actions with no snapshot.
+
+        Returns:
+            None if the session is unknown, else a (snapshot, actions) tuple.
+        """
+        actions = await self.retrieve(session_id)
+        if actions is None:
+            return None
+        return None, actions
+
     async def retrieve_conversations(self, user_id: Text):
         raise NotImplementedError()
 
+    async def close(self) -> None:
+        """Release connections held by the store."""
+        pass
+
+
+class MemorySession:
+    """Append-only action records of one session held by MemoryStore."""
+
+    __slots__ = ("records", "latest_utter", "size")
+
+    def __init__(self) -> None:
+        self.records = []
+        self.latest_utter = None
+        self.size = 0
+
 
 class MemoryStore(Store):
-    """Store tracker data"""
+    """Store tracker data in process memory, indexed by session_id.
+
+    Args:
+        max_sessions: Keep at most this many sessions, least recently used first out.
+        ttl: Drop sessions idle for more than this many seconds.
+        max_memory: Approximate cap in bytes on the serialised actions kept.
+    """
 
     def __init__(
-            self
+            self,
+            max_sessions: Optional[int] = None,
+            ttl: Optional[float] = None,
+            max_memory: Optional[int] = None
     ) -> None:
         self.max_history = None
-        self.store = list()
+        self.max_memory = max_memory
+        self.memory = 0
+        self.sessions = LRUCache(max_size=max_sessions, ttl=ttl, on_evict=self._on_evict)
+
+    def _on_evict(self, session_id: Text, session: MemorySession) -> None:
+        self.memory -= session.size
+        logger.debug(f"Evicted session '{session_id}' from memory store")
 
     async def save(self, dst: DST) -> None:
-        records = [ record for record in self.store if record["session_id"] == dst.session_id ]
-        latest_timestamp = -1
-        if len(records) > 0:
-            #records = sorted(records, key=lambda record: record["timestamp"])
-            #latest_timestamp = records[-1]["timestamp"]
-            latest_timestamp = max(record["timestamp"] for record in records)
-
-        for action in dst.actions:
+        self.sessions.expire()
+        session = self.sessions.get(dst.session_id)
+        if session is None and (dst.persisted_index or dst.offset):
+            # The session was evicted while its tracker lived on, e.g. in the
+            # agent's DST cache: write the whole tracker again, not just the delta
+            if dst.offset:
+                logger.warning(
+                    f"Session '{dst.session_id}' was evicted from memory store, "
+                    f"its first {dst.offset} actions are lost"
+                )
+            dst.persisted_index = 0
+        actions = dst.unpersisted_actions()
+        if not actions:
+            return
+
+        if session is None:
+            session = MemorySession()
+            self.sessions.set(dst.session_id, session)
+
+        for action in actions:
             action_dict = action.as_dict()
-            timestamp = action_dict.get('timestamp')
-
-            if timestamp > latest_timestamp:
-                self.store.append({
-                    'session_id': dst.session_id,
-                    'sender_id': action_dict.get("sender_id"),
-                    'receiver_id': action_dict.get("receiver_id"),
-                    'timestamp': timestamp,
-                    'action_name': action_dict.get("name"),
-                    'data': json.dumps(action_dict),
-                })
+            record = {
+                'session_id': dst.session_id,
+                'sender_id': action_dict.get("sender_id"),
+                'receiver_id': action_dict.get("receiver_id"),
+                'timestamp': action_dict.get('timestamp'),
+                'action_name': action_dict.get("name"),
+                'data': json.dumps(action_dict),
+            }
+            session.records.append(record)
+            session.size += len(record['data'])
+            self.memory += len(record['data'])
+            if record['action_name'] in ("Query", "Response"):
+                session.latest_utter = record
+        dst.mark_persisted(len(actions))
+
+        if self.max_memory is not None:
+            # Never evict the session that was just written
+            while self.memory > self.max_memory and len(self.sessions) > 1:
+                self.sessions.popitem()
 
     async def retrieve(self, session_id: Text) -> List[Dict]:
         """retrive data by session_id"""
-        records = [ record for record in self.store if record["session_id"] == session_id ]
-        
-        if len(records) == 0:
+        session = self.sessions.get(session_id)
+        if session is None or not session.records:
             logger.debug(f"No records found for session id '{session_id}'")
             return None
 
-        actions_dict = [json.loads(record.get('data')) for record in sorted(records, key=lambda record: record["timestamp"])]
-        return actions_dict
-    
+        return [json.loads(record['data']) for record in session.records]
+
     async def latest_utter(self, session_ids: List[Text]) -> List[Dict]:
         utters = []
         for session_id in session_ids:
-            print("session_id: ", session_id)
-            records = [record for record in self.store if record["session_id"] == session_id and record["action_name"] in ["Query", "Response"]]
-            if records:
-                print("records: ", records)
-                latest_utter = sorted(records, key=lambda record: record["timestamp"])[-1]
-                utters.append(json.loads(latest_utter.get("data")))
+            session = self.sessions.get(session_id)
+            if session is not None and session.latest_utter is not None:
+                utters.append(json.loads(session.latest_utter['data']))
         return utters
 
 
@@ -122,6 +207,16 @@ class SQLStore(Store):
         action_name = sa.Column(sa.String(255))
         data = sa.Column(sa.Text)
 
+    class SQLSnapshot(Base):
+        """Compact tracker state covering the first `action_count` actions of a session"""
+        __tablename__ = "snapshots"
+
+        id = sa.Column(sa.Integer, nullable=False, primary_key=True)
+        session_id = sa.Column(sa.String(255), nullable=False, index=True)
+        action_count = sa.Column(sa.Integer, nullable=False)
+        timestamp = sa.Column(sa.String(255), nullable=False)
+        data = sa.Column(sa.Text)
+
     def __init__(
             self,
             dialect: Text = "sqlite",
@@ -132,8 +227,12 @@ class SQLStore(Store):
             password: Text = None,
             login_db: Optional[Text] = None,
             query: Optional[Dict] = None,
+            snapshot_interval: Optional[int] = None,
+            snapshot_window: Optional[int] = None,
     ) -> None:
         import sqlalchemy.exc
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_window = snapshot_window
         engine_url = sa.engine.url.URL(
             dialect,
             username,
@@ -196,33 +295,77 @@ class SQLStore(Store):
         cursor.close()
         conn.close()
 
+    @staticmethod
+    def _action_row(session_id: Text, action) -> Dict:
+        """Serialise an action into a row of the actions table."""
+        data = action.as_dict()
+        return {
+            "sender_id": action.sender_id,
+            "receiver_id": action.receiver_id,
+            "session_id": session_id,
+            "timestamp": str(data.get("timestamp")),
+            "action_name": data.get("name"),
+            "data": json.dumps(data),
+        }
+
+    def _snapshot_row(self, tracker: DST) -> Optional[Dict]:
+        """Build a snapshot row when `snapshot_interval` actions were added since the last one."""
+        if not self.snapshot_interval:
+            return None
+        if tracker.action_count - tracker.snapshot_index < self.snapshot_interval:
+            return None
+        snapshot = tracker.snapshot(self.snapshot_window)
+        return {
+            "session_id": tracker.session_id,
+            "action_count": snapshot["action_count"],
+            "timestamp": str(time.time()),
+            "data": json.dumps(snapshot),
+        }
+
+    def _actions_after_snapshot(self, session_id: Text, action_count: int):
+        """Select the action data stored after the first `action_count` actions."""
+        return (
+            sa.select(self.SQLAction.data)
+            .where(self.SQLAction.session_id == session_id)
+            .order_by(self.SQLAction.timestamp, self.SQLAction.id)
+            .offset(action_count)
+        )
+
+    def _latest_snapshot(self, session_id: Text):
+        return (
+            sa.select(self.SQLSnapshot.data)
+            .where(self.SQLSnapshot.session_id == session_id)
+            .order_by(desc(self.SQLSnapshot.action_count))
+            .limit(1)
+        )
+
+    def _drop_older_snapshots(self, session_id: Text, action_count: int):
+        return sa.delete(self.SQLSnapshot).where(
+            self.SQLSnapshot.session_id == session_id,
+            self.SQLSnapshot.action_count < action_count
+        )
+
     async def save(self, tracker: DST) -> None:
+        """Append the actions added since the last save in one batched INSERT.
+
+        Every `snapshot_interval` actions a snapshot row replacing the older
+        ones of the session is written in the same transaction.
+        """
+        actions = tracker.unpersisted_actions()
+        if not actions:
+            return
+
+        rows = [self._action_row(tracker.session_id, action) for action in actions]
+        snapshot_row = self._snapshot_row(tracker)
         with self.sessionmaker() as session:
-            action_num = session.query(self.SQLAction).filter(
-                self.SQLAction.session_id == tracker.session_id
-            ).order_by(self.SQLAction.timestamp).count()
-
-            for i in range(action_num, len(tracker.actions)):
-                action = tracker.actions[i]
-                data = action.as_dict()
-                sender_id = action.sender_id
-                receiver_id = action.receiver_id
-                session_id = tracker.session_id
-                timestamp = data.get("timestamp")
-                action_name = data.get("name")
-
-                # noinspection PyArgumentList
-                session.add(
-                    self.SQLAction(
-                        sender_id=sender_id,
-                        receiver_id=receiver_id,
-                        session_id=session_id,
-                        timestamp=str(timestamp),
-                        action_name=action_name,
-                        data=json.dumps(data),
-                    )
-                )
+            session.execute(sa.insert(self.SQLAction), rows)
+            if snapshot_row:
+                session.execute(sa.insert(self.SQLSnapshot), [snapshot_row])
+                session.execute(self._drop_older_snapshots(tracker.session_id, snapshot_row["action_count"]))
             session.commit()
+        tracker.mark_persisted(len(actions))
+        if snapshot_row:
+            tracker.snapshot_index = snapshot_row["action_count"]
 
         logger.debug(f"Tracker with session_id '{tracker.session_id}' stored to database")
 
@@ -232,7 +375,7 @@ class SQLStore(Store):
         with self.sessionmaker() as session:
             serialised_actions = session.query(self.SQLAction).filter(
                     self.SQLAction.session_id == session_id
-                ).order_by(self.SQLAction.timestamp).all()
+                ).order_by(self.SQLAction.timestamp, self.SQLAction.id).all()
 
             actions_dict = [json.loads(action.data) for action in serialised_actions]
 
@@ -244,6 +387,21 @@ class SQLStore(Store):
                 logger.debug( f"Can't retrieve session id '{session_id}' from SQL storage. ")
                 return None
 
+    async def retrieve_snapshot(self, session_id: Text) -> Optional[Tuple[Optional[Dict], List[Dict]]]:
+        """Retrieve the latest snapshot and only the actions stored after it."""
+        if not self.snapshot_interval:
+            return await super().retrieve_snapshot(session_id)
+
+        with self.sessionmaker() as session:
+            data = session.execute(self._latest_snapshot(session_id)).scalar()
+            if data is None:
+                return await super().retrieve_snapshot(session_id)
+            snapshot = json.loads(data)
+            rows = session.execute(
+                self._actions_after_snapshot(session_id, snapshot["action_count"])
+            ).scalars()
+            return snapshot, [json.loads(row) for row in rows]
+
     async def latest_utter(self, session_ids: List[Text]) -> List[Dict]:
         utters = []
         with self.sessionmaker() as session:
@@ -274,4 +432,187 @@ class SQLStore(Store):
 
             for row in query:
                 utters.append(json.loads(row.data))
-        return utters
\ No newline at end of file
+        return utters
+
+
+class AsyncSQLStore(Store):
+    """Store backed by SQLAlchemy's asyncio engine.
+
+    Uses the same `actions` table as SQLStore, but every round-trip goes
+    through an async driver (e.g. `postgresql+asyncpg`, `mysql+aiomysql`,
+    `sqlite+aiosqlite`) and a pooled connection, so database latency never
+    blocks the event loop.
+    """
+
+    SQLAction = SQLStore.SQLAction
+    SQLSnapshot = SQLStore.SQLSnapshot
+
+    _snapshot_row = SQLStore._snapshot_row
+    _actions_after_snapshot = SQLStore._actions_after_snapshot
+    _latest_snapshot = SQLStore._latest_snapshot
+    _drop_older_snapshots = SQLStore._drop_older_snapshots
+
+    def __init__(
+            self,
+            dialect: Text = "sqlite+aiosqlite",
+            host: Optional[Text] = None,
+            port: Optional[int] = None,
+            db: Text = "cota.db",
+            username: Text = None,
+            password: Text = None,
+            query: Optional[Dict] = None,
+            pool_size: int = 5,
+            max_overflow: int = 10,
+            pool_pre_ping: bool = True,
+            pool_recycle: int = 3600,
+            snapshot_interval: Optional[int] = None,
+            snapshot_window: Optional[int] = None,
+    ) -> None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_window = snapshot_window
+
+        if sa.engine.url.make_url(f"{dialect}://").get_backend_name() == "sqlite":
+            # SQLite is file based, connection defaults from endpoints.yml don't apply
+            host, port, username, password = None, None, None, None
+
+        engine_url = sa.engine.url.URL.create(
+            dialect,
+            username=username,
+            password=password,
+            host=host,
+            port=port,
+            database=db,
+            query=query or {},
+        )
+        logger.debug(f"Creating async engine for '{engine_url}'.")
+
+        engine_kwargs = {
+            "pool_pre_ping": pool_pre_ping,
+            "pool_recycle": pool_recycle,
+        }
+        # SQLite uses a single-file/static pool that does not accept sizing options
+        if engine_url.get_backend_name() != "sqlite":
+            engine_kwargs["pool_size"] = pool_size
+            engine_kwargs["max_overflow"] = max_overflow
+
+        self.engine = create_async_engine(engine_url, **engine_kwargs)
+        self.sessionmaker = async_sessionmaker(self.engine, expire_on_commit=False)
+        self._schema_ready = False
+        self._schema_lock = asyncio.Lock()
+        super().__init__()
+
+    @staticmethod
+    def is_async_dialect(dialect: Text) -> bool:
+        """Whether `dialect` names an asyncio-capable SQLAlchemy driver."""
+        try:
+            return bool(sa.engine.url.make_url(f"{dialect}://").get_dialect().is_async)
+        except Exception:
+            return False
+
+    async def _ensure_schema(self) -> None:
+        """Create tables on first use, the engine cannot be awaited in __init__."""
+        if self._schema_ready:
+            return
+        async with self._schema_lock:
+            if self._schema_ready:
+                return
+            try:
+                async with self.engine.begin() as conn:
+                    await conn.run_sync(SQLStore.Base.metadata.create_all)
+                self._schema_ready = True
+            except (
+                    sqlalchemy.exc.OperationalError,
+                    sqlalchemy.exc.ProgrammingError,
+            ) as e:
+                logger.error(f"Could not create tables: {e}")
+                raise
+
+    async def save(self, tracker: DST) -> None:
+        """Append the actions added since the last save in one batched INSERT."""
+        actions = tracker.unpersisted_actions()
+        if not actions:
+            return
+
+        rows = [SQLStore._action_row(tracker.session_id, action) for action in actions]
+        snapshot_row = self._snapshot_row(tracker)
+        await self._ensure_schema()
+        async with self.sessionmaker() as session:
+            await session.execute(sa.insert(self.SQLAction), rows)
+            if snapshot_row:
+                await session.execute(sa.insert(self.SQLSnapshot), [snapshot_row])
+                await session.execute(self._drop_older_snapshots(tracker.session_id, snapshot_row["action_count"]))
+            await session.commit()
+        tracker.mark_persisted(len(actions))
+        if snapshot_row:
+            tracker.snapshot_index = snapshot_row["action_count"]
+
+        logger.debug(f"Tracker with session_id '{tracker.session_id}' stored to database")
+
+    async def retrieve(self, session_id: Text) -> Optional[List[Dict]]:
+        """Create a tracker from all previously stored actions."""
+        await self._ensure_schema()
+        statement = (
+            sa.select(self.SQLAction.data)
+            .where(self.SQLAction.session_id == session_id)
+            .order_by(self.SQLAction.timestamp, self.SQLAction.id)
+        )
+        async with self.sessionmaker() as session:
+            result = await session.execute(statement)
+            actions_dict = [json.loads(data) for data in result.scalars()]
+
+        if len(actions_dict) > 0:
+            logger.debug(f"Retrun actions dict from session id '{session_id}'")
+            return actions_dict
+        logger.debug(f"Can't retrieve session id '{session_id}' from SQL storage. ")
+        return None
+
+    async def retrieve_snapshot(self, session_id: Text) -> Optional[Tuple[Optional[Dict], List[Dict]]]:
+        """Retrieve the latest snapshot and only the actions stored after it."""
+        if not self.snapshot_interval:
+            return await super().retrieve_snapshot(session_id)
+
+        await self._ensure_schema()
+        async with self.sessionmaker() as session:
+            data = (await session.execute(self._latest_snapshot(session_id))).scalar()
+            if data is None:
+                return await super().retrieve_snapshot(session_id)
+            snapshot = json.loads(data)
+            result = await session.execute(
+                self._actions_after_snapshot(session_id, snapshot["action_count"])
+            )
+            return snapshot, [json.loads(row) for row in result.scalars()]
+
+    async def latest_utter(self, session_ids: List[Text]) -> List[Dict]:
+        await self._ensure_schema()
+        subquery = (
+            sa.select(
+                self.SQLAction.session_id,
+                func.max(self.SQLAction.timestamp).label("max_timestamp")
+            )
+            .where(
+                self.SQLAction.session_id.in_(session_ids),
+                self.SQLAction.action_name.in_(["Query", "Response"])
+            )
+            .group_by(self.SQLAction.session_id)
+            .subquery()
+        )
+        statement = (
+            sa.select(self.SQLAction.data)
+            .join(
+                subquery,
+                and_(
+                    self.SQLAction.session_id == subquery.c.session_id,
+                    self.SQLAction.timestamp == subquery.c.max_timestamp
+                )
+            )
+            .order_by(desc(self.SQLAction.timestamp))
+        )
+        async with self.sessionmaker() as session:
+            result = await session.execute(statement)
+            return [json.loads(data) for data in result.scalars()]
+
+    async def close(self) -> None:
+        """Dispose the connection pool."""
+        await self.engine.dispose()
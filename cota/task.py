@@ -1,6 +1,5 @@
 import os
 import sys
-import re
 import json
 import logging
 from pathlib import Path
@@ -11,6 +10,7 @@ from cota.agent import Agent
 from cota.llm import LLM
 from cota.message.message import Message
 from cota.utils.io import read_yaml_from_path
+from cota.utils.template import PromptTemplate
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +26,7 @@ class Task:
         self.prompt = prompt
         self.agents = agents
         self.llm = llm  # 直接存储LLM实例
+        self.dsts = {}  # latest tracker handled by each agent
 
     @classmethod
     def load_from_path(cls, path:Text) -> 'Task':
@@ -95,7 +96,7 @@ class Task:
     async def execute_task(self, task):
         logger.debug(f"Executing task {task}")
         agent = self.agents.get(task.get('agent'))
-        await agent.processor.handle_session('test_001')
+        self.dsts[agent.name] = await agent.processor.handle_session('test_001')
 
 
 
@@ -124,11 +125,8 @@ class Task:
             else:
                 raise AttributeError(f"Method {name} not found")
 
-        variable_names = re.findall(r'\{\{(\w+)\}\}', prompt)
-        format_dict = {var_name: observe(var_name) for var_name in variable_names}
-        for key in format_dict:
-            prompt = prompt.replace('{{' + key + '}}', format_dict[key])
-        return prompt
+        template = PromptTemplate.compile(prompt)
+        return template.render({name: observe(name) for name in template.variables})
 
     def agent_description(self) -> Text:
         description = ""
@@ -143,8 +141,9 @@ class Task:
     def history_messages(self) -> Text:
         merged_messages = set()
         for name, agent in self.agents.items():
-            if agent.processor.dst:
-                state = agent.processor.dst.current_state()
+            dst = self.dsts.get(name)
+            if dst:
+                state = dst.current_state()
                 logger.debug(f"Task DST State {state}")
                 for action in state.get('actions'):
                     for result in action.get('result'):
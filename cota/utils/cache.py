@@ -0,0 +1,112 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterator, Optional, Tuple
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Least-recently-used cache with optional time-to-live.
+
+    Entries are kept in an OrderedDict ordered from least to most recently
+    used, so lookups, inserts and evictions are all O(1).
+
+    Args:
+        max_size: Maximum number of entries, None for unbounded.
+        ttl: Seconds an entry stays valid, None for no expiry.
+        sliding: If True the TTL is an idle timeout refreshed on every access,
+            otherwise entries expire `ttl` seconds after they were set.
+        on_evict: Optional callback `(key, value)` invoked when an entry is
+            dropped because of size, TTL or an explicit popitem().
+    """
+
+    def __init__(
+            self,
+            max_size: Optional[int] = None,
+            ttl: Optional[float] = None,
+            sliding: bool = True,
+            on_evict: Optional[Callable[[Hashable, Any], None]] = None
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.sliding = sliding
+        self.on_evict = on_evict
+        self._data: "OrderedDict[Hashable, Tuple[Any, Optional[float]]]" = OrderedDict()
+
+    def _deadline(self) -> Optional[float]:
+        return time.monotonic() + self.ttl if self.ttl else None
+
+    def _evict(self, key: Hashable, value: Any) -> None:
+        if self.on_evict:
+            self.on_evict(key, value)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value and mark it as recently used."""
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        value, deadline = entry
+        if deadline is not None and deadline <= time.monotonic():
+            del self._data[key]
+            self._evict(key, value)
+            return default
+        self._data.move_to_end(key)
+        if self.sliding and self.ttl:
+            self._data[key] = (value, self._deadline())
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Insert or replace an entry, evicting the oldest ones if full."""
+        if key in self._data:
+            self._data.move_to_end(key)
+        self._data[key] = (value, self._deadline())
+        if self.max_size is not None:
+            while len(self._data) > self.max_size:
+                self.popitem()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove an entry without calling on_evict."""
+        entry = self._data.pop(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        return entry[0]
+
+    def popitem(self) -> Tuple[Hashable, Any]:
+        """Evict and return the least recently used entry."""
+        key, (value, _) = self._data.popitem(last=False)
+        self._evict(key, value)
+        return key, value
+
+    def expire(self) -> int:
+        """Drop expired entries and return how many were removed."""
+        if not self.ttl:
+            return 0
+        now = time.monotonic()
+        expired = []
+        for key, (value, deadline) in self._data.items():
+            if deadline > now:
+                if self.sliding:
+                    # Idle deadlines grow with recency, the rest are still alive
+                    break
+                continue
+            expired.append((key, value))
+        for key, value in expired:
+            del self._data[key]
+            self._evict(key, value)
+        return len(expired)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def keys(self) -> Iterator[Hashable]:
+        return iter(list(self._data.keys()))
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            return False
+        deadline = entry[1]
+        return deadline is None or deadline > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -113,3 +113,20 @@ def hash_str(s):
     sha256 = hashlib.sha256()
     sha256.update(s.encode('utf-8'))
     return sha256.hexdigest()
+
+def import_from_path(path: Text) -> Any:
+    """Import an object from a dotted path like `package.module.name`
+    or `package.module:name`."""
+    import importlib
+
+    if ':' in path:
+        module_name, _, attr = path.partition(':')
+    else:
+        module_name, _, attr = path.rpartition('.')
+    if not module_name or not attr:
+        raise ImportError(f"Invalid import path '{path}'")
+    module = importlib.import_module(module_name)
+    try:
+        return getattr(module, attr)
+    except AttributeError:
+        raise ImportError(f"Module '{module_name}' has no attribute '{attr}'")
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Text, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+async def _bounded(name: Text, awaitable: Awaitable, timeout: Optional[float], default: Any) -> Any:
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"{name} timed out after {timeout}s")
+    except Exception as e:
+        logger.error(f"{name} failed: {e}")
+    return default
+
+
+async def gather_with_timeouts(
+        awaitables: Dict[Text, Awaitable],
+        timeouts: Union[float, Dict[Text, float], None] = None,
+        default: Any = None
+) -> Dict[Text, Any]:
+    """Await named awaitables concurrently, each within its own timeout.
+
+    Args:
+        awaitables: Awaitables by name.
+        timeouts: Seconds for every awaitable, or per name; None for no limit.
+        default: Result of an awaitable that timed out or raised.
+
+    Returns:
+        Results by name, in the order of `awaitables`.
+    """
+    names = list(awaitables)
+    results = await asyncio.gather(*(
+        _bounded(
+            name,
+            awaitables[name],
+            timeouts.get(name) if isinstance(timeouts, dict) else timeouts,
+            default
+        )
+        for name in names
+    ))
+    return dict(zip(names, results))
+
+
+async def first_accepted(
+        calls: List[Tuple[Text, Callable[[], Awaitable], Optional[float]]],
+        accept: Callable[[Any], bool],
+        parallel: bool = False
+) -> Tuple[Optional[Text], Any]:
+    """Return the first accepted result of calls in priority order.
+
+    Each call is bounded by its own timeout; one that times out or raises
+    counts as a None result. In parallel mode every call starts at once,
+    results are still taken in priority order, and the lower priority calls
+    are cancelled as soon as one result is accepted.
+
+    Args:
+        calls: (name, coroutine function, timeout) tuples, highest priority first.
+        accept: Whether a result ends the search.
+        parallel: Start all calls together instead of one after another.
+
+    Returns:
+        Name and result of the accepted call, (None, None) if none is accepted.
+    """
+    if not parallel:
+        for name, call, timeout in calls:
+            result = await _bounded(name, call(), timeout, None)
+            if accept(result):
+                return name, result
+        return None, None
+
+    tasks = [asyncio.ensure_future(_bounded(name, call(), timeout, None)) for name, call, timeout in calls]
+    try:
+        for (name, _, _), task in zip(calls, tasks):
+            result = await task
+            if accept(result):
+                return name, result
+        return None, None
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -1,16 +1,21 @@
+import asyncio
 import logging
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple, Any
+import aiohttp
 from .client import HttpClient, HttpConfig
+from cota.constant import DEFAULT_LLM_HTTP_CONFIG
 
 logger = logging.getLogger(__name__)
 
 class HttpClientManager:
     """HTTP client manager
     
-    Unified management of HTTP client instances, implementing client reuse and lifecycle management
+    Unified management of HTTP client instances and pooled sessions, implementing client reuse and lifecycle management
     """
     _instance = None
     _clients: Dict[str, HttpClient] = {}
+    _sessions: Dict[Tuple, Tuple[asyncio.AbstractEventLoop, aiohttp.ClientSession]] = {}
+    _session_refs: Dict[Tuple, int] = {}
     
     def __init__(self):
         if HttpClientManager._instance is not None:
@@ -40,15 +45,89 @@ class HttpClientManager:
             self._clients[config_key] = client
             
         return self._clients[config_key]
+
+    def get_session(self, http_config: Optional[Dict[str, Any]] = None) -> aiohttp.ClientSession:
+        """Get or create the pooled session for the given connection settings
+        
+        Sessions with the same settings share one connector, so keep-alive
+        connections and cached DNS lookups are reused by every caller of the
+        running event loop. Must be called from a coroutine.
+        
+        Args:
+            http_config: Connection settings, see DEFAULT_LLM_HTTP_CONFIG
+            
+        Returns:
+            aiohttp.ClientSession instance
+        """
+        settings = {**DEFAULT_LLM_HTTP_CONFIG, **(http_config or {})}
+        key = self._session_key(http_config)
+        loop = asyncio.get_running_loop()
+        entry = self._sessions.get(key)
+        if entry is not None and entry[0] is loop and not entry[1].closed:
+            return entry[1]
+
+        connector = aiohttp.TCPConnector(
+            limit=settings["max_connections"],
+            limit_per_host=settings["max_connections_per_host"],
+            keepalive_timeout=settings["keepalive_expiry"],
+            ttl_dns_cache=settings["dns_cache_ttl"],
+            use_dns_cache=True,
+        )
+        session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=settings["timeout"]),
+        )
+        self._sessions[key] = (loop, session)
+        return session
     
+    @staticmethod
+    def _session_key(http_config: Optional[Dict[str, Any]] = None) -> Tuple:
+        settings = {**DEFAULT_LLM_HTTP_CONFIG, **(http_config or {})}
+        return (
+            settings["max_connections"],
+            settings["max_connections_per_host"],
+            settings["keepalive_expiry"],
+            settings["dns_cache_ttl"],
+            settings["timeout"],
+        )
+
+    def acquire_session(self, http_config: Optional[Dict[str, Any]] = None) -> None:
+        """Register a user of the pooled session for the given settings
+        
+        Every call must be paired with release_session, the session is
+        closed when its last user releases it.
+        """
+        key = self._session_key(http_config)
+        self._session_refs[key] = self._session_refs.get(key, 0) + 1
+
+    async def release_session(self, http_config: Optional[Dict[str, Any]] = None):
+        """Release a user of the pooled session, closing it after the last one"""
+        key = self._session_key(http_config)
+        refs = self._session_refs.get(key, 0) - 1
+        if refs > 0:
+            self._session_refs[key] = refs
+            return
+        self._session_refs.pop(key, None)
+        entry = self._sessions.pop(key, None)
+        if entry is not None:
+            loop, session = entry
+            if loop is asyncio.get_running_loop() and not session.closed:
+                await session.close()
+
     async def close_all(self):
-        """Close all client connections"""
+        """Close all client connections and pooled sessions"""
         for client in self._clients.values():
             await client.close()
         self._clients.clear()
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        self._session_refs.clear()
+        for loop, session in sessions:
+            if loop is asyncio.get_running_loop() and not session.closed:
+                await session.close()
     
     async def close_client(self, config_key: str):
         """Close specified client connection"""
         if config_key in self._clients:
             await self._clients[config_key].close()
-            del self._clients[config_key] 
\ No newline at end of file
+            del self._clients[config_key] 
@@ -64,4 +64,73 @@ def parser_text_with_slots(text):
     restored_text = re.sub(pattern, replace_with_slot_name, text)
     
     # Return dictionary and restored text
-    return slots, restored_text
\ No newline at end of file
+    return slots, restored_text
+
+
+_JSON_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class JSONFieldStream:
+    """Decode one string field of a JSON object while the object is streamed.
+
+    Feed the raw chunks of a streamed completion such as
+    `{"thought": "...", "text": "Hello"}` and get back the newly decoded
+    characters of `field` as soon as they arrive, so they can be forwarded
+    before the JSON is complete.
+
+    :param field: Name of the string field to decode
+    """
+
+    def __init__(self, field='text'):
+        self.pattern = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self.buffer = ''
+        self.position = None   # index of the next undecoded char of the value
+        self.done = False
+
+    def feed(self, chunk):
+        """Add a chunk and return the newly decoded part of the field value."""
+        self.buffer += chunk
+        if self.done:
+            return ''
+        if self.position is None:
+            match = self.pattern.search(self.buffer)
+            if not match:
+                return ''
+            self.position = match.end()
+
+        decoded = []
+        i = self.position
+        buffer = self.buffer
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                self.done = True
+                i += 1
+                break
+            if char != '\\':
+                decoded.append(char)
+                i += 1
+                continue
+            # wait for the rest of an escape sequence
+            if i + 1 >= len(buffer):
+                break
+            escape = buffer[i + 1]
+            if escape == 'u':
+                if i + 6 > len(buffer):
+                    break
+                code = int(buffer[i + 2:i + 6], 16)
+                if 0xD800 <= code < 0xDC00:
+                    # surrogate pair needs the next \uXXXX as well
+                    if i + 12 > len(buffer):
+                        break
+                    low = int(buffer[i + 8:i + 12], 16)
+                    decoded.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                    i += 12
+                    continue
+                decoded.append(chr(code))
+                i += 6
+                continue
+            decoded.append(_JSON_ESCAPES.get(escape, escape))
+            i += 2
+        self.position = i
+        return ''.join(decoded)
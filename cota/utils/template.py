@@ -0,0 +1,43 @@
+import re
+import functools
+from typing import Text, Dict, Tuple, Mapping, Any
+
+_VARIABLE = re.compile(r'\{\{(\w+)\}\}')
+
+
+class PromptTemplate:
+    """Prompt text with `{{variable}}` placeholders, parsed once.
+
+    The text is split into literal segments and variable names so rendering
+    is a single join, and `variables` tells callers which values a prompt
+    needs before they compute them.
+    """
+
+    def __init__(self, text: Text) -> None:
+        self.text = text
+        # Even positions are literal text, odd positions variable names
+        self.segments: Tuple[Text, ...] = tuple(_VARIABLE.split(text))
+        self.variables: Tuple[Text, ...] = tuple(dict.fromkeys(self.segments[1::2]))
+
+    @classmethod
+    @functools.lru_cache(maxsize=1024)
+    def compile(cls, text: Text) -> "PromptTemplate":
+        """Return the cached template of `text`."""
+        return cls(text)
+
+    def render(self, values: Mapping[Text, Any]) -> Text:
+        """Substitute every variable with its value in one pass.
+
+        Substituted values are not parsed again, so placeholders inside them
+        are kept as is.
+        """
+        parts = list(self.segments)
+        for i in range(1, len(parts), 2):
+            parts[i] = values[parts[i]]
+        return ''.join(parts)
+
+    def __contains__(self, name: Text) -> bool:
+        return name in self.variables
+
+    def __repr__(self) -> Text:
+        return f"PromptTemplate(variables={list(self.variables)})"
@@ -7,4 +7,18 @@ from cota.actions.action import registry
 def test_registry():
     print("registry: ", registry)
     for cls in registry:
-        print(cls.__name__)
\ No newline at end of file
+        print(cls.__name__)
+
+
+def test_resolve_by_type_reuses_classes():
+    from cota.actions.form import Form
+
+    assert Action.resolve_by_type("botutter") is BotUtter
+    assert Action.resolve_by_type("CustomGreeting") is Action.resolve_by_type("CustomGreeting")
+
+    size = len(registry)
+    first = Form.build_from_name(name="WeatherForm")
+    second = Form.build_from_name(name="WeatherForm")
+    assert type(first) is type(second)
+    assert isinstance(first, Form)
+    assert len(registry) <= size + 1
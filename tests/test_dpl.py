@@ -0,0 +1,200 @@
+import asyncio
+from collections import deque
+from cota.actions.action import Action
+import yaml
+
+
+class StubDST:
+    def __init__(self, actions):
+        self.formless_actions = deque(actions)
+        self.formless_user_utters = sum(1 for a in actions if a.name == "UserUtter")
+
+
+def build_action(name, *texts):
+    action = Action.build_from_name(name=name)
+    action.result = [{"text": text} for text in texts]
+    return action
+
+
+def test_trigger_matches_from_earliest_user_utter(tmp_path):
+    from cota.dpl.trigger import TriggerDPL
+
+    (tmp_path / "rules.yml").write_text(yaml.safe_dump({"triggers": [
+        {"title": "human", "actions": [
+            {"name": "UserUtter", "result": ["转人工", "人工客服"]},
+            {"name": "TransferToHuman", "result": "..."},
+        ]},
+        {"title": "follow up", "actions": [
+            {"name": "UserUtter", "result": ["你好"]},
+            {"name": "BotUtter", "result": "hi"},
+            {"name": "UserUtter", "result": ["退款"]},
+            {"name": "Refund", "result": "..."},
+        ]},
+    ]}, allow_unicode=True), encoding="utf-8")
+    dpl = TriggerDPL(tmp_path, actions_config={})
+
+    def predict(*actions):
+        return asyncio.run(dpl.generate_actions(StubDST(actions)))
+
+    # any message of a multi-message UserUtter may match
+    assert predict(build_action("UserUtter", "在吗", "人工客服")) == ["TransferToHuman"]
+    assert predict(
+        build_action("UserUtter", "你好"), build_action("BotUtter", "hi"), build_action("UserUtter", "退款")
+    ) == ["Refund"]
+    # the rule must cover the whole history after a UserUtter
+    assert predict(build_action("UserUtter", "转人工"), build_action("BotUtter", "hi")) is None
+    assert predict(build_action("UserUtter", "其他")) is None
+
+
+def test_match_renders_segments_from_recent_user_utters(tmp_path):
+    from cota.dpl.match import MatchDPL
+
+    (tmp_path / "data.yml").write_text(yaml.safe_dump({"policies": [
+        {"title": "greet", "actions": [
+            {"name": "UserUtter", "result": "你好"},
+            {"name": "BotUtter", "thought": "打招呼", "result": "你好"},
+        ]},
+    ]}, allow_unicode=True), encoding="utf-8")
+    dpl = MatchDPL(tmp_path)
+    history = [build_action("UserUtter", "q"), build_action("BotUtter", "a")] * 50 + [build_action("UserUtter", "q")]
+
+    thoughts = asyncio.run(dpl.generate_thoughts(StubDST(history), build_action("BotUtter")))
+    # one blank line per earlier UserUtter, then the matching segment
+    assert thoughts == "\n" * 50 + "# greet\nUserUtter:你好\nthought:打招呼\nBotUtter:你好\n\n\n"
+
+
+def test_policy_bundle_is_compiled_once(tmp_path, monkeypatch):
+    import cota.dpl.compiler as compiler
+    from cota.dpl.dpl import DPLFactory
+
+    (tmp_path / "data.yml").write_text(yaml.safe_dump({
+        "triggers": [{"title": "human", "actions": [
+            {"name": "UserUtter", "result": ["转人工"]}, {"name": "TransferToHuman", "result": "..."},
+        ]}],
+        "policies": [{"title": "greet", "actions": [
+            {"name": "UserUtter", "result": "你好"}, {"name": "BotUtter", "thought": "打招呼", "result": "你好"},
+        ]}],
+    }, allow_unicode=True), encoding="utf-8")
+    config = {"actions": {}, "policies": [{"type": "trigger"}, {"type": "match"}, {"type": "llm", "llms": "m"}]}
+    monkeypatch.setenv(compiler.BUNDLE_KEY_ENV, "test-key")
+    (tmp_path / "llm_dpl_botutter_000000000000.md").write_text("outdated", encoding="utf-8")
+
+    first = DPLFactory.create(config, str(tmp_path))
+    bundles = list((tmp_path / compiler.BUNDLE_DIR).glob("policy-*.pkl"))
+    knowledge_files = sorted(tmp_path.glob("llm_dpl_*.md"))
+    # knowledge files of earlier policy versions are removed
+    assert len(bundles) == 1 and len(knowledge_files) == 1
+    assert knowledge_files[0].name != "llm_dpl_botutter_000000000000.md"
+
+    # a later start neither parses YAML nor writes knowledge files again
+    def fail(*args, **kwargs):
+        raise AssertionError("policies should come from the bundle")
+    monkeypatch.setattr(compiler, "read_yaml_from_path", fail)
+    second = DPLFactory.create(config, str(tmp_path))
+    assert sorted(tmp_path.glob("llm_dpl_*.md")) == knowledge_files
+
+    history = StubDST([build_action("UserUtter", "转人工")])
+    assert asyncio.run(second.generate_actions(history)) == ["TransferToHuman"]
+    assert asyncio.run(second.strategies[1].generate_thoughts(history, build_action("BotUtter"))) == \
+        asyncio.run(first.strategies[1].generate_thoughts(history, build_action("BotUtter")))
+
+    # a bundle signed with another key is never unpickled
+    monkeypatch.setenv(compiler.BUNDLE_KEY_ENV, "other-key")
+    unpickled = []
+    monkeypatch.setattr(compiler.pickle, "loads", unpickled.append)
+    DPLFactory.create(config, str(tmp_path))
+    assert unpickled == []
+
+
+def test_policy_bundle_without_writable_key_is_rebuilt(tmp_path, monkeypatch):
+    import cota.dpl.compiler as compiler
+    from cota.dpl.dpl import DPLFactory
+
+    (tmp_path / "policy").mkdir()
+    (tmp_path / "policy" / "rules.yml").write_text(yaml.safe_dump({"triggers": [{"actions": [
+        {"name": "UserUtter", "result": ["转人工"]}, {"name": "TransferToHuman"},
+    ]}]}, allow_unicode=True), encoding="utf-8")
+    # a cache directory that cannot be created, as with a read-only home
+    (tmp_path / "cache").write_text("not a directory")
+    monkeypatch.delenv(compiler.BUNDLE_KEY_ENV, raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+
+    dpl = DPLFactory.create({"actions": {}, "policies": [{"type": "trigger"}]}, str(tmp_path / "policy"))
+    history = StubDST([build_action("UserUtter", "转人工")])
+    assert asyncio.run(dpl.generate_actions(history)) == ["TransferToHuman"]
+    assert not (tmp_path / "policy" / compiler.BUNDLE_DIR).exists()
+
+
+def test_parallel_composite_keeps_priority_and_cancels_the_rest():
+    from cota.dpl.dpl import DPL, CompositeDPL
+
+    class StubDPL(DPL):
+        def __init__(self, delay, actions, timeout=None):
+            self.delay = delay
+            self.actions = actions
+            self.timeout = timeout
+            self.cancelled = False
+
+        async def generate_thoughts(self, dst, action):
+            return None
+
+        async def generate_actions(self, dst):
+            try:
+                await asyncio.sleep(self.delay)
+            except asyncio.CancelledError:
+                self.cancelled = True
+                raise
+            return self.actions
+
+    async def run(strategies):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        result = await CompositeDPL(strategies, parallel=True).generate_actions(StubDST([]))
+        await asyncio.sleep(0)
+        return result, loop.time() - start
+
+    # the slower first strategy still wins over the faster second one
+    first, second, hanging = StubDPL(0.05, ["A"]), StubDPL(0, ["B"]), StubDPL(10, ["C"])
+    result, elapsed = asyncio.run(run([first, second, hanging]))
+    assert result == ["A"]
+    assert elapsed < 1
+    assert hanging.cancelled
+
+    # a strategy that runs out of time yields to the next one
+    result, elapsed = asyncio.run(run([StubDPL(10, ["A"], timeout=0.05), StubDPL(0.01, ["B"])]))
+    assert result == ["B"]
+    assert elapsed < 1
+
+
+def test_semantic_matches_reworded_user_utter(tmp_path):
+    from cota.dpl.semantic import SemanticDPL
+
+    (tmp_path / "data.yml").write_text(yaml.safe_dump({
+        "triggers": [
+            {"title": "human", "actions": [
+                {"name": "UserUtter", "result": ["转人工"]},
+                {"name": "TransferToHuman", "result": "..."},
+            ]},
+        ],
+        "policies": [
+            {"title": "refund", "actions": [
+                {"name": "UserUtter", "result": "我要申请退款"},
+                {"name": "BotUtter", "thought": "先确认订单号", "result": "请提供订单号"},
+            ]},
+        ],
+    }, allow_unicode=True), encoding="utf-8")
+    dpl = SemanticDPL(tmp_path)
+
+    def predict(*actions):
+        return asyncio.run(dpl.generate_actions(StubDST(actions)))
+
+    assert predict(build_action("UserUtter", "帮我转人工吧")) == ["TransferToHuman"]
+    assert predict(build_action("UserUtter", "申请退款")) == ["BotUtter"]
+    assert predict(build_action("UserUtter", "今天天气怎么样")) is None
+    # the action names of the turn must match the segment exactly
+    assert predict(build_action("UserUtter", "转人工"), build_action("BotUtter", "好的")) is None
+
+    thoughts = asyncio.run(dpl.generate_thoughts(
+        StubDST([build_action("UserUtter", "我想申请退款")]), build_action("BotUtter")
+    ))
+    assert thoughts == "# refund\nUserUtter:我要申请退款\nthought:先确认订单号\nBotUtter:请提供订单号\n\n"
@@ -42,3 +42,338 @@ def test_generate_chat():
 
     messages = [{'role': 'user', 'content': 'Hello'}]
     result = llm.generate_chat(messages, max_tokens=100)
+
+
+def test_openai_clients_are_async_and_share_pool():
+    import asyncio
+    from unittest.mock import AsyncMock
+    from cota.llm.openai import close_shared_http_clients
+
+    config = {'type': 'openai', 'model': 'm', 'key': 'sk-test', 'apibase': 'http://localhost:1/v1'}
+    first, second = LLM(config), LLM({**config, 'model': 'other'})
+    assert first.client.client._client is second.client.client._client
+
+    message = MagicMock(content="hi", tool_calls=None)
+    first.client.client.chat.completions.create = AsyncMock(
+        return_value=MagicMock(choices=[MagicMock(message=message)])
+    )
+    result = asyncio.run(first.generate_chat([{'role': 'user', 'content': 'Hello'}]))
+    assert result == {"content": "hi"}
+    asyncio.run(close_shared_http_clients())
+
+
+def test_response_cache_hits_memory_and_sqlite(tmp_path):
+    import asyncio
+    from cota.llm import LLMClient
+
+    class CountingClient(LLMClient):
+        model = 'm'
+        calls = 0
+
+        async def generate_chat(self, messages, *args, **kwargs):
+            CountingClient.calls += 1
+            return {"content": messages[-1]["content"].upper()}
+
+    config = {
+        'type': 'openai', 'model': 'm', 'key': 'sk-test', 'apibase': 'http://localhost:1/v1',
+        'cache': {'max_size': 8, 'ttl': 60, 'path': str(tmp_path / 'cache.db')}
+    }
+    messages = [{'role': 'user', 'content': 'hello'}]
+
+    async def run(llm):
+        llm.client = CountingClient()
+        first = await llm.generate_chat(messages, cache=True)
+        second = await llm.generate_chat(messages, cache=True)
+        other = await llm.generate_chat(messages, max_tokens=10, cache=True)
+        # calls that do not opt in always reach the model
+        uncached = await llm.generate_chat(messages)
+        await llm.close()
+        return first, second, other, uncached
+
+    assert asyncio.run(run(LLM(config))) == ({"content": "HELLO"},) * 4
+    assert CountingClient.calls == 3
+    # a fresh process is served by the sqlite tier
+    asyncio.run(run(LLM(config)))
+    assert CountingClient.calls == 4
+
+
+def test_router_fails_over_hedges_and_opens_circuit():
+    import asyncio
+    from cota.llm import LLMClient
+    from cota.llm.router import LLMRouter, Backend, CircuitBreaker
+
+    class StubClient(LLMClient):
+        def __init__(self, name, delay=0.0, fail=False):
+            self.name, self.delay, self.fail, self.calls = name, delay, fail, 0
+
+        async def generate_chat(self, *args, **kwargs):
+            self.calls += 1
+            await asyncio.sleep(self.delay)
+            if self.fail:
+                raise ConnectionError(self.name)
+            return {"content": self.name}
+
+    broken, slow, fast = StubClient("broken", fail=True), StubClient("slow", delay=1), StubClient("fast")
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    router = LLMRouter(
+        [Backend(broken, "broken", weight=1000, breaker=breaker)],
+        strategy="least_latency", retries=1, backoff=0
+    )
+    router.backends.append(Backend(fast, "fast", weight=1))
+
+    async def run():
+        failover = await router.generate_chat([])
+        # the broken backend's circuit is open, it is not called again
+        again = await router.generate_chat([])
+        hedging = LLMRouter(
+            [Backend(slow, "slow", weight=1000), Backend(fast, "fast", weight=1)],
+            strategy="least_latency", hedge_after=0.05, retries=0
+        )
+        hedged = await asyncio.wait_for(hedging.generate_chat([]), 0.5)
+        return failover, again, hedged
+
+    failover, again, hedged = asyncio.run(run())
+    assert failover == again == hedged == {"content": "fast"}
+    assert broken.calls == 1
+    assert breaker.state == "open"
+
+
+def test_router_retries_backend_timeouts_within_its_deadline():
+    import asyncio
+    from cota.llm import LLMClient
+    from cota.llm.router import LLMRouter, Backend, DeadlineExceeded
+
+    class StubClient(LLMClient):
+        def __init__(self, name, delay=0.0, error=None):
+            self.name, self.delay, self.error = name, delay, error
+
+        async def generate_chat(self, *args, **kwargs):
+            await asyncio.sleep(self.delay)
+            if self.error:
+                raise self.error
+            return {"content": self.name}
+
+        async def generate_chat_stream(self, *args, **kwargs):
+            yield (await self.generate_chat())["content"]
+
+    timing_out = Backend(StubClient("timeout", error=asyncio.TimeoutError()), "timeout", weight=1000)
+    router = LLMRouter(
+        [timing_out, Backend(StubClient("fast"), "fast", weight=1)],
+        strategy="least_latency", timeout=5, retries=1, backoff=0
+    )
+    hanging = LLMRouter([Backend(StubClient("hanging", delay=10), "hanging")], timeout=0.05, retries=0)
+
+    async def run():
+        result = await router.generate_chat([])
+        deltas = [delta async for delta in router.generate_chat_stream([])]
+        try:
+            async for _ in hanging.generate_chat_stream([]):
+                pass
+        except DeadlineExceeded:
+            return result, deltas, True
+        return result, deltas, False
+
+    result, deltas, stream_timed_out = asyncio.run(asyncio.wait_for(run(), 1))
+    # a backend timeout fails over like any other error
+    assert result == {"content": "fast"}
+    assert timing_out.breaker.failures == 2
+    assert deltas == ["fast"]
+    assert stream_timed_out
+
+
+def test_router_stream_closed_early_ends_circuit_trial():
+    import asyncio
+    from cota.llm import LLMClient
+    from cota.llm.router import LLMRouter, Backend, CircuitBreaker
+
+    class StubClient(LLMClient):
+        async def generate_chat(self, *args, **kwargs):
+            return {"content": "x"}
+
+        async def generate_chat_stream(self, *args, **kwargs):
+            yield "a"
+            yield "b"
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    router = LLMRouter([Backend(StubClient(), "half-open", breaker=breaker)])
+
+    async def run():
+        stream = router.generate_chat_stream([])
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    assert asyncio.run(run()) == "a"
+    assert breaker.state == "half_open" and breaker.allow()
+
+
+def test_scheduler_admits_by_priority():
+    import asyncio
+    from cota.llm import LLMClient
+    from cota.llm.llm import LLM
+
+    order = []
+
+    class StubClient(LLMClient):
+        async def generate_chat(self, messages, *args, **kwargs):
+            await asyncio.sleep(0.01)
+            order.append(messages[0]["content"])
+            return {"content": messages[0]["content"]}
+
+    config = {
+        "type": "openai", "model": "m", "key": "sk-test", "apibase": "http://localhost:1/v1",
+        "limits": {"max_concurrency": 1}
+    }
+    llm = LLM(config)
+    llm.client = StubClient()
+
+    async def run():
+        def call(name, priority):
+            return asyncio.ensure_future(
+                llm.generate_chat([{"role": "user", "content": name}], priority=priority)
+            )
+        first = call("first", "normal")
+        await asyncio.sleep(0)
+        rest = [call("low", "low"), call("normal", "normal"), call("high", "high")]
+        await asyncio.sleep(0)
+        queued = llm.metrics()["scheduler"]
+        await asyncio.gather(first, *rest)
+        return queued
+
+    queued = asyncio.run(run())
+    assert queued["queue_depth"] == 3
+    assert queued["queued"] == {"high": 1, "normal": 1, "low": 1}
+    assert order == ["first", "high", "normal", "low"]
+    assert llm.metrics()["scheduler"]["in_flight"] == 0
+
+
+def test_custom_clients_share_pooled_session():
+    import asyncio
+    from cota.llm.llm import LLM
+    from cota.utils.http import HttpClientManager
+
+    config = {'type': 'custom', 'model': 'm', 'key': 'k', 'apibase': 'http://localhost:1/chat', 'user_id': 'u'}
+    # constructing clients outside an event loop opens no session
+    first, second = LLM(config), LLM({**config, 'model': 'other'})
+    other = LLM({**config, 'http': {'max_connections_per_host': 4}})
+    assert 'http' not in first.client.extra_config
+
+    async def run():
+        session = first.client.session
+        assert second.client.session is session
+        assert other.client.session is not session
+        assert session.connector.limit_per_host == 0
+        assert other.client.session.connector.limit_per_host == 4
+        # the pool outlives its first client and closes with the last one
+        await first.close()
+        assert not session.closed and second.client.session is session
+        await second.close()
+        await other.close()
+        return session
+
+    assert asyncio.run(run()).closed
+
+
+def test_openai_clients_release_shared_pool():
+    import asyncio
+    from cota.llm.llm import LLM
+
+    config = {
+        "type": "openai", "model": "m", "key": "sk-test", "apibase": "http://localhost:1/v1",
+        "http": {"max_connections": 7}
+    }
+
+    async def run():
+        first, second = LLM(config), LLM({**config, "model": "other"})
+        pool = first.client.client._client
+        assert second.client.client._client is pool
+        await first.close()
+        closed_early = pool.is_closed
+        await second.close()
+        return closed_early, pool.is_closed
+
+    assert asyncio.run(run()) == (False, True)
+
+
+def test_batcher_coalesces_concurrent_calls():
+    import asyncio
+    from cota.llm import LLMClient
+    from cota.llm.llm import LLM
+
+    batches = []
+
+    class BatchClient(LLMClient):
+        async def generate_chat(self, *args, **kwargs):
+            raise AssertionError("calls should be batched")
+
+        async def generate_chat_batch(self, requests):
+            batches.append(len(requests))
+            return [{"content": request["messages"][-1]["content"].upper()} for request in requests]
+
+    config = {
+        'type': 'openai', 'model': 'm', 'key': 'sk-test', 'apibase': 'http://localhost:1/v1',
+        'batch': {'max_size': 4, 'window': 0.05},
+        # pending calls hold no admission slot, so batches fill beyond the limit
+        'limits': {'max_concurrency': 1}
+    }
+    llm = LLM(config)
+    llm.client = BatchClient()
+    llm.batcher.send = llm.client.generate_chat_batch
+
+    async def run():
+        return await asyncio.gather(*(
+            llm.generate_chat([{'role': 'user', 'content': f'm{i}'}]) for i in range(5)
+        ))
+
+    results = asyncio.run(run())
+    assert [result["content"] for result in results] == ['M0', 'M1', 'M2', 'M3', 'M4']
+    # a full batch is sent at once, the rest after the window
+    assert batches == [4, 1]
+    assert llm.metrics()["batcher"]["avg_batch_size"] == 2.5
+    assert llm.metrics()["scheduler"]["admitted"] == 2
+
+
+def test_batcher_cancels_callers_of_a_cancelled_batch():
+    import asyncio
+    from cota.llm.batcher import MicroBatcher
+
+    async def hang(requests):
+        await asyncio.sleep(10)
+
+    batcher = MicroBatcher(hang, max_size=1)
+
+    async def run():
+        call = asyncio.ensure_future(batcher.submit({"messages": [], "max_tokens": 1}))
+        await asyncio.sleep(0.01)
+        for task in list(batcher._tasks):
+            task.cancel()
+        try:
+            await asyncio.wait_for(call, 1)
+        except asyncio.CancelledError:
+            return True
+        return False
+
+    assert asyncio.run(run())
+
+
+def test_llm_knowledge_retrieves_through_llm(caplog):
+    import asyncio
+    from cota.llm import LLMClient
+    from cota.llm.llm import LLM
+    from cota.knowledge.llm_knowledge import LLMKnowledge
+
+    class StubClient(LLMClient):
+        async def generate_chat(self, messages, *args, **kwargs):
+            return {"content": "knowledge"}
+
+    llm = LLM({"type": "openai", "model": "m", "key": "sk-test", "apibase": "http://localhost:1/v1"})
+    llm.client = StubClient()
+
+    class StubAgent:
+        def llm_instance(self, name):
+            return llm
+
+    knowledge = LLMKnowledge({"llms": [{"name": "m"}], "temperature": 0.2})
+    assert asyncio.run(knowledge.retrieve("q", {"agent": StubAgent()})) == "knowledge"
+    assert "does not support 'temperature'" in caplog.text
@@ -0,0 +1,275 @@
+import asyncio
+from cota.agent import Agent
+from cota.actions.action import Action
+from cota.store import MemoryStore
+from cota.constant import DEFAULT_CONFIG
+
+
+def build_agent(**dialogue):
+    return Agent(
+        name="bot",
+        actions=DEFAULT_CONFIG["actions"],
+        store=MemoryStore(),
+        dialogue={"dst_cache": {"max_size": 10, "ttl": 60}, **dialogue},
+    )
+
+
+def test_tracker_cache_write_through_and_invalidate():
+    agent = build_agent()
+    processor = agent.create_processor()
+
+    async def run():
+        dst = await processor.get_tracker("s1")
+        action = Action.build_from_name(name="UserUtter")
+        action.run_from_dict({"result": [{"text": "hello"}]})
+        dst.update(action)
+        await processor.save_tracker(dst)
+
+        cached = await processor.get_tracker("s1")
+        agent.invalidate_dst("s1")
+        reloaded = await processor.get_tracker("s1")
+        return dst, cached, reloaded
+
+    dst, cached, reloaded = asyncio.run(run())
+    assert cached is dst
+    assert reloaded is not dst
+    assert [a.name for a in reloaded.actions] == ["UserUtter"]
+    assert reloaded.persisted_index == 1
+
+
+def test_session_locks_serialise_same_session_only():
+    agent = build_agent()
+    order = []
+
+    async def turn(session_id, tag, delay):
+        async with agent.session_locks.hold(session_id):
+            order.append(f"{tag}-start")
+            await asyncio.sleep(delay)
+            order.append(f"{tag}-end")
+
+    async def run():
+        await asyncio.gather(turn("s1", "a", 0.02), turn("s1", "b", 0), turn("s2", "c", 0))
+
+    asyncio.run(run())
+    assert order.index("a-end") < order.index("b-start")
+    assert order.index("c-end") < order.index("a-end")
+    assert len(agent.session_locks) == 0
+
+
+def test_history_window_trims_only_persisted_actions():
+    agent = build_agent(max_history=2, history_token_budget=12)
+    processor = agent.create_processor()
+
+    async def run():
+        dst = await processor.get_tracker("s1")
+        for name, text in [("UserUtter", "hello"), ("BotUtter", "hi"), ("UserUtter", "weather?")]:
+            action = Action.build_from_name(name=name)
+            action.run_from_dict({"result": [{"text": text, "sender_id": "u"}]})
+            dst.update(action)
+        rendered = dst.history_messages()
+        held = len(dst.actions)
+        await processor.save_tracker(dst)
+        return dst, rendered, held, await agent.store.retrieve("s1")
+
+    dst, rendered, held, stored = asyncio.run(run())
+    # unpersisted actions are held but only the window is rendered within budget
+    assert held == 3
+    assert rendered == "u:weather?"
+    assert [a.result[0]["text"] for a in dst.actions] == ["hi", "weather?"]
+    assert dst.action_count == 3
+    assert len(stored) == 3
+
+
+def test_history_rendering_is_incremental():
+    agent = build_agent(max_history=3)
+    dst = asyncio.run(agent.create_processor().get_tracker("s1"))
+    rendered = []
+
+    for i in range(5):
+        action = Action.build_from_name(name="UserUtter" if i % 2 == 0 else "BotUtter")
+        action.run_from_dict({"result": [{"text": f"m{i}", "sender_id": "u"}]})
+        dst.update(action)
+        dst.mark_persisted()
+        rendered.append(dst.history_messages())
+
+    assert rendered[-1] == "u:m2\nu:m3\nu:m4"
+    assert dst.history_actions() == "UserUtter:m2\nBotUtter:m3\nUserUtter:m4"
+    # only the held window is kept rendered
+    assert len(dst.rendering("history_messages", None).entries) == 3
+
+
+def test_bot_utter_streams_text_field():
+    import json
+    from cota.llm import LLMClient
+
+    content = json.dumps({"thought": "greet", "text": "Hello there"})
+
+    class StreamingClient(LLMClient):
+        async def generate_chat(self, *args, **kwargs):
+            raise AssertionError("streaming should be used")
+
+        async def generate_chat_stream(self, *args, **kwargs):
+            for i in range(0, len(content), 4):
+                yield content[i:i + 4]
+
+    class StubLLM:
+        client = StreamingClient()
+
+        def generate_chat_stream(self, **kwargs):
+            return self.client.generate_chat_stream(**kwargs)
+
+    agent = build_agent()
+    agent.description = "assistant"
+    agent.llms = {"stub": StubLLM()}
+    partials = []
+
+    async def run():
+        dst = await agent.processor.get_tracker("s1")
+        action = agent.build_action("BotUtter")
+
+        async def collect(text):
+            partials.append(text)
+
+        action.stream_callback = collect
+        await action.run(agent, dst)
+        return action
+
+    action = asyncio.run(run())
+    assert "".join(partials) == "Hello there"
+    assert action.result[-1]["text"] == "Hello there"
+    assert action.result[-1]["thought"] == "greet"
+
+
+def test_format_context_runs_providers_concurrently():
+    import time
+
+    class SlowKnowledge:
+        async def process_query(self, query, context):
+            await asyncio.sleep(0.2)
+            return "facts"
+
+    class HangingDPL:
+        async def generate_thoughts(self, dst, action):
+            await asyncio.sleep(10)
+
+    agent = build_agent(context_timeout={"knowledge": 1, "policies": 0.2})
+    agent.knowledge = SlowKnowledge()
+    agent.dpl = HangingDPL()
+
+    async def run():
+        dst = await agent.processor.get_tracker("s1")
+        start = time.monotonic()
+        context = await dst.format_context("{{knowledge}} {{policies}}", None)
+        return context, time.monotonic() - start
+
+    context, elapsed = asyncio.run(run())
+    # the hanging policy degrades to an empty string within its own timeout
+    assert context == {"knowledge": "facts", "policies": ""}
+    assert elapsed < 0.35
+
+
+def test_format_context_is_shared_until_the_state_changes():
+    calls = []
+
+    class CountingDPL:
+        async def generate_thoughts(self, dst, action):
+            calls.append(action.name)
+            await asyncio.sleep(0.05)
+            return f"policy {len(calls)}"
+
+    agent = build_agent()
+    agent.dpl = CountingDPL()
+
+    async def run():
+        dst = await agent.processor.get_tracker("s1")
+        bot = agent.build_action("BotUtter")
+        shared = await asyncio.gather(
+            dst.format_context("{{policies}}", bot), dst.format_context("{{policies}}", bot)
+        )
+        user = Action.build_from_name(name="UserUtter")
+        user.run_from_dict({"result": [{"text": "hello", "sender_id": "u"}]})
+        dst.update(user)
+        return shared, await dst.format_context("{{policies}}", bot)
+
+    shared, changed = asyncio.run(run())
+    assert shared == [{"policies": "policy 1"}] * 2
+    assert changed == {"policies": "policy 2"}
+    assert calls == ["BotUtter", "BotUtter"]
+
+def test_speculative_bot_utter_is_adopted_or_cancelled():
+    import json
+    from cota.constant import DEFAULT_SELECTOR_INSTRUCTION
+
+    selections = ["BotUtter"] * 4 + ["Form"]
+    calls = []
+
+    class StubLLM:
+        async def generate_chat(self, messages, **kwargs):
+            if messages[0]["content"] == DEFAULT_SELECTOR_INSTRUCTION:
+                await asyncio.sleep(0.05)
+                return {"content": json.dumps({"action": selections.pop(0)})}
+            calls.append("BotUtter")
+            await asyncio.sleep(0.05)
+            return {"content": json.dumps({"text": "hi"})}
+
+    agent = build_agent(speculative={"min_samples": 2})
+    agent.description = "assistant"
+    agent.llms = {"stub": StubLLM()}
+    agent.actions = {
+        **agent.actions,
+        "Selector": {**agent.actions["Selector"], "prompt": "{{history_actions}}"},
+        "Form": {"type": "form", "description": "form"},
+    }
+
+    async def run():
+        dst = await agent.processor.get_tracker("s1")
+        for _ in range(5):
+            user = Action.build_from_name(name="UserUtter")
+            user.run_from_dict({"result": [{"text": "hello", "sender_id": "u"}]})
+            dst.update(user)
+            action = (await agent.generate_actions(dst))[0]
+            if action.name == "BotUtter":
+                await action.run(agent, dst)
+                assert action.result[-1]["text"] == "hi"
+                dst.update(action)
+        await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+    stats = agent.speculation_metrics()
+    # speculation starts from the third turn: two hits, then a miss on the form
+    assert stats["attempts"] == 3
+    assert stats["hits"] == 2 and stats["misses"] == 1
+    # hits reuse the speculative completion, the cancelled one may have started
+    assert 4 <= len(calls) <= 5
+
+
+def test_select_and_respond_uses_one_completion():
+    import json
+
+    calls = []
+
+    class StubLLM:
+        async def generate_chat(self, messages, **kwargs):
+            calls.append(messages[-1]["content"])
+            response = {"text": "hi there", "thought": "reply warmly"}
+            return {"content": json.dumps({"action": "BotUtter", "thought": "greet", "response": response})}
+
+    agent = build_agent(select_and_respond=True)
+    agent.description = "assistant"
+    agent.llms = {"stub": StubLLM()}
+    agent.actions = {**agent.actions, "Selector": {**agent.actions["Selector"], "prompt": "{{history_actions}}"}}
+
+    async def run():
+        dst = await agent.processor.get_tracker("s1")
+        user = Action.build_from_name(name="UserUtter")
+        user.run_from_dict({"result": [{"text": "hello", "sender_id": "u"}]})
+        dst.update(user)
+        action = (await agent.generate_actions(dst))[0]
+        await action.run(agent, dst)
+        return action
+
+    action = asyncio.run(run())
+    assert len(calls) == 1 and "response" in calls[0]
+    assert action.name == "BotUtter"
+    assert action.result[-1]["text"] == "hi there"
+    assert action.result[-1]["thought"] == "reply warmly"
@@ -0,0 +1,135 @@
+import asyncio
+import pytest
+from cota.actions.action import Action
+from cota.dst import DST
+from cota.store import Store, MemoryStore, SQLStore, AsyncSQLStore
+
+
+def build_utter(name, text):
+    action = Action.build_from_name(name=name)
+    action.run_from_dict({"result": [{"text": text}]})
+    return action
+
+
+def test_sql_store_appends_only_new_actions(tmp_path):
+    store = SQLStore(dialect="sqlite", db=str(tmp_path / "cota.db"), query={})
+    dst = DST(session_id="s1", agent=None)
+
+    dst.update(build_utter("UserUtter", "hello"))
+    dst.update(build_utter("BotUtter", "hi"))
+    asyncio.run(store.save(dst))
+    assert dst.persisted_index == 2
+
+    dst.update(build_utter("UserUtter", "weather?"))
+    asyncio.run(store.save(dst))
+    # saving without new actions must not duplicate rows
+    asyncio.run(store.save(dst))
+
+    actions = asyncio.run(store.retrieve("s1"))
+    assert [a["result"][0]["text"] for a in actions] == ["hello", "hi", "weather?"]
+
+
+def test_async_sql_store_roundtrip(tmp_path):
+    pytest.importorskip("aiosqlite")
+    store = Store.create({
+        "type": "sql",
+        "dialect": "sqlite+aiosqlite",
+        "db": str(tmp_path / "cota.db"),
+    })
+    assert isinstance(store, AsyncSQLStore)
+
+    async def run():
+        dst = DST(session_id="s1", agent=None)
+        dst.update(build_utter("UserUtter", "hello"))
+        await store.save(dst)
+        dst.update(build_utter("BotUtter", "hi"))
+        await store.save(dst)
+        actions = await store.retrieve("s1")
+        missing = await store.retrieve("s2")
+        await store.close()
+        return actions, missing
+
+    actions, missing = asyncio.run(run())
+    assert [a["name"] for a in actions] == ["UserUtter", "BotUtter"]
+    assert missing is None
+
+
+def test_memory_store_indexes_and_evicts_sessions():
+    store = MemoryStore(max_sessions=2)
+
+    async def run():
+        for session_id in ("s1", "s2", "s3"):
+            dst = DST(session_id=session_id, agent=None)
+            dst.update(build_utter("UserUtter", f"hello {session_id}"))
+            await store.save(dst)
+        return (
+            await store.retrieve("s1"),
+            await store.retrieve("s3"),
+            await store.latest_utter(["s2", "s3"]),
+        )
+
+    evicted, kept, utters = asyncio.run(run())
+    assert evicted is None
+    assert kept[0]["result"][0]["text"] == "hello s3"
+    assert utters == []
+    assert store.memory == sum(store.sessions.get(key).size for key in store.sessions.keys())
+
+
+def test_memory_store_rewrites_evicted_session_of_live_tracker():
+    store = MemoryStore(max_sessions=1)
+
+    async def run():
+        dst = DST(session_id="s1", agent=None)
+        dst.update(build_utter("UserUtter", "hello"))
+        await store.save(dst)
+        other = DST(session_id="s2", agent=None)
+        other.update(build_utter("UserUtter", "evicts s1"))
+        await store.save(other)
+        # the tracker outlived its store record, as with the agent's DST cache
+        dst.update(build_utter("BotUtter", "hi"))
+        await store.save(dst)
+        return await store.retrieve("s1")
+
+    actions = asyncio.run(run())
+    assert [a["result"][0]["text"] for a in actions] == ["hello", "hi"]
+
+
+def test_sql_store_snapshot_loads_only_delta(tmp_path):
+    from cota.agent import Agent
+    from cota.constant import DEFAULT_CONFIG
+    from cota.processor import Processor
+
+    store = SQLStore(dialect="sqlite", db=str(tmp_path / "cota.db"), query={}, snapshot_interval=2)
+    agent = Agent(name="bot", actions=DEFAULT_CONFIG["actions"], store=store, dialogue={"dst_cache": {"max_size": 0}})
+    processor = Processor(agent, store)
+
+    async def run():
+        dst = DST(session_id="s1", agent=agent)
+        for i, name in enumerate(["UserUtter", "BotUtter", "UserUtter"]):
+            dst.update(build_utter(name, f"text {i}"))
+            dst.slots["turn"] = i
+            await store.save(dst)
+        return await store.retrieve_snapshot("s1"), await processor.get_tracker("s1")
+
+    (snapshot, delta), restored = asyncio.run(run())
+    assert snapshot["action_count"] == 2
+    assert [a["result"][0]["text"] for a in delta] == ["text 2"]
+    assert restored.action_count == 3
+    assert restored.slots == {"turn": 1}
+    assert restored.latest_query.result[0]["text"] == "text 2"
+    assert restored.unpersisted_actions() == []
+
+
+def test_snapshot_keeps_policy_input_and_prompt_history(tmp_path):
+    from cota.agent import Agent
+    from cota.constant import DEFAULT_CONFIG
+
+    agent = Agent(name="bot", actions=DEFAULT_CONFIG["actions"], dialogue={"max_history": 2})
+    dst = DST(session_id="s1", agent=agent)
+    for i, name in enumerate(["UserUtter", "BotUtter", "UserUtter", "BotUtter"]):
+        dst.update(build_utter(name, f"text {i}"))
+    assert len(dst.formless_actions) == 4
+
+    restored = DST.from_snapshot(dst.snapshot(window=1), [], agent)
+    assert [a.result[0]["text"] for a in restored.actions] == ["text 2", "text 3"]
+    assert [a.result[0]["text"] for a in restored.formless_actions] == [f"text {i}" for i in range(4)]
@@ -0,0 +1,10 @@
+from cota.utils.template import PromptTemplate
+
+
+def test_prompt_template_renders_in_one_pass():
+    template = PromptTemplate.compile("{{a}} and {{b}}, again {{a}}")
+    assert template is PromptTemplate.compile("{{a}} and {{b}}, again {{a}}")
+    assert template.variables == ("a", "b")
+    assert "b" in template and "c" not in template
+    # substituted values are not parsed as templates again
+    assert template.render({"a": "{{b}}", "b": "2"}) == "{{b}} and 2, again {{b}}"